@@ -0,0 +1,103 @@
+"""Local HTTP stand-in for the Binance REST API.
+
+Answers from responses recorded with ``--dump-file`` when there is one for the endpoint,
+otherwise from an in-process :py:class:`LocalExchange`. Commands talk to it over real HTTP
+with the real python-binance client, so the benchmarks include request signing,
+the requests session hooks and JSON parsing, but not the network latency.
+
+Point the tool to it with the ``BINANCE_API_URL`` environment variable.
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from binance.exceptions import BinanceAPIException
+
+from binance_testnet_tool.localexchange import LocalExchange
+
+#: /api/v3/depth -> depth
+ENDPOINT_PATH = re.compile(r"/s?api/v\d+/(.*)$")
+
+#: (method, path) -> (HTTP status, response body)
+RecordedResponses = Dict[Tuple[str, str], Tuple[int, str]]
+
+
+def load_recorded_responses(path: str) -> RecordedResponses:
+    """Read request/response pairs written by ``--dump-file``, the latest response of each endpoint wins."""
+    recorded = {}
+    with open(path, "rt") as f:
+        for line in f:
+            entry = json.loads(line)
+            endpoint_path = urlsplit(entry["url"]).path
+            recorded[(entry["method"], endpoint_path)] = (entry["status"], entry["response_body"])
+    return recorded
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+
+        recorded = self.server.recorded.get((self.command, url.path))
+        if recorded:
+            status, body = recorded
+        else:
+            status, body = self.server.dispatch(self.command, url.path, params, self.headers.get("X-MBX-APIKEY"))
+
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBinanceServer(ThreadingHTTPServer):
+    """Serve the Binance REST API from a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, exchange: LocalExchange = None, recorded: Optional[RecordedResponses] = None, port: int = 0):
+        """
+        :param port: Zero picks a free port
+        """
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.exchange = exchange or LocalExchange()
+        self.recorded = recorded or {}
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-binance", daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        """Value for ``BINANCE_API_URL``."""
+        return f"http://127.0.0.1:{self.server_address[1]}/api"
+
+    def dispatch(self, method: str, path: str, params: dict, api_key: Optional[str]) -> Tuple[int, str]:
+        match = ENDPOINT_PATH.search(path)
+        if match is None:
+            return 404, json.dumps({"code": -1000, "msg": f"Unknown path {path}"})
+        try:
+            result = self.exchange.handle_request(method, match.group(1), params, api_key or "local")
+        except BinanceAPIException as e:
+            return e.status_code, json.dumps({"code": e.code, "msg": e.message})
+        return 200, json.dumps(result)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
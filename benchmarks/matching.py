@@ -0,0 +1,61 @@
+"""Measure the matching engine throughput.
+
+Submits a random mix of resting and crossing orders around a fixed mid price, cancelling some of them.
+
+Run with::
+
+    python benchmarks/matching.py --orders 500000
+
+"""
+import random
+import time
+from decimal import Decimal
+
+import click
+
+from binance_testnet_tool.matching import BUY, SELL, MatchingEngine, Order
+
+
+def make_orders(count: int, mid: int, spread: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    orders = []
+    for order_id in range(1, count + 1):
+        side = BUY if rnd.random() < 0.5 else SELL
+        offset = rnd.randint(-spread, spread)
+        price = mid + offset - spread // 2 if side == BUY else mid + offset + spread // 2
+        time_in_force = rnd.choice(["GTC", "GTC", "GTC", "IOC", "FOK"])
+        orders.append(Order(order_id, "", "BTCUSDT", side, "LIMIT", time_in_force, price, rnd.randint(1, 1000)))
+    return orders
+
+
+@click.command()
+@click.option('--orders', 'count', default=200_000, help='How many orders to submit', type=int)
+@click.option('--cancel-every', default=3, help='Cancel an older order after every Nth order', type=int)
+@click.option('--seed', default=1, help='Random seed', type=int)
+def main(count: int, cancel_every: int, seed: int):
+    from tabulate import tabulate
+
+    engine = MatchingEngine("BTCUSDT", Decimal("0.01"), Decimal("0.000001"))
+    orders = make_orders(count, mid=5_000_000, spread=500, seed=seed)
+
+    trades = cancels = 0
+    started = time.perf_counter()
+    for order in orders:
+        trades += len(engine.submit(order))
+        if order.order_id % cancel_every == 0 and engine.cancel(order.order_id - 30):
+            cancels += 1
+    duration = time.perf_counter() - started
+
+    rows = [
+        ("Orders", count),
+        ("Trades", trades),
+        ("Cancels", cancels),
+        ("Resting orders", len(engine.orders)),
+        ("Duration s", f"{duration:.2f}"),
+        ("Orders/s", f"{count / duration:,.0f}"),
+    ]
+    print(tabulate(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Measure the command line startup time.
+
+Run with::
+
+    python benchmarks/startup.py --runs 20
+
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+
+COMMANDS = [
+    ["version"],
+    ["--help"],
+    ["load-test", "--help"],
+]
+
+
+def measure(args: list, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "binance_testnet_tool.main"] + args, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+@click.command()
+@click.option('--runs', default=10, help='How many times each command is run', type=int)
+def main(runs: int):
+    from tabulate import tabulate
+
+    # Python interpreter startup alone, for the reference
+    rows = []
+    baseline = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append(time.perf_counter() - started)
+    rows.append(["python -c pass", statistics.median(baseline) * 1000, min(baseline) * 1000])
+
+    for args in COMMANDS:
+        timings = measure(args, runs)
+        rows.append([" ".join(args), statistics.median(timings) * 1000, min(timings) * 1000])
+
+    print(tabulate(rows, ["Command", "Median ms", "Min ms"], floatfmt=".1f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Timing report of the tool's hot paths.
+
+Pure functions are timed in-process. Commands are run in-process too, but against
+:py:class:`fakeserver.FakeBinanceServer` over HTTP, so a run covers argument parsing,
+client construction, signing, the session hooks and printing.
+
+Save a baseline, change the code, then compare::
+
+    python benchmarks/suite.py --runs 50 --save baseline.json
+    python benchmarks/suite.py --runs 50 --compare baseline.json
+
+Replay responses recorded from the testnet with ``--dump-file`` instead of the local exchange::
+
+    binance-testnet-tool --network spot-testnet --dump-file dump.jsonl depth
+    python benchmarks/suite.py --recorded dump.jsonl
+
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakeserver import FakeBinanceServer, load_recorded_responses  # noqa: E402
+
+#: Credentials the commands send to the fake server, the key is the local exchange account
+API_KEY = "benchmark"
+API_SECRET = "benchmark"
+
+#: Separate account for cancel-all, so that it does not cancel the orders listed by the orders benchmark
+CANCEL_API_KEY = "benchmark-cancel"
+
+#: Price levels per side of the large books
+BOOK_LEVELS = 5000
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], None]
+    #: How many times func is called per sample, for functions too fast to time alone
+    calls: int = 1
+    #: Run before each sample, not timed
+    setup: Optional[Callable[[], None]] = None
+
+    def measure(self, runs: int) -> List[float]:
+        """:return: Seconds per call of each sample"""
+        timings = []
+        for _ in range(runs):
+            if self.setup:
+                self.setup()
+            started = time.perf_counter()
+            for _ in range(self.calls):
+                self.func()
+            timings.append((time.perf_counter() - started) / self.calls)
+        return timings
+
+
+def make_snapshot(levels: int, mid: float, tick: float, seed: int = 1) -> dict:
+    """A depth snapshot with ``levels`` levels on both sides of the mid price."""
+    rnd = random.Random(seed)
+    bids = [(f"{mid - i * tick:.2f}", f"{rnd.uniform(0.001, 2):.6f}") for i in range(1, levels + 1)]
+    asks = [(f"{mid + i * tick:.2f}", f"{rnd.uniform(0.001, 2):.6f}") for i in range(1, levels + 1)]
+    return {"lastUpdateId": 1, "bids": bids, "asks": asks}
+
+
+def run_command(*args: str, api_key: str = API_KEY):
+    """Run a command of the tool in-process against the fake server, discarding its output."""
+    from binance_testnet_tool import main
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.main.main(
+            args=["--network", "spot-testnet", "--log-level", "warning", "--api-key", api_key, "--api-secret", API_SECRET] + list(args),
+            standalone_mode=False,
+        )
+
+
+def place_orders(exchange, count: int, symbol: str = "BTCUSDT", api_key: str = API_KEY):
+    """Place resting buy orders well below the seeded liquidity."""
+    for i in range(count):
+        exchange.handle_request("POST", "order", {
+            "symbol": symbol,
+            "side": "BUY",
+            "type": "LIMIT",
+            "timeInForce": "GTC",
+            "quantity": "0.001",
+            "price": f"{40000 - i:.2f}",
+        }, api_key)
+
+
+def create_benchmarks(server: FakeBinanceServer) -> List[Benchmark]:
+    from decimal import Decimal
+
+    from binance_testnet_tool.console import print_colorful_json
+    from binance_testnet_tool.depth import Side, get_depth_info
+    from binance_testnet_tool.localexchange import create_local_client
+    from binance_testnet_tool.orderbook import OrderBook
+    from binance_testnet_tool.quantize import SymbolQuantizer
+    from binance_testnet_tool.symbols import get_symbol_registry
+    from binance_testnet_tool.utils import quantize_price, quantize_quantity
+
+    # The registry of the local exchange, so that get_depth_info() does not need the network
+    local_client, _ = create_local_client(API_KEY, API_SECRET, exchange=server.exchange)
+    registry = get_symbol_registry(local_client)
+    quantizer = SymbolQuantizer.from_registry(registry, "BTCUSDT")
+
+    snapshot = make_snapshot(BOOK_LEVELS, 50000, 0.01)
+    book = OrderBook.from_snapshot("BTCUSDT", snapshot)
+
+    prices = [random.Random(2).uniform(1, 100000) for _ in range(1000)]
+    order_info = local_client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.001", price="40000")
+    local_client.cancel_order(symbol="BTCUSDT", orderId=order_info["orderId"])
+
+    def _depth_info():
+        for side in (Side.ask, Side.bid):
+            get_depth_info(local_client, "BTCUSDT", side, book)
+
+    def _quantize():
+        for price in prices:
+            quantize_price(price)
+            quantize_quantity(price)
+
+    def _quantize_order():
+        for price in prices:
+            quantizer.quantize_order(price, Decimal("0.0012345"))
+
+    def _print_json():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_colorful_json(order_info)
+
+    def _cancel_all_setup():
+        place_orders(server.exchange, 20, api_key=CANCEL_API_KEY)
+
+    return [
+        # Reload the book so that every sample starts without cached prefix sums
+        Benchmark(f"get_depth_info, {BOOK_LEVELS} levels", _depth_info, setup=lambda: book.apply_snapshot(snapshot)),
+        Benchmark("OrderBook.from_snapshot", lambda: OrderBook.from_snapshot("BTCUSDT", snapshot)),
+        Benchmark("quantize_price + quantize_quantity ×1000", _quantize),
+        Benchmark("SymbolQuantizer.quantize_order ×1000", _quantize_order),
+        Benchmark("print_colorful_json", _print_json, calls=10),
+        Benchmark("command: depth", lambda: run_command("depth")),
+        Benchmark("command: orders, 50 open", lambda: run_command("orders")),
+        Benchmark("command: cancel-all, 20 open", lambda: run_command("cancel-all", api_key=CANCEL_API_KEY), setup=_cancel_all_setup),
+    ]
+
+
+def summarise(timings: Dict[str, List[float]]) -> Dict[str, dict]:
+    return {name: {"median": statistics.median(t), "min": min(t)} for name, t in timings.items()}
+
+
+@click.command()
+@click.option('--runs', default=20, help='How many samples to take of each benchmark', type=int)
+@click.option('--filter', 'name_filter', default=None, help='Run only the benchmarks whose name contains this', required=False)
+@click.option('--recorded', default=None, help='Serve responses from this --dump-file JSON lines file where available', required=False, type=click.Path(exists=True))
+@click.option('--save', default=None, help='Write the results to this JSON file', required=False, type=click.Path())
+@click.option('--compare', default=None, help='Compare against results saved earlier with --save', required=False, type=click.Path(exists=True))
+def main(runs: int, name_filter: str, recorded: str, save: str, compare: str):
+    from tabulate import tabulate
+
+    from binance_testnet_tool import ratelimit
+    from binance_testnet_tool.localexchange import LocalExchange
+
+    # Keep the symbol cache of the benchmark apart from the real one
+    cache_dir = tempfile.mkdtemp(prefix="binance-tool-benchmark-")
+    os.environ["BINANCE_TOOL_CACHE_DIR"] = cache_dir
+
+    # Waiting for rate limiter tokens would show up as the slowest code path
+    ratelimit._shared_limiter = ratelimit.RateLimiter(weight_limit=10**9, order_limit=10**9)
+
+    server = FakeBinanceServer(LocalExchange(seed_levels=500), load_recorded_responses(recorded) if recorded else None)
+    server.start()
+    os.environ["BINANCE_API_URL"] = server.api_url
+    place_orders(server.exchange, 50)
+
+    try:
+        benchmarks = [b for b in create_benchmarks(server) if not name_filter or name_filter in b.name]
+        timings = {}
+        for benchmark in benchmarks:
+            # Warm up imports, caches and the connection pool
+            benchmark.measure(1)
+            timings[benchmark.name] = benchmark.measure(runs)
+    finally:
+        server.stop()
+
+    results = summarise(timings)
+    baseline = {}
+    if compare:
+        with open(compare, "rt") as f:
+            baseline = json.load(f)
+
+    rows = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        change = (result["median"] / base["median"] - 1) * 100 if base else None
+        rows.append([
+            name,
+            len(timings[name]),
+            result["median"] * 1_000_000,
+            result["min"] * 1_000_000,
+            base["median"] * 1_000_000 if base else None,
+            change,
+        ])
+    print(tabulate(rows, ["Benchmark", "Samples", "Median µs", "Min µs", "Baseline µs", "Change %"], floatfmt=".1f", missingval="-"))
+
+    if save:
+        with open(save, "wt") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Locally maintained account state.
+
+Open orders and balances are seeded from one REST snapshot and then kept current
+from the ``executionReport`` and ``outboundAccountPosition`` events of the user data stream:
+
+https://github.com/binance/binance-spot-api-docs/blob/master/user-data-stream.md
+
+Both events carry absolute state (order status and executed amounts, asset free and locked balances).
+Events arriving while a snapshot is loaded are buffered and replayed on top of it,
+except for the ones older than the snapshot, which would roll the state back.
+
+python-binance keeps the listen key of the stream alive.
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import Client
+    from binance import ThreadedWebsocketManager
+
+
+logger = logging.getLogger()
+
+#: Order statuses that take the order off the book
+CLOSED_ORDER_STATUSES = {"FILLED", "CANCELED", "EXPIRED", "REJECTED"}
+
+#: Cache kept running by a long lived process, see :py:func:`load_open_orders`
+_account_cache: Optional["AccountCache"] = None
+
+
+def order_from_execution_report(msg: dict) -> dict:
+    """Convert an ``executionReport`` event to the ``GET /api/v3/openOrders`` entry format."""
+    return {
+        "symbol": msg["s"],
+        "orderId": msg["i"],
+        "orderListId": msg.get("g", -1),
+        # Cancel events carry the cancel request id in c and the original id in C
+        "clientOrderId": msg["C"] if msg["x"] == "CANCELED" and msg.get("C") else msg["c"],
+        "price": msg["p"],
+        "origQty": msg["q"],
+        "executedQty": msg["z"],
+        "cummulativeQuoteQty": msg["Z"],
+        "status": msg["X"],
+        "timeInForce": msg["f"],
+        "type": msg["o"],
+        "side": msg["S"],
+        "stopPrice": msg.get("P", "0.00000000"),
+        "icebergQty": msg.get("F", "0.00000000"),
+        "time": msg.get("O"),
+        "updateTime": msg["E"],
+        "isWorking": msg.get("w", True),
+    }
+
+
+def is_older_than_snapshot(msg: dict, account_time: Optional[int], order_times: Dict[int, Optional[int]]) -> bool:
+    """Whether a user data stream event predates the REST snapshot.
+
+    Events of the same millisecond as the snapshot are kept, they may have happened right after it.
+    Replaying one the snapshot already includes is harmless, as the events following it are replayed too.
+
+    :param account_time: ``updateTime`` of ``GET /api/v3/account``
+    :param order_times: orderId -> ``updateTime`` of ``GET /api/v3/openOrders``
+    """
+    event_type = msg.get("e")
+    if event_type == "executionReport":
+        snapshot_time = order_times.get(msg["i"])
+        event_time = msg.get("T", msg["E"])
+    elif event_type == "outboundAccountPosition":
+        snapshot_time = account_time
+        event_time = msg.get("u", msg["E"])
+    else:
+        return False
+    return snapshot_time is not None and event_time < snapshot_time
+
+
+class AccountCache:
+    """Keep open orders and balances up-to-date from the user data stream.
+
+    Readers get copies of the state, so they can be called from any thread without request weight.
+    """
+
+    def __init__(self, client: "Client", bm: "ThreadedWebsocketManager"):
+        """
+        :param bm: Websocket manager, must be started with ``bm.start()`` before calling :py:meth:`start`
+        """
+        self.client = client
+        self.bm = bm
+        self.open_orders: Dict[int, dict] = {}
+        #: asset -> {"asset", "free", "locked"}
+        self.balances: Dict[str, dict] = {}
+        self.synced = False
+        self.conn_key = None
+        self.resync_count = 0
+        #: Events received while a snapshot is loading
+        self.pending: Optional[List[dict]] = None
+        #: Background resync started by stream errors, None when not running
+        self.resync_thread: Optional[threading.Thread] = None
+        #: Another stream error came in, the running background resync must load again
+        self.resync_requested = False
+        self.updated = threading.Condition(threading.RLock())
+
+    def start(self):
+        """Subscribe to the user data stream and load the snapshot."""
+        self.conn_key = self.bm.start_user_socket(self.process_message)
+        self.resync()
+
+    def stop(self):
+        if self.conn_key:
+            self.bm.stop_socket(self.conn_key)
+            self.conn_key = None
+
+    def resync(self):
+        """Reload orders and balances from REST.
+
+        Costs the weight of ``GET /api/v3/account`` and ``GET /api/v3/openOrders`` for all symbols.
+        """
+        with self.updated:
+            self.synced = False
+            self.pending = []
+
+        # Do not hold the lock over the requests, so the websocket thread can keep buffering
+        logger.debug("Loading account snapshot")
+        account = self.client.get_account()
+        orders = self.client.get_open_orders()
+
+        with self.updated:
+            self.balances = {b["asset"]: dict(b) for b in account["balances"]}
+            self.open_orders = {o["orderId"]: dict(o) for o in orders}
+            order_times = {o["orderId"]: o.get("updateTime") for o in orders}
+            pending, self.pending = self.pending, None
+            for msg in pending:
+                if is_older_than_snapshot(msg, account.get("updateTime"), order_times):
+                    logger.debug("Dropping %s event older than the snapshot", msg.get("e"))
+                    continue
+                self._apply(msg)
+            self.synced = True
+            self.resync_count += 1
+            self.updated.notify_all()
+
+    def process_message(self, msg: dict):
+        """Websocket callback for user data stream events."""
+        if msg.get("e") == "error":
+            # python-binance reconnects by itself, but events may have been lost meanwhile
+            logger.error("User data stream failed, resyncing account state: %s", msg)
+            self._request_resync()
+            return
+
+        with self.updated:
+            if self.pending is not None:
+                self.pending.append(msg)
+                return
+            self._apply(msg)
+            self.updated.notify_all()
+
+    def _request_resync(self):
+        """Resync in a background thread, a burst of errors shares one thread."""
+        with self.updated:
+            self.resync_requested = True
+            if self.resync_thread is not None:
+                return
+            self.resync_thread = threading.Thread(target=self._resync_loop, name="account-cache-resync", daemon=True)
+            self.resync_thread.start()
+
+    def _resync_loop(self):
+        while True:
+            with self.updated:
+                if not self.resync_requested:
+                    self.resync_thread = None
+                    return
+                self.resync_requested = False
+            try:
+                self.resync()
+            except Exception:
+                logger.exception("Account state resync failed")
+
+    def _apply(self, msg: dict):
+        """Must hold the lock."""
+        event_type = msg.get("e")
+        if event_type == "executionReport":
+            order = order_from_execution_report(msg)
+            if order["status"] in CLOSED_ORDER_STATUSES:
+                self.open_orders.pop(order["orderId"], None)
+            else:
+                self.open_orders[order["orderId"]] = order
+        elif event_type == "outboundAccountPosition":
+            for b in msg["B"]:
+                self.balances[b["a"]] = {"asset": b["a"], "free": b["f"], "locked": b["l"]}
+
+    def is_synced(self) -> bool:
+        return self.synced
+
+    def get_open_orders(self, symbol: str = None) -> List[dict]:
+        """Same as ``client.get_open_orders()``, without a request."""
+        with self.updated:
+            return [dict(o) for o in self.open_orders.values() if symbol is None or o["symbol"] == symbol]
+
+    def get_balances(self) -> List[dict]:
+        """Same as ``client.get_account()["balances"]``, without a request."""
+        with self.updated:
+            return [dict(b) for b in self.balances.values()]
+
+
+def register_account_cache(cache: Optional[AccountCache]):
+    """Let :py:func:`load_open_orders` and :py:func:`load_balances` read a running cache instead of REST."""
+    global _account_cache
+    _account_cache = cache
+
+
+def load_open_orders(client: "Client", symbol: str = None) -> List[dict]:
+    """Get open orders from the account cache if one is running, otherwise from REST."""
+    cache = _account_cache
+    if cache and cache.is_synced():
+        return cache.get_open_orders(symbol)
+    if symbol:
+        return client.get_open_orders(symbol=symbol)
+    return client.get_open_orders()
+
+
+def load_balances(client: "Client") -> List[dict]:
+    """Get balances from the account cache if one is running, otherwise from REST."""
+    cache = _account_cache
+    if cache and cache.is_synced():
+        return cache.get_balances()
+    return client.get_account()["balances"]
@@ -0,0 +1,196 @@
+"""Place many orders from a file.
+
+Order specs are read from CSV or JSON lines, one order per row with the fields::
+
+    market,side,type,quantity,price,time_in_force,client_order_id
+    BTCUSDT,buy,limit,0.001,30000,,
+    BTCUSDT,sell,market,0.001,,,
+
+Only ``market``, ``side`` and ``quantity`` are required. ``type`` defaults to limit and ``time_in_force`` to GTC.
+
+The whole batch is quantized and validated against the symbol filters before the first order is sent,
+so a typo on the last row does not leave a half placed ladder behind.
+"""
+import csv
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from binance_testnet_tool.quantize import FilterFailure, get_quantizer
+from binance_testnet_tool.requesthelpers import set_pool_size
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+logger = logging.getLogger()
+
+#: Input formats by file extension
+FORMATS = ("csv", "jsonl")
+
+ORDER_TYPES = ("LIMIT", "MARKET")
+
+TIME_IN_FORCES = ("GTC", "IOC", "FOK")
+
+
+@dataclass
+class BatchOrder:
+    """A validated and quantized order of a batch."""
+
+    #: Row number in the input, for error messages and results
+    line: int
+    market: str
+    side: str
+    type: str
+    quantity: Decimal
+    price: Optional[Decimal] = None
+    time_in_force: Optional[str] = None
+    client_order_id: Optional[str] = None
+
+    def get_params(self) -> dict:
+        """``client.create_order()`` keyword arguments."""
+        params = {
+            "symbol": self.market,
+            "side": self.side,
+            "type": self.type,
+            "quantity": str(self.quantity),
+        }
+        if self.type == "LIMIT":
+            params["price"] = str(self.price)
+            params["timeInForce"] = self.time_in_force
+        if self.client_order_id:
+            params["newClientOrderId"] = self.client_order_id
+        return params
+
+
+def guess_format(filename: str) -> str:
+    """Pick the input format from the file extension, stdin is expected to be JSON lines."""
+    if filename.lower().endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def read_order_rows(f: IO[str], fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Read raw order specs.
+
+    :param fmt: csv or jsonl
+    :return: Iterator of (line number, row) with lowercased keys
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, {k.strip().lower(): v for k, v in row.items() if k}
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(f, start=1):
+            if line.strip():
+                yield line_num, {k.lower(): v for k, v in json.loads(line).items()}
+    else:
+        raise RuntimeError(f"Unknown format {fmt}")
+
+
+def _get(row: dict, key: str) -> Optional[str]:
+    """Missing values and empty CSV cells are both None."""
+    value = row.get(key)
+    if value is None or value == "":
+        return None
+    return str(value).strip()
+
+
+def parse_order(client: "Client", line: int, row: dict) -> BatchOrder:
+    """Validate and quantize an order spec.
+
+    :raise FilterFailure: If the row is invalid or Binance would not accept the order
+    """
+    market = (_get(row, "market") or "").upper()
+    side = (_get(row, "side") or "").upper()
+    order_type = (_get(row, "type") or "LIMIT").upper()
+    quantity = _get(row, "quantity")
+    price = _get(row, "price")
+    time_in_force = (_get(row, "time_in_force") or "GTC").upper()
+
+    if not market:
+        raise FilterFailure("market missing")
+    if side not in ("BUY", "SELL"):
+        raise FilterFailure(f"side must be buy or sell, got {side}")
+    if order_type not in ORDER_TYPES:
+        raise FilterFailure(f"type must be limit or market, got {order_type}")
+    if time_in_force not in TIME_IN_FORCES:
+        raise FilterFailure(f"time_in_force must be one of {', '.join(TIME_IN_FORCES)}, got {time_in_force}")
+    if quantity is None:
+        raise FilterFailure("quantity missing")
+
+    try:
+        quantizer = get_quantizer(client, market)
+    except RuntimeError as e:
+        raise FilterFailure(str(e)) from e
+
+    order = BatchOrder(line=line, market=market, side=side, type=order_type, quantity=Decimal(quantity), client_order_id=_get(row, "client_order_id"))
+    if order_type == "LIMIT":
+        if price is None:
+            raise FilterFailure("price missing from a limit order")
+        order.price, order.quantity = quantizer.quantize_order(Decimal(price), order.quantity)
+        order.time_in_force = time_in_force
+    else:
+        order.quantity = quantizer.quantize_quantity(order.quantity, market=True)
+        quantizer.validate(None, order.quantity)
+    return order
+
+
+def prepare_orders(client: "Client", rows: Iterable[Tuple[int, dict]]) -> Tuple[List[BatchOrder], List[Tuple[int, str]]]:
+    """Validate and quantize the whole batch.
+
+    :return: (valid orders, (line number, error) of the invalid rows)
+    """
+    orders = []
+    errors = []
+    for line, row in rows:
+        try:
+            orders.append(parse_order(client, line, row))
+        except (FilterFailure, ArithmeticError) as e:
+            errors.append((line, str(e) or e.__class__.__name__))
+    return orders, errors
+
+
+def place_orders(client: "Client", orders: List[BatchOrder], concurrency: int = 8) -> Iterator[dict]:
+    """Submit orders from a pool of worker threads sharing the client connection pool.
+
+    :param concurrency: Maximum orders in flight
+    :return: Iterator of result entries in the batch order, as they become available
+    """
+    from binance.exceptions import BinanceAPIException
+
+    set_pool_size(client, concurrency)
+
+    def _place(order: BatchOrder) -> dict:
+        entry = {
+            "line": order.line,
+            "market": order.market,
+            "side": order.side,
+            "type": order.type,
+            "price": str(order.price) if order.price is not None else None,
+            "quantity": str(order.quantity),
+        }
+        started = time.perf_counter()
+        try:
+            response = client.create_order(**order.get_params())
+            entry.update({
+                "orderId": response["orderId"],
+                "clientOrderId": response["clientOrderId"],
+                "status": response["status"],
+                "executedQty": response["executedQty"],
+            })
+        except BinanceAPIException as e:
+            logger.debug("Order on line %d rejected: %s", order.line, e)
+            entry.update({"status": "REJECTED", "code": e.code, "error": e.message})
+        except Exception as e:
+            logger.warning("Order on line %d failed: %s", order.line, e)
+            entry.update({"status": "FAILED", "error": str(e)})
+        entry["latency"] = round(time.perf_counter() - started, 6)
+        return entry
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        yield from executor.map(_place, orders)
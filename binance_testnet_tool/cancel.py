@@ -0,0 +1,104 @@
+"""Bulk order cancellation.
+
+Orders are cancelled per symbol with a single ``DELETE /api/v3/openOrders`` call.
+If that fails, we fall back to cancelling the orders of the symbol one by one
+using a bounded pool of concurrent requests.
+
+Requests are throttled by the rate limiter installed on the client.
+``DELETE /api/v3/openOrders`` also cancels open orders that were not given,
+callers that must leave those alone cancel ``per_order``.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+
+
+logger = logging.getLogger()
+
+
+def group_by_symbol(orders: List[dict]) -> Dict[str, List[dict]]:
+    by_symbol = defaultdict(list)
+    for o in orders:
+        by_symbol[o["symbol"]].append(o)
+    return by_symbol
+
+
+def cancel_all_orders(client: "Client", orders: List[dict], max_workers: int = 8, per_order: bool = False) -> int:
+    """Cancel given open orders.
+
+    :param per_order: Cancel the orders one by one, leaving the other open orders of their symbols alone
+    :return: Number of orders cancelled
+    """
+    from binance.exceptions import BinanceAPIException
+
+    cancelled = 0
+    leftovers = []
+
+    if per_order:
+        leftovers.extend(orders)
+    else:
+        for symbol, symbol_orders in group_by_symbol(orders).items():
+            try:
+                # python-binance does not wrap DELETE openOrders
+                # The response lists the orders actually cancelled, some of ours may have been filled meanwhile
+                response = client._delete("openOrders", True, data={"symbol": symbol})
+                logger.info("Cancelled %d orders on %s", len(response), symbol)
+                cancelled += len(response)
+            except BinanceAPIException as e:
+                logger.warning("Could not cancel all %s orders at once, cancelling one by one: %s", symbol, e)
+                leftovers.extend(symbol_orders)
+
+    def _cancel(o: dict) -> bool:
+        try:
+            logger.info("Cancelling order %s", o["orderId"])
+            client.cancel_order(symbol=o["symbol"], orderId=o["orderId"])
+            return True
+        except BinanceAPIException as e:
+            logger.error("Could not cancel order %s: %s", o["orderId"], e)
+            return False
+
+    if leftovers:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            cancelled += sum(executor.map(_cancel, leftovers))
+
+    return cancelled
+
+
+async def cancel_all_orders_async(async_client: "AsyncClient", orders: List[dict], max_concurrency: int = 8, per_order: bool = False) -> int:
+    """Same as :py:func:`cancel_all_orders`, but over the async client."""
+    from binance.exceptions import BinanceAPIException
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _cancel(o: dict) -> bool:
+        async with semaphore:
+            try:
+                logger.info("Cancelling order %s", o["orderId"])
+                await async_client.cancel_order(symbol=o["symbol"], orderId=o["orderId"])
+                return True
+            except BinanceAPIException as e:
+                logger.error("Could not cancel order %s: %s", o["orderId"], e)
+                return False
+
+    async def _cancel_symbol(symbol: str, symbol_orders: List[dict]) -> int:
+        async with semaphore:
+            try:
+                response = await async_client._delete("openOrders", True, data={"symbol": symbol})
+                logger.info("Cancelled %d orders on %s", len(response), symbol)
+                return len(response)
+            except BinanceAPIException as e:
+                logger.warning("Could not cancel all %s orders at once, cancelling one by one: %s", symbol, e)
+
+        results = await asyncio.gather(*(_cancel(o) for o in symbol_orders))
+        return sum(results)
+
+    if per_order:
+        return sum(await asyncio.gather(*(_cancel(o) for o in orders)))
+
+    counts = await asyncio.gather(*(_cancel_symbol(symbol, symbol_orders) for symbol, symbol_orders in group_by_symbol(orders).items()))
+    return sum(counts)
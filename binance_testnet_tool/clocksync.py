@@ -0,0 +1,308 @@
+"""Keep signed request timestamps in sync with the Binance server clock.
+
+Binance rejects a signed request with -1021 if its timestamp is ahead of the server clock
+or older than ``recvWindow`` when it arrives. python-binance signs with the local clock,
+so a drifting host gets its orders rejected.
+
+We estimate the server clock offset from ``GET /api/v3/time``, compensating for the round-trip:
+the server read its clock roughly halfway between sending the request and receiving the response.
+Of several samples the one with the shortest round-trip is the most accurate.
+The offset is applied to every signed request through the ``timestamp_offset`` of the clients,
+which is only written when the offset changes, so concurrent requests always sign with the latest one.
+
+One-shot commands sync before their first signed request. Long running commands also re-sync
+in the background and smooth the offset, so that a single slow sample does not jerk it around.
+A -1021 rejection triggers an immediate re-sync and one retry, as the request was never processed.
+
+https://github.com/binance/binance-spot-api-docs/blob/master/rest-api.md#timing-security
+"""
+import logging
+import threading
+import time
+import weakref
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+
+
+logger = logging.getLogger()
+
+#: Binance error code for a timestamp outside recvWindow or ahead of the server
+TIMESTAMP_ERROR = -1021
+
+#: Same as the Binance default, milliseconds
+DEFAULT_RECV_WINDOW = 5000
+
+#: Largest recvWindow Binance accepts, milliseconds
+MAX_RECV_WINDOW = 60000
+
+#: How often long running commands re-sync, seconds
+DEFAULT_SYNC_INTERVAL = 60
+
+#: Server time requests per background sync
+DEFAULT_SAMPLES = 3
+
+#: Weight of a new measurement in the smoothed offset
+DEFAULT_SMOOTHING = 0.3
+
+
+def estimate_offset(sent_at: float, server_time: int, received_at: float) -> Tuple[float, float]:
+    """Estimate the server clock offset from one server time request.
+
+    :param sent_at: Local time when the request was sent, milliseconds
+    :param server_time: ``serverTime`` of the response
+    :param received_at: Local time when the response was received, milliseconds
+    :return: (offset ms to add to the local clock, round-trip ms)
+    """
+    rtt = received_at - sent_at
+    return server_time - (sent_at + rtt / 2), rtt
+
+
+class ClockSync:
+    """Smoothed server clock offset shared by the clients of a command.
+
+    Thread safe.
+    """
+
+    def __init__(self, recv_window: int = DEFAULT_RECV_WINDOW, samples: int = DEFAULT_SAMPLES, smoothing: float = DEFAULT_SMOOTHING):
+        """
+        :param recv_window: Added to signed requests that do not set their own, milliseconds
+        :param samples: Server time requests per background sync
+        """
+        if not 0 < recv_window <= MAX_RECV_WINDOW:
+            raise RuntimeError(f"recvWindow must be between 1 and {MAX_RECV_WINDOW} ms, got {recv_window}")
+        self.recv_window = recv_window
+        self.samples = samples
+        self.smoothing = smoothing
+        #: Milliseconds to add to the local clock, None until synced
+        self.offset: Optional[float] = None
+        #: Round-trip of the sample the offset was last updated from, milliseconds
+        self.rtt: Optional[float] = None
+        self.sync_count = 0
+        self.signed_requests = 0
+        #: -1021 responses received
+        self.rejections = 0
+        #: Rejected requests that succeeded when retried after a re-sync
+        self.recovered = 0
+        self.lock = threading.Lock()
+        #: Held while measuring, so that concurrent requests do not all sync at once
+        self.sync_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        #: Callers of :py:meth:`start` that have not called :py:meth:`stop` yet
+        self.users = 0
+        #: Clients whose ``timestamp_offset`` follows this clock, the async clients come and go
+        self.clients = weakref.WeakSet()
+
+    def attach(self, client: "Client"):
+        with self.lock:
+            self.clients.add(client)
+            if self.offset is not None:
+                client.timestamp_offset = int(self.offset)
+
+    def update(self, samples: List[Tuple[float, float]], reset: bool = False) -> float:
+        """Fold measurements into the offset.
+
+        A jump larger than half of recvWindow is taken as is, smoothing it would keep requests failing.
+
+        :param samples: (offset, round-trip) pairs from :py:func:`estimate_offset`
+        :param reset: Discard the smoothed offset, e.g. after a rejection
+        :return: The new offset
+        """
+        offset, rtt = min(samples, key=lambda s: s[1])
+        with self.lock:
+            if self.offset is None or reset or abs(offset - self.offset) > self.recv_window / 2:
+                self.offset = offset
+            else:
+                self.offset += (offset - self.offset) * self.smoothing
+            self.rtt = rtt
+            self.sync_count += 1
+            for client in self.clients:
+                client.timestamp_offset = int(self.offset)
+            return self.offset
+
+    def sync(self, client: "Client", samples: int = None, reset: bool = False) -> float:
+        """Measure the offset against the server.
+
+        :param samples: Defaults to the number given in the constructor
+        """
+        measured = []
+        for _ in range(samples or self.samples):
+            sent_at = time.time() * 1000
+            server_time = client.get_server_time()["serverTime"]
+            measured.append(estimate_offset(sent_at, server_time, time.time() * 1000))
+        offset = self.update(measured, reset)
+        logger.debug("Server clock offset %.1f ms, round-trip %.1f ms", offset, self.rtt)
+        return offset
+
+    def sync_if_stale(self, client: "Client", seen_sync_count: Optional[int] = None):
+        """Sync unless another thread did it meanwhile.
+
+        :param seen_sync_count: :py:attr:`sync_count` when the caller found the offset stale,
+            None to sync only if never synced
+        """
+        with self.sync_lock:
+            if seen_sync_count is None:
+                if self.offset is None:
+                    self.sync(client, samples=1)
+            elif self.sync_count == seen_sync_count:
+                self.sync(client, reset=True)
+
+    async def sync_async(self, async_client: "AsyncClient", samples: int = None, reset: bool = False) -> float:
+        """Same as :py:meth:`sync` for the async client."""
+        measured = []
+        for _ in range(samples or self.samples):
+            sent_at = time.time() * 1000
+            server_time = (await async_client.get_server_time())["serverTime"]
+            measured.append(estimate_offset(sent_at, server_time, time.time() * 1000))
+        return self.update(measured, reset)
+
+    def start(self, client: "Client", interval: float = DEFAULT_SYNC_INTERVAL):
+        """Re-sync in a background thread until every caller has called :py:meth:`stop`.
+
+        Commands run by ``serve`` share the clock, and its background thread, with the server.
+        """
+        with self.lock:
+            self.users += 1
+            if self.thread:
+                return
+            # Each thread gets its own event, so that a stopping thread cannot stop its successor
+            stopped = self.stopped = threading.Event()
+
+            def _run():
+                while not stopped.wait(interval):
+                    try:
+                        with self.sync_lock:
+                            self.sync(client)
+                    except Exception as e:
+                        # Keep the previous offset, the next round may succeed
+                        logger.warning("Server clock sync failed: %s", e)
+
+            self.thread = threading.Thread(target=_run, name="clock-sync", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Undo one :py:meth:`start`, the last one stops the background thread."""
+        with self.lock:
+            if not self.users:
+                return
+            self.users -= 1
+            if self.users or not self.thread:
+                return
+            thread, self.thread = self.thread, None
+            self.stopped.set()
+        # The thread takes the lock when it updates the offset
+        thread.join()
+
+    def record_signed(self):
+        with self.lock:
+            self.signed_requests += 1
+
+    def record_rejection(self):
+        with self.lock:
+            self.rejections += 1
+
+    def record_recovered(self):
+        with self.lock:
+            self.recovered += 1
+
+    def get_report_rows(self) -> List[Tuple[str, object]]:
+        return [
+            ("Server clock offset ms", f"{self.offset:.1f}" if self.offset is not None else None),
+            ("Clock sync round-trip ms", f"{self.rtt:.1f}" if self.rtt is not None else None),
+            ("recvWindow ms", self.recv_window),
+            ("Signed requests", self.signed_requests),
+            ("Timestamp rejections", self.rejections),
+            ("Recovered by re-sync", self.recovered),
+        ]
+
+
+def _prepare_signed(clock: ClockSync, kwargs: dict):
+    data = kwargs.setdefault("data", {})
+    data.setdefault("recvWindow", clock.recv_window)
+    # A retry must be signed again
+    data.pop("timestamp", None)
+    data.pop("signature", None)
+    clock.record_signed()
+
+
+def install_clock_sync(client: "Client", clock: ClockSync):
+    """Apply the server clock offset and recvWindow to all signed requests of a client.
+
+    Install after the rate limiter, so that the timestamp is taken after any wait for the limiter
+    and a retry is charged from the limiter too.
+    """
+    from binance.exceptions import BinanceAPIException
+
+    request = client._request
+
+    def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        if not signed:
+            return request(method, uri, signed, force_params, **kwargs)
+
+        if clock.offset is None:
+            # One sample is close enough for a one-shot command, background syncs refine it
+            clock.sync_if_stale(client)
+        _prepare_signed(clock, kwargs)
+        seen_sync_count = clock.sync_count
+        try:
+            return request(method, uri, signed, force_params, **kwargs)
+        except BinanceAPIException as e:
+            if e.code != TIMESTAMP_ERROR:
+                raise
+            clock.record_rejection()
+            logger.warning("Timestamp rejected by the server, re-syncing the clock: %s", e.message)
+
+        # Requests rejected at the same time share one re-sync
+        clock.sync_if_stale(client, seen_sync_count)
+        _prepare_signed(clock, kwargs)
+        result = request(method, uri, signed, force_params, **kwargs)
+        clock.record_recovered()
+        return result
+
+    client._request = _request
+    client.clock_sync = clock
+    clock.attach(client)
+
+
+def install_clock_sync_async(async_client: "AsyncClient", clock: ClockSync):
+    """Same as :py:func:`install_clock_sync` for the async client.
+
+    Must be called within the event loop of the client.
+    """
+    import asyncio
+    from binance.exceptions import BinanceAPIException
+
+    request = async_client._request
+    sync_lock = asyncio.Lock()
+
+    async def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        if not signed:
+            return await request(method, uri, signed, force_params, **kwargs)
+
+        if clock.offset is None:
+            async with sync_lock:
+                if clock.offset is None:
+                    await clock.sync_async(async_client, samples=1)
+        _prepare_signed(clock, kwargs)
+        seen_sync_count = clock.sync_count
+        try:
+            return await request(method, uri, signed, force_params, **kwargs)
+        except BinanceAPIException as e:
+            if e.code != TIMESTAMP_ERROR:
+                raise
+            clock.record_rejection()
+            logger.warning("Timestamp rejected by the server, re-syncing the clock: %s", e.message)
+
+        async with sync_lock:
+            if clock.sync_count == seen_sync_count:
+                await clock.sync_async(async_client, reset=True)
+        _prepare_signed(clock, kwargs)
+        result = await request(method, uri, signed, force_params, **kwargs)
+        clock.record_recovered()
+        return result
+
+    async_client._request = _request
+    async_client.clock_sync = clock
+    clock.attach(async_client)
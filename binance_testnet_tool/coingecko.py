@@ -1,10 +1,100 @@
-"""Coingecko helper"""
+"""Coingecko helper.
 
+Coingecko knows coins by ids like ``bitcoin`` instead of tickers,
+so Binance pairs are mapped to (coin id, vs currency) before the lookup.
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
 
-def fetch_coingecko_price(pair: str):
-    """Get the market midprice from Coingecko.
 
-    :param pair: Binance trading pair
+#: Binance asset -> Coingecko coin id, for the assets listed on the Spot Testnet
+COINGECKO_IDS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "BNB": "binancecoin",
+    "LTC": "litecoin",
+    "TRX": "tron",
+    "XRP": "ripple",
+    "ADA": "cardano",
+    "DOGE": "dogecoin",
+    "SOL": "solana",
+    "DOT": "polkadot",
+    "MATIC": "matic-network",
+    "LINK": "chainlink",
+    "AVAX": "avalanche-2",
+    "USDT": "tether",
+    "BUSD": "binance-usd",
+    "USDC": "usd-coin",
+}
+
+#: Binance quote asset -> Coingecko vs currency. Stablecoins are priced in dollars.
+VS_CURRENCIES = {
+    "USDT": "usd",
+    "BUSD": "usd",
+    "USDC": "usd",
+    "TUSD": "usd",
+    "BTC": "btc",
+    "ETH": "eth",
+    "BNB": "bnb",
+    "EUR": "eur",
+    "GBP": "gbp",
+    "TRY": "try",
+}
+
+
+def split_pair(pair: str) -> Optional[Tuple[str, str]]:
+    """Split a Binance pair to base and quote assets by the known quote assets, e.g. ETHBTC -> (ETH, BTC)."""
+    for quote in sorted(VS_CURRENCIES, key=len, reverse=True):
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[:-len(quote)], quote
+    return None
+
+
+def get_coingecko_id(base: str, quote: str) -> Optional[Tuple[str, str]]:
+    """Map assets to (coin id, vs currency), or None if Coingecko cannot price the pair."""
+    coin_id = COINGECKO_IDS.get(base)
+    vs_currency = VS_CURRENCIES.get(quote)
+    if coin_id is None or vs_currency is None:
+        return None
+    return coin_id, vs_currency
+
+
+def fetch_coingecko_prices(pairs: Iterable[Tuple[str, str, str]]) -> Dict[str, Decimal]:
+    """Get prices of many pairs in a single Coingecko request.
+
+    :param pairs: (Binance pair, base asset, quote asset) tuples
+    :return: Binance pair -> price, pairs Coingecko does not know are left out
     """
+    from pycoingecko import CoinGeckoAPI
+
+    wanted = {}
+    for pair, base, quote in pairs:
+        ids = get_coingecko_id(base, quote)
+        if ids:
+            wanted[pair] = ids
+
+    if not wanted:
+        return {}
+
+    coin_ids = sorted({coin_id for coin_id, vs in wanted.values()})
+    vs_currencies = sorted({vs for coin_id, vs in wanted.values()})
+    data = CoinGeckoAPI().get_price(ids=coin_ids, vs_currencies=vs_currencies)
+
+    prices = {}
+    for pair, (coin_id, vs_currency) in wanted.items():
+        price = data.get(coin_id, {}).get(vs_currency)
+        if price is not None:
+            prices[pair] = Decimal(str(price))
+    return prices
 
 
+def fetch_coingecko_price(pair: str) -> Optional[Decimal]:
+    """Get the market midprice from Coingecko.
+
+    :param pair: Binance trading pair
+    :return: None if Coingecko cannot price the pair
+    """
+    assets = split_pair(pair)
+    if assets is None:
+        return None
+    return fetch_coingecko_prices([(pair, *assets)]).get(pair)
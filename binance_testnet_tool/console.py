@@ -1,11 +1,16 @@
 """Console helpers"""
 import json
-from pygments import highlight, lexers, formatters
 
 
-def print_colorful_json(data: dict):
-    """Colored dump JSON object to stdout."""
+def format_colorful_json(data: dict) -> str:
+    """Indented and colored JSON for a terminal."""
     # https://stackoverflow.com/a/32166163/315168
+    # Pygments is slow to import, so only pay for it when we print
+    from pygments import highlight, lexers, formatters
     formatted_json = json.dumps(data, sort_keys=True, indent=4)
-    colorful_json = highlight(formatted_json, lexers.JsonLexer(), formatters.TerminalFormatter())
-    print(colorful_json)
+    return highlight(formatted_json, lexers.JsonLexer(), formatters.TerminalFormatter())
+
+
+def print_colorful_json(data: dict):
+    """Colored dump JSON object to stdout."""
+    print(format_colorful_json(data))
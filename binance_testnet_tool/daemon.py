@@ -0,0 +1,181 @@
+"""Persistent command server over a Unix domain socket.
+
+``binance-testnet-tool serve`` keeps the Binance client, its HTTP connection pool, exchange info
+and order book streams warm. Thin clients forward the command line of a subcommand to the server,
+which runs the command in its warm process and sends back the output.
+
+The protocol is one JSON line per request and response::
+
+    {"args": ["depth", "--market", "BTCUSDT"]}
+    {"exit_code": 0, "output": "Top ask is ..."}
+
+This module is kept free of heavy imports, so that the thin client starts fast::
+
+    python -m binance_testnet_tool.daemon depth --market BTCUSDT
+
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from typing import Callable, List, Optional, Tuple
+
+
+logger = logging.getLogger()
+
+#: Commands that cannot be forwarded, because they are interactive, stream forever
+#: or start and stop the websocket manager the server shares with its live streams
+LOCAL_ONLY_COMMANDS = {"serve", "console", "order-event-stream", "record", "load-test", "version"}
+
+#: Global options of the main command that configure the client.
+#: A forwarded command runs with the client of the server, so these cannot be given with ``--use-daemon``.
+SERVER_OPTIONS = (
+    "api_key", "api_secret", "network", "config_file", "async_", "dump_file", "dump_every", "dump_body_limit",
+    "print_metrics", "metrics_port", "sync_clock", "recv_window",
+)
+
+
+def get_default_socket_path() -> str:
+    """Where the server listens, can be overridden with ``BINANCE_TOOL_SOCKET`` environment variable."""
+    default = os.path.join(os.path.expanduser("~"), ".cache", "binance-testnet-tool", "daemon.sock")
+    return os.environ.get("BINANCE_TOOL_SOCKET", default)
+
+
+def run_captured(run_command: Callable[[List[str]], None], args: List[str]) -> Tuple[int, str]:
+    """Run a command capturing what it prints.
+
+    :return: (exit code, output)
+    """
+    import click
+
+    output = io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            run_command(args)
+        except click.ClickException as e:
+            output.write(f"Error: {e.format_message()}\n")
+            exit_code = e.exit_code
+        except click.exceptions.Exit as e:
+            exit_code = e.exit_code
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            output.write(traceback.format_exc())
+            exit_code = 1
+    return exit_code, output.getvalue()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            args = request["args"]
+            logger.info("Running %s", " ".join(args))
+            # Commands print to the process-wide stdout and share the global client, so run them one at a time
+            with self.server.command_lock:
+                exit_code, output = run_captured(self.server.run_command, args)
+            self.wfile.write(json.dumps({"exit_code": exit_code, "output": output}).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class CommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Accept thin client connections, each connection can send many commands."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, run_command: Callable[[List[str]], None]):
+        """
+        :param run_command: Run a subcommand with its arguments in the warm process
+        """
+        self.run_command = run_command
+        self.command_lock = threading.Lock()
+        self.socket_path = socket_path
+
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            if is_server_running(socket_path):
+                raise RuntimeError(f"Server already running at {socket_path}")
+            os.unlink(socket_path)
+
+        super().__init__(socket_path, _Handler)
+        # The server can trade with our API key, keep other users out
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def is_server_running(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+class ThinClient:
+    """Forward commands to a running server over one persistent connection.
+
+    Python test harnesses can keep an instance around to get per-command latency of a few milliseconds.
+    """
+
+    def __init__(self, socket_path: str = None):
+        self.socket_path = socket_path or get_default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+        self.reader = self.sock.makefile("rb")
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def run(self, args: List[str]) -> Tuple[int, str]:
+        """Run a subcommand on the server.
+
+        :return: (exit code, output)
+        """
+        self.sock.sendall(json.dumps({"args": args}).encode("utf-8") + b"\n")
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        response = json.loads(line)
+        return response["exit_code"], response["output"]
+
+
+def forward_command(args: List[str], socket_path: str = None) -> Optional[Tuple[int, str]]:
+    """Run a subcommand on the server if one is running.
+
+    :return: (exit code, output) or None if there is no server to forward to
+    """
+    try:
+        client = ThinClient(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    try:
+        return client.run(args)
+    finally:
+        client.close()
+
+
+def main():
+    result = forward_command(sys.argv[1:])
+    if result is None:
+        sys.exit(f"No server running at {get_default_socket_path()}, start one with: binance-testnet-tool serve")
+    exit_code, output = result
+    sys.stdout.write(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
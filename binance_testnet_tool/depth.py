@@ -1,10 +1,16 @@
 """Binance spot testnet depth tools."""
 import enum
 import logging
-from binance.client import Client
+from typing import Optional, TYPE_CHECKING
 
 from dataclasses import dataclass
 
+from binance_testnet_tool.orderbook import BookSide, OrderBook, fetch_order_book
+from binance_testnet_tool.symbols import get_symbol_registry
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
 
 logger = logging.getLogger()
 
@@ -27,42 +33,42 @@ class SideDepthInfo:
     base_asset: str = None
     quote_asset: str = None
 
+    def fill_from_book_side(self, book_side: BookSide):
+        """Read the depth figures from the prefix sums of the order book side."""
+        top = book_side.top()
+        if top is None:
+            self.empty = True
+            return
+
+        self.empty = False
+        self.top_order_price, self.top_order_quantity = top
+        self.cumulative_depth = book_side.total_quantity()
+        self.total_liquidity = book_side.total_notional()
+        self.avg_price = self.total_liquidity / self.cumulative_depth
+
 
-def get_depth_info(client: Client, market: str, side: Side) -> SideDepthInfo:
-    """Extract some simple depth information about the visible order book."""
+def get_depth_info(client: "Client", market: str, side: Side, book: Optional[OrderBook] = None) -> SideDepthInfo:
+    """Extract some simple depth information about the visible order book.
+
+    :param book: Read from an already loaded or streamed order book instead of fetching a new REST snapshot
+    """
 
     info = SideDepthInfo(side=side)
-    pair_info = client.get_symbol_info(market)
+    pair_info = get_symbol_registry(client, symbol=market).get_symbol_info(market)
 
     info.base_asset = pair_info["baseAsset"]
     info.quote_asset = pair_info["quoteAsset"]
 
-    depth = client.get_order_book(symbol=market)
+    if book is None:
+        book = fetch_order_book(client, market)
 
     if side == Side.ask:
-        side_data = sorted(depth["asks"], key=lambda x: float(x[0]))
+        book_side = book.asks
     elif side == Side.bid:
-        side_data = sorted(depth["bids"], key=lambda x: -float(x[0]))
+        book_side = book.bids
     else:
         raise RuntimeError(f"Unknown side {side}")
 
     info.market_order_name = "market buy" if side == Side.ask else "market sell"
-
-    if not side_data:
-        info.empty = True
-    else:
-        top, top_quantity = side_data[0]
-        info.top_order_price = float(top)
-        info.top_order_quantity = float(top_quantity)
-        cumulative_depth = total_liquidity = 0
-        for price, quantity in side_data:
-            price = float(price)
-            quantity = float(quantity)
-            total_liquidity += price * quantity
-            cumulative_depth += quantity
-
-        info.avg_price = total_liquidity / cumulative_depth
-        info.cumulative_depth = cumulative_depth
-        info.total_liquidity = total_liquidity
-
+    info.fill_from_book_side(book_side)
     return info
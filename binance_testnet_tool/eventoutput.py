@@ -0,0 +1,88 @@
+"""Writing stream events out without slowing down the websocket.
+
+The websocket callback only filters the event by its type and queues it.
+Formatting and writing happen on a separate thread, which flushes the output
+when it has caught up with the queue instead of after every event.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+from collections import Counter
+from typing import Collection, IO, Optional
+
+from binance_testnet_tool.console import format_colorful_json
+
+
+logger = logging.getLogger()
+
+#: pretty is indented and colored JSON for reading in a terminal, jsonl is one compact JSON object per line
+OUTPUT_FORMATS = ("auto", "pretty", "jsonl")
+
+
+def resolve_format(fmt: str, output: IO[str]) -> str:
+    """Pretty print for terminals, JSON lines when the output is piped or written to a file."""
+    if fmt != "auto":
+        return fmt
+    isatty = getattr(output, "isatty", None)
+    return "pretty" if isatty and isatty() else "jsonl"
+
+
+class EventWriter:
+    """Write stream events from a background thread."""
+
+    def __init__(self, output: IO[str] = None, fmt: str = "auto", events: Optional[Collection[str]] = None, keys: Optional[Collection[str]] = None):
+        """
+        :param fmt: One of :py:data:`OUTPUT_FORMATS`
+        :param events: Write only these event types, e.g. ``executionReport``, None for all
+        :param keys: Write only these keys of the events, e.g. ``e``, ``s``, ``X``, None for all
+        """
+        self.output = output or sys.stdout
+        self.format = resolve_format(fmt, self.output)
+        self.events = set(events) if events else None
+        self.keys = list(keys) if keys else None
+        self.queue = queue.SimpleQueue()
+        #: Written events by type
+        self.counts = Counter()
+        #: Events skipped by the event type filter
+        self.filtered = 0
+        self.thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Write out the queued events."""
+        self.queue.put(None)
+        self.thread.join()
+        self.output.flush()
+
+    def process_message(self, msg: dict):
+        """Websocket callback."""
+        if self.events is not None and msg.get("e") not in self.events:
+            self.filtered += 1
+            return
+        self.queue.put(msg)
+
+    def format_event(self, msg: dict) -> str:
+        if self.keys is not None:
+            msg = {k: msg[k] for k in self.keys if k in msg}
+        if self.format == "pretty":
+            return format_colorful_json(msg) + "\n"
+        return json.dumps(msg, separators=(",", ":")) + "\n"
+
+    def _run(self):
+        write = self.output.write
+        while True:
+            msg = self.queue.get()
+            if msg is None:
+                return
+            try:
+                write(self.format_event(msg))
+            except Exception:
+                logger.exception("Could not write event %s", msg)
+                continue
+            self.counts[msg.get("e")] += 1
+            if self.queue.empty():
+                self.output.flush()
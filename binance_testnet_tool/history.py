@@ -0,0 +1,276 @@
+"""Historical klines and aggregate trades downloader.
+
+The requested time range is split into windows that each fit in one or a few API pages.
+Windows are fetched concurrently, within the request weight budget of the shared rate limiter,
+and written to a local SQLite database.
+
+Windows of a symbol are written in time order even if they complete out of order, so the last stored
+timestamp is always a gap free watermark. Later runs resume from it, so only the new data is downloaded,
+also after an interrupted run. Rows are keyed by their open time or aggregate trade id,
+so re-downloading an overlapping window does not duplicate anything.
+"""
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from binance_testnet_tool.requesthelpers import set_pool_size
+from binance_testnet_tool.symbols import get_cache_dir
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+logger = logging.getLogger()
+
+#: Data types that can be downloaded
+HISTORY_KINDS = ("klines", "aggtrades")
+
+#: Most rows Binance returns per request
+PAGE_LIMIT = 1000
+
+#: aggTrades refuses startTime and endTime more than an hour apart
+AGG_TRADES_WINDOW_MS = 60 * 60 * 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS klines (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    open_time INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    close_time INTEGER NOT NULL,
+    quote_volume REAL NOT NULL,
+    trades INTEGER NOT NULL,
+    taker_buy_volume REAL NOT NULL,
+    taker_buy_quote_volume REAL NOT NULL,
+    PRIMARY KEY (symbol, interval, open_time)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS agg_trades (
+    symbol TEXT NOT NULL,
+    agg_id INTEGER NOT NULL,
+    price REAL NOT NULL,
+    quantity REAL NOT NULL,
+    first_trade_id INTEGER NOT NULL,
+    last_trade_id INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    is_buyer_maker INTEGER NOT NULL,
+    PRIMARY KEY (symbol, agg_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS agg_trades_time ON agg_trades (symbol, time);
+"""
+
+
+def get_default_db_path() -> str:
+    return os.path.join(get_cache_dir(), "history.sqlite")
+
+
+class HistoryStore:
+    """SQLite database of downloaded market data.
+
+    Not thread safe, all writes happen on the thread that created the store.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_last_kline_time(self, symbol: str, interval: str) -> Optional[int]:
+        """Open time of the newest stored candle."""
+        row = self.conn.execute("SELECT MAX(open_time) FROM klines WHERE symbol = ? AND interval = ?", (symbol, interval)).fetchone()
+        return row[0]
+
+    def get_last_agg_trade_time(self, symbol: str) -> Optional[int]:
+        row = self.conn.execute("SELECT MAX(time) FROM agg_trades WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0]
+
+    def insert_klines(self, symbol: str, interval: str, klines: List[list]) -> int:
+        """Store klines as returned by ``GET /api/v3/klines``.
+
+        Candles already stored are replaced, as the newest one may have been stored while still open.
+
+        :return: Number of written rows
+        """
+        rows = [(symbol, interval, k[0], float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]), k[6], float(k[7]), k[8], float(k[9]), float(k[10])) for k in klines]
+        with self.conn:
+            cursor = self.conn.executemany("INSERT OR REPLACE INTO klines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return cursor.rowcount
+
+    def insert_agg_trades(self, symbol: str, trades: List[dict]) -> int:
+        """Store trades as returned by ``GET /api/v3/aggTrades``.
+
+        :return: Number of new rows
+        """
+        rows = [(symbol, t["a"], float(t["p"]), float(t["q"]), t["f"], t["l"], t["T"], int(t["m"])) for t in trades]
+        with self.conn:
+            cursor = self.conn.executemany("INSERT OR IGNORE INTO agg_trades VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return cursor.rowcount
+
+
+@dataclass
+class DownloadWindow:
+    """A time range of one symbol fetched by one worker."""
+
+    symbol: str
+    start: int
+    #: Inclusive, milliseconds
+    end: int
+    #: Position among the windows of the symbol
+    index: int = 0
+
+
+@dataclass
+class DownloadResult:
+    """Totals of a symbol after a download."""
+
+    symbol: str
+    windows: int = 0
+    requests: int = 0
+    fetched: int = 0
+    written: int = 0
+    #: Where the download started after resuming, milliseconds
+    resumed_from: Optional[int] = None
+
+    @staticmethod
+    def get_headers() -> List[str]:
+        return ["Market", "Resumed from", "Windows", "Requests", "Rows fetched", "Rows written"]
+
+    def get_row(self) -> list:
+        resumed = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.resumed_from / 1000)) if self.resumed_from else None
+        return [self.symbol, resumed, self.windows, self.requests, self.fetched, self.written]
+
+
+def split_windows(symbol: str, start: int, end: int, window_ms: int) -> List[DownloadWindow]:
+    """Split [start, end] to consecutive windows of at most window_ms."""
+    windows = []
+    while start <= end:
+        window_end = min(start + window_ms - 1, end)
+        windows.append(DownloadWindow(symbol, start, window_end, len(windows)))
+        start = window_end + 1
+    return windows
+
+
+def fetch_kline_window(client: "Client", interval: str, window: DownloadWindow) -> Tuple[list, int]:
+    """Fetch the candles of a window.
+
+    :return: (klines, requests made)
+    """
+    klines = client.get_klines(symbol=window.symbol, interval=interval, startTime=window.start, endTime=window.end, limit=PAGE_LIMIT)
+    return klines, 1
+
+
+def fetch_agg_trade_window(client: "Client", window: DownloadWindow) -> Tuple[list, int]:
+    """Fetch the trades of a window, paging by trade id if there are more than fit one page.
+
+    :return: (trades, requests made)
+    """
+    trades = client.get_aggregate_trades(symbol=window.symbol, startTime=window.start, endTime=window.end, limit=PAGE_LIMIT)
+    requests = 1
+    page = trades
+    while len(page) == PAGE_LIMIT:
+        page = client.get_aggregate_trades(symbol=window.symbol, fromId=page[-1]["a"] + 1, limit=PAGE_LIMIT)
+        requests += 1
+        page = [t for t in page if t["T"] <= window.end]
+        trades.extend(page)
+    return trades, requests
+
+
+def download_history(
+        client: "Client",
+        store: HistoryStore,
+        kind: str,
+        symbols: Iterable[str],
+        start: int,
+        end: int,
+        interval: str = "1m",
+        workers: int = 8,
+        progress: Callable[[int, int], None] = None) -> List[DownloadResult]:
+    """Download klines or aggregate trades of many symbols into the store.
+
+    :param kind: One of :py:data:`HISTORY_KINDS`
+    :param start: Milliseconds, the download resumes from the stored data if it is later
+    :param end: Milliseconds, inclusive
+    :param interval: Kline interval like 1m or 1h
+    :param progress: Called with (windows done, windows total) after each window
+    """
+    from binance.helpers import interval_to_milliseconds
+
+    if kind not in HISTORY_KINDS:
+        raise RuntimeError(f"Unknown history kind {kind}")
+
+    results = {}
+    windows = []
+    if kind == "klines":
+        interval_ms = interval_to_milliseconds(interval)
+        if not interval_ms:
+            raise RuntimeError(f"Unknown kline interval {interval}")
+        window_ms = interval_ms * PAGE_LIMIT
+    else:
+        window_ms = AGG_TRADES_WINDOW_MS
+
+    for symbol in symbols:
+        result = results[symbol] = DownloadResult(symbol)
+        # Resume from the last stored row itself: the newest candle may have been stored while still open,
+        # and the previous run may have stopped between trades of the same millisecond
+        if kind == "klines":
+            resume_at = store.get_last_kline_time(symbol, interval)
+        else:
+            resume_at = store.get_last_agg_trade_time(symbol)
+        symbol_start = start
+        if resume_at is not None and resume_at > start:
+            symbol_start = result.resumed_from = resume_at
+        symbol_windows = split_windows(symbol, symbol_start, end, window_ms)
+        result.windows = len(symbol_windows)
+        windows.extend(symbol_windows)
+
+    set_pool_size(client, workers)
+
+    def _fetch(window: DownloadWindow) -> Tuple[DownloadWindow, list, int]:
+        if kind == "klines":
+            return (window, *fetch_kline_window(client, interval, window))
+        return (window, *fetch_agg_trade_window(client, window))
+
+    def _write(window: DownloadWindow, rows: list):
+        result = results[window.symbol]
+        if kind == "klines":
+            result.written += store.insert_klines(window.symbol, interval, rows)
+        else:
+            result.written += store.insert_agg_trades(window.symbol, rows)
+
+    #: symbol -> index of the next window to write
+    next_index = {symbol: 0 for symbol in results}
+    #: (symbol, index) -> fetched rows waiting for the earlier windows
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fetch, w) for w in windows]
+        for done, future in enumerate(as_completed(futures), start=1):
+            window, rows, requests = future.result()
+            result = results[window.symbol]
+            result.requests += requests
+            result.fetched += len(rows)
+            pending[(window.symbol, window.index)] = (window, rows)
+            # Writes stay on this thread, SQLite connections cannot be shared between threads
+            while (window.symbol, next_index[window.symbol]) in pending:
+                _write(*pending.pop((window.symbol, next_index[window.symbol])))
+                next_index[window.symbol] += 1
+            if progress:
+                progress(done, len(windows))
+
+    return list(results.values())
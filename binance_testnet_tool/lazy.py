@@ -0,0 +1,38 @@
+"""Deferred object construction."""
+import threading
+from typing import Callable
+
+
+class LazyProxy:
+    """Stand-in that constructs the real object on the first attribute access.
+
+    Lets commands like ``version`` run without paying for the Binance client construction.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _get_target(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, "_target", self._factory())
+                target = self._target
+        return target
+
+    def is_created(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._get_target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_target(), name, value)
+
+    def __repr__(self):
+        if self._target is None:
+            return f"<LazyProxy for {self._factory}>"
+        return repr(self._target)
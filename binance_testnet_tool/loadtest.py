@@ -0,0 +1,154 @@
+"""Order placement load generator.
+
+Places orders at a steady rate from a pool of worker threads sharing one client and its HTTP connection pool,
+and measures how long each order takes to be acknowledged.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, List, Optional, TYPE_CHECKING
+
+from binance_testnet_tool.ordertracker import OrderLatencyTracker
+from binance_testnet_tool.quantize import SymbolQuantizer
+from binance_testnet_tool.stats import LatencySummary
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+logger = logging.getLogger()
+
+
+@dataclass
+class LoadTestResult:
+    """Collected measurements of a load test run."""
+
+    #: Order ack latencies of accepted orders, seconds
+    latencies: List[float] = field(default_factory=list)
+    #: Ids of the accepted orders
+    order_ids: List[int] = field(default_factory=list)
+    #: Binance error code -> count
+    rejections: Counter = field(default_factory=Counter)
+    #: Non-API failures like timeouts
+    errors: int = 0
+    started_at: float = 0
+    ended_at: float = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def accepted(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def rejected(self) -> int:
+        return sum(self.rejections.values())
+
+    @property
+    def duration(self) -> float:
+        return self.ended_at - self.started_at
+
+    def get_throughput(self) -> float:
+        """Accepted orders per second."""
+        if not self.duration:
+            return 0
+        return self.accepted / self.duration
+
+    def get_latency_summary(self) -> LatencySummary:
+        return LatencySummary.from_samples(self.latencies)
+
+
+def make_price_ladder(quantizer: SymbolQuantizer, mid_price: float, side: str, levels: int, step_bps: float) -> List[Decimal]:
+    """Prices stepping away from the mid price on the passive side of the book.
+
+    Buys are placed below and sells above the mid price, so that the orders rest on the book.
+    """
+    # binance.enums.SIDE_BUY
+    direction = -1 if side == "BUY" else 1
+    return [
+        quantizer.quantize_price(mid_price * (1 + direction * step_bps * (i + 1) / 10000))
+        for i in range(levels)
+    ]
+
+
+def run_load_test(
+        client: "Client",
+        make_order: Callable[[int], dict],
+        rate: float,
+        duration: float,
+        concurrency: int,
+        max_orders: Optional[int] = None,
+        tracker: Optional[OrderLatencyTracker] = None) -> LoadTestResult:
+    """Fire orders at a target rate.
+
+    :param make_order: Gets a sequence number and returns ``client.create_order()`` keyword arguments
+    :param rate: Orders per second
+    :param duration: How long to keep sending orders, seconds
+    :param concurrency: Maximum orders in flight
+    :param max_orders: Stop after this many orders
+    :param tracker: Record order send and ack times for correlating them with user data stream events
+    """
+    from binance.exceptions import BinanceAPIException
+    from binance_testnet_tool.ratelimit import get_request_weight
+
+    result = LoadTestResult()
+    in_flight = threading.BoundedSemaphore(concurrency)
+    # The local exchange has no rate limiter
+    limiter = getattr(client, "rate_limiter", None)
+    order_uri = client._create_api_uri("order")
+
+    def _place(params: dict):
+        client_order_id = params.get("newClientOrderId")
+        try:
+            if limiter:
+                # Waiting for the limiter is not order latency
+                limiter.acquire_ahead(*get_request_weight("POST", order_uri, params))
+            if tracker:
+                tracker.record_send(client_order_id)
+            started = time.perf_counter()
+            order = client.create_order(**params)
+            latency = time.perf_counter() - started
+            if tracker:
+                tracker.record_ack(client_order_id)
+            with result.lock:
+                result.latencies.append(latency)
+                result.order_ids.append(order["orderId"])
+        except BinanceAPIException as e:
+            with result.lock:
+                result.rejections[e.code] += 1
+            logger.debug("Order rejected: %s", e)
+        except Exception as e:
+            with result.lock:
+                result.errors += 1
+            logger.warning("Order failed: %s", e)
+        finally:
+            if limiter:
+                # Unused if the order failed before it was sent
+                limiter.prepaid.cost = None
+            in_flight.release()
+
+    interval = 1.0 / rate
+    result.started_at = time.time()
+    deadline = time.perf_counter() + duration
+    next_at = time.perf_counter()
+    seq = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while time.perf_counter() < deadline and (max_orders is None or seq < max_orders):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            params = make_order(seq)
+            if tracker:
+                params["newClientOrderId"] = tracker.new_client_order_id()
+            # Do not queue orders behind slow ones, the queue time would not show in the latency
+            in_flight.acquire()
+            executor.submit(_place, params)
+            seq += 1
+            next_at += interval
+
+    result.ended_at = time.time()
+    return result
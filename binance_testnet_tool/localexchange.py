@@ -0,0 +1,908 @@
+"""Local stand-in for Binance Spot Testnet.
+
+:py:class:`LocalExchange` keeps order books, balances and orders in the process and answers the REST
+endpoints this tool uses. :py:class:`LocalClient` is a python-binance ``Client`` whose requests go to the local
+exchange instead of the network, and :py:class:`LocalWebsocketManager` delivers user data and market data
+events like ``ThreadedWebsocketManager`` does. Use them with ``--network local``.
+
+The order books are seeded with synthetic liquidity around a reference price, or replayed from files written
+by the ``record`` command with :py:class:`ReplayFeeder`. Replayed depth diffs set the price levels of a replay
+account and replayed trades take liquidity, filling our resting orders when the market trades through them.
+
+The local exchange does not charge fees or enforce rate limits. Signatures are not checked.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from binance.client import BaseClient, Client
+from binance.exceptions import BinanceAPIException
+
+from binance_testnet_tool.matching import BUY, DECIMALS, SELL, MatchingEngine, Order, Trade
+from binance_testnet_tool.recorder import read_records
+
+
+logger = logging.getLogger()
+
+#: Used as the API URL of the local network, never connected to
+LOCAL_API_URL = "local://exchange/api"
+
+LOCAL_STREAM_URL = "local://exchange/ws/"
+
+#: symbol: (base asset, quote asset, tick size, step size, min notional, reference price for seeding)
+DEFAULT_SYMBOLS = {
+    "BTCUSDT": ("BTC", "USDT", "0.01", "0.000001", "10", "50000"),
+    "ETHUSDT": ("ETH", "USDT", "0.01", "0.00001", "10", "3000"),
+    "BNBUSDT": ("BNB", "USDT", "0.01", "0.001", "10", "400"),
+    "ETHBTC": ("ETH", "BTC", "0.000001", "0.0001", "0.0001", "0.06"),
+}
+
+#: Starting balances of the user account, like a fresh Spot Testnet account
+DEFAULT_BALANCES = {
+    "BNB": "1000",
+    "BTC": "1",
+    "ETH": "100",
+    "USDT": "10000",
+}
+
+#: Owner of the synthetic liquidity
+MAKER = "_maker"
+
+#: Owner of the replayed liquidity
+REPLAY = "_replay"
+
+#: Synthetic liquidity levels per side
+DEFAULT_SEED_LEVELS = 20
+
+ZERO = Decimal(0)
+
+#: https://api.binance.com/sapi/v1/system/status -> system/status
+_ENDPOINT_PATH = re.compile(r"/s?api/v\d+/(.*)$")
+
+
+class _Response:
+    """Enough of requests.Response for BinanceAPIException."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.request = None
+
+
+def _api_error(code: int, msg: str, status_code: int = 400) -> BinanceAPIException:
+    text = json.dumps({"code": code, "msg": msg})
+    return BinanceAPIException(_Response(text), status_code, text)
+
+
+def _format_amount(amount: Decimal) -> str:
+    return format(amount.quantize(DECIMALS), "f")
+
+
+def _make_exchange_info(symbols: Dict[str, tuple]) -> dict:
+    return {
+        "timezone": "UTC",
+        "serverTime": int(time.time() * 1000),
+        "rateLimits": [],
+        "exchangeFilters": [],
+        "symbols": [
+            {
+                "symbol": symbol,
+                "status": "TRADING",
+                "baseAsset": base,
+                "baseAssetPrecision": 8,
+                "quoteAsset": quote,
+                "quotePrecision": 8,
+                "quoteAssetPrecision": 8,
+                "orderTypes": ["LIMIT", "MARKET"],
+                "icebergAllowed": False,
+                "ocoAllowed": False,
+                "isSpotTradingAllowed": True,
+                "isMarginTradingAllowed": False,
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "minPrice": tick, "maxPrice": "1000000.00000000", "tickSize": tick},
+                    {"filterType": "LOT_SIZE", "minQty": step, "maxQty": "9000.00000000", "stepSize": step},
+                    {"filterType": "MIN_NOTIONAL", "minNotional": min_notional, "applyToMarket": True, "avgPriceMins": 5},
+                    {"filterType": "MARKET_LOT_SIZE", "minQty": "0.00000000", "maxQty": "100.00000000", "stepSize": "0.00000000"},
+                ],
+                "permissions": ["SPOT"],
+            } for symbol, (base, quote, tick, step, min_notional, reference_price) in symbols.items()
+        ],
+    }
+
+
+class _Symbol:
+    """Matching engine and unit conversions of a symbol."""
+
+    def __init__(self, symbol: str, base: str, quote: str, tick: str, step: str, min_notional: str, reference_price: str):
+        self.symbol = symbol
+        self.base = base
+        self.quote = quote
+        self.tick_size = Decimal(tick)
+        self.step_size = Decimal(step)
+        self.min_notional = Decimal(min_notional)
+        self.reference_price = Decimal(reference_price)
+        self.engine = MatchingEngine(symbol, self.tick_size, self.step_size)
+        #: Depth stream update id, moves every time the book changes
+        self.update_id = 1
+        self.last_price: Optional[int] = None
+
+    def to_ticks(self, price, rounding=None) -> int:
+        """Convert a decimal price to ticks.
+
+        :param rounding: Round to the nearest tick, otherwise the price must align with the tick size
+        """
+        ticks = Decimal(price) / self.tick_size
+        if rounding:
+            return int(ticks.to_integral_value(rounding=rounding))
+        if ticks != ticks.to_integral_value():
+            raise _api_error(-1013, "Filter failure: PRICE_FILTER")
+        return int(ticks)
+
+    def to_lots(self, quantity, rounding=None) -> int:
+        lots = Decimal(quantity) / self.step_size
+        if rounding:
+            return int(lots.to_integral_value(rounding=rounding))
+        if lots != lots.to_integral_value():
+            raise _api_error(-1013, "Filter failure: LOT_SIZE")
+        return int(lots)
+
+    def get_base_amount(self, lots: int) -> Decimal:
+        return lots * self.step_size
+
+    def get_quote_amount(self, quote: int) -> Decimal:
+        return quote * self.tick_size * self.step_size
+
+
+class LocalExchange:
+    """Order books, accounts and event streams of the local network.
+
+    Thread safe, all requests are serialized with one lock.
+    """
+
+    def __init__(self, symbols: Dict[str, tuple] = None, balances: Dict[str, str] = None, seed_levels: int = DEFAULT_SEED_LEVELS):
+        """
+        :param symbols: Symbol definitions, see :py:data:`DEFAULT_SYMBOLS`
+        :param balances: Starting balances of every user account
+        :param seed_levels: Synthetic liquidity levels to place on both sides of each book, zero for empty books
+        """
+        symbols = symbols or DEFAULT_SYMBOLS
+        self.exchange_info = _make_exchange_info(symbols)
+        self.symbols = {name: _Symbol(name, *spec) for name, spec in symbols.items()}
+        self.starting_balances = {asset: Decimal(amount) for asset, amount in (balances or DEFAULT_BALANCES).items()}
+        #: owner: asset: [free, locked]
+        self.accounts: Dict[str, Dict[str, List[Decimal]]] = {}
+        #: All orders ever placed by the user accounts, by order id
+        self.orders: Dict[int, Order] = {}
+        self.client_order_ids: Dict[Tuple[str, str, str], Order] = {}
+        self.next_order_id = 1
+        #: Listen key -> owner
+        self.listen_keys: Dict[str, str] = {}
+        #: Callbacks receiving (stream name, message) for every published event
+        self.listeners: List[Callable[[str, dict], None]] = []
+        #: (symbol, side, ticks) -> resting replayed liquidity
+        self.replay_orders: Dict[Tuple[str, str, int], Order] = {}
+        self.lock = threading.RLock()
+
+        for symbol in self.symbols.values():
+            if seed_levels:
+                self.seed_liquidity(symbol.symbol, symbol.reference_price, seed_levels)
+
+    def add_listener(self, listener: Callable[[str, dict], None]):
+        """Receive all events as (stream name, message).
+
+        User data streams are named ``user:<owner>``, market data streams like ``btcusdt@depth``.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, dict], None]):
+        with self.lock:
+            self.listeners.remove(listener)
+
+    def _publish(self, stream: str, msg: dict):
+        for listener in self.listeners:
+            listener(stream, msg)
+
+    def _get_symbol(self, params: dict) -> _Symbol:
+        name = params.get("symbol")
+        if not name:
+            raise _api_error(-1102, "Mandatory parameter 'symbol' was not sent, was empty/null, or malformed.")
+        symbol = self.symbols.get(name)
+        if symbol is None:
+            raise _api_error(-1121, "Invalid symbol.")
+        return symbol
+
+    def _get_account(self, owner: str) -> Optional[Dict[str, List[Decimal]]]:
+        """Balances of a user account, None for the internal liquidity accounts that have unlimited funds."""
+        if owner.startswith("_"):
+            return None
+        account = self.accounts.get(owner)
+        if account is None:
+            account = self.accounts[owner] = {asset: [amount, ZERO] for asset, amount in self.starting_balances.items()}
+        return account
+
+    def _get_balance(self, account: Dict[str, List[Decimal]], asset: str) -> List[Decimal]:
+        balance = account.get(asset)
+        if balance is None:
+            balance = account[asset] = [ZERO, ZERO]
+        return balance
+
+    #
+    # Order handling
+    #
+
+    def _lock_funds(self, symbol: _Symbol, order: Order, account: Dict[str, List[Decimal]]):
+        """Reserve the funds of a limit order.
+
+        Market orders pay as they fill, so they are only checked against the free balance.
+        """
+        if order.side == BUY:
+            asset = symbol.quote
+            if order.type == "LIMIT":
+                amount = symbol.get_quote_amount(order.price * order.quantity)
+            else:
+                # Exact, as the book cannot change before the order is matched
+                amount = symbol.get_quote_amount(symbol.engine.get_fill_cost(BUY, order.quantity))
+        else:
+            asset = symbol.base
+            amount = symbol.get_base_amount(order.quantity)
+        balance = self._get_balance(account, asset)
+        if balance[0] < amount:
+            raise _api_error(-2010, "Account has insufficient balance for requested action.")
+        if order.type == "LIMIT":
+            balance[0] -= amount
+            balance[1] += amount
+
+    def _settle(self, symbol: _Symbol, order: Order, price: int, quantity: int, changed_assets: set):
+        """Move the funds of a fill of one side of a trade."""
+        account = self._get_account(order.owner)
+        if account is None:
+            return
+        base = self._get_balance(account, symbol.base)
+        quote = self._get_balance(account, symbol.quote)
+        base_amount = symbol.get_base_amount(quantity)
+        cost = symbol.get_quote_amount(price * quantity)
+        if order.side == BUY:
+            base[0] += base_amount
+            if order.type == "LIMIT":
+                reserved = symbol.get_quote_amount(order.price * quantity)
+                quote[1] -= reserved
+                quote[0] += reserved - cost
+            else:
+                quote[0] -= cost
+        else:
+            quote[0] += cost
+            if order.type == "LIMIT":
+                base[1] -= base_amount
+            else:
+                base[0] -= base_amount
+        changed_assets.update([(order.owner, symbol.base), (order.owner, symbol.quote)])
+
+    def _release(self, symbol: _Symbol, order: Order, changed_assets: set):
+        """Return the reserved funds of the unfilled part of a closed limit order."""
+        account = self._get_account(order.owner)
+        if account is None or order.type != "LIMIT":
+            return
+        remaining = order.get_remaining()
+        if order.side == BUY:
+            asset = symbol.quote
+            amount = symbol.get_quote_amount(order.price * remaining)
+        else:
+            asset = symbol.base
+            amount = symbol.get_base_amount(remaining)
+        balance = self._get_balance(account, asset)
+        balance[0] += amount
+        balance[1] -= amount
+        changed_assets.add((order.owner, asset))
+
+    def _place(self, symbol: _Symbol, order: Order) -> List[Trade]:
+        """Match an order, move the funds and publish the events. Must hold the lock."""
+        engine = symbol.engine
+        user_owned = not order.owner.startswith("_")
+        changed_assets = set()
+        if user_owned:
+            self._lock_funds(symbol, order, self._get_account(order.owner))
+            changed_assets.update([(order.owner, symbol.base), (order.owner, symbol.quote)])
+
+        if user_owned:
+            self.orders[order.order_id] = order
+        trades = engine.submit(order)
+
+        reports = []
+        if user_owned:
+            reports.append((order.owner, engine.execution_report(order, "NEW", status="NEW", executed=0, quote=0)))
+
+        executed = quote = 0
+        for trade in trades:
+            executed += trade.quantity
+            quote += trade.price * trade.quantity
+            self._settle(symbol, trade.maker, trade.price, trade.quantity, changed_assets)
+            self._settle(symbol, order, trade.price, trade.quantity, changed_assets)
+            if not trade.maker.owner.startswith("_"):
+                reports.append((trade.maker.owner, engine.execution_report(trade.maker, "TRADE", trade)))
+            if user_owned:
+                status = "FILLED" if executed == order.quantity else "PARTIALLY_FILLED"
+                reports.append((order.owner, engine.execution_report(order, "TRADE", trade, status=status, executed=executed, quote=quote)))
+
+        if order.status == "EXPIRED":
+            self._release(symbol, order, changed_assets)
+            if user_owned:
+                reports.append((order.owner, engine.execution_report(order, "EXPIRED")))
+
+        if trades:
+            symbol.last_price = trades[-1].price
+        self._publish_events(symbol, reports, changed_assets, trades)
+        return trades
+
+    def _cancel(self, symbol: _Symbol, order: Order):
+        """Must hold the lock."""
+        symbol.engine.cancel(order.order_id)
+        changed_assets = set()
+        self._release(symbol, order, changed_assets)
+        reports = []
+        if not order.owner.startswith("_"):
+            reports.append((order.owner, symbol.engine.execution_report(order, "CANCELED")))
+        self._publish_events(symbol, reports, changed_assets, [])
+
+    def _publish_events(self, symbol: _Symbol, reports: List[Tuple[str, dict]], changed_assets: set, trades: List[Trade]):
+        engine = symbol.engine
+        changed_levels = engine.pop_changed_levels()
+        if changed_levels:
+            symbol.update_id += 1
+
+        if not self.listeners:
+            return
+
+        now = int(time.time() * 1000)
+        for owner, report in reports:
+            self._publish(f"user:{owner}", report)
+
+        owners = {owner for owner, asset in changed_assets}
+        for owner in owners:
+            account = self._get_account(owner)
+            balances = [
+                {"a": asset, "f": _format_amount(account[asset][0]), "l": _format_amount(account[asset][1])}
+                for o, asset in changed_assets if o == owner
+            ]
+            self._publish(f"user:{owner}", {"e": "outboundAccountPosition", "E": now, "u": now, "B": balances})
+
+        prefix = symbol.symbol.lower()
+        for trade in trades:
+            buyer, seller = (trade.maker, trade.taker) if trade.maker.side == BUY else (trade.taker, trade.maker)
+            self._publish(f"{prefix}@trade", {
+                "e": "trade",
+                "E": now,
+                "s": symbol.symbol,
+                "t": trade.trade_id,
+                "p": engine.format_price(trade.price),
+                "q": engine.format_quantity(trade.quantity),
+                "b": buyer.order_id,
+                "a": seller.order_id,
+                "T": now,
+                "m": trade.maker is buyer,
+                "M": True,
+            })
+
+        if changed_levels:
+            bids = [[engine.format_price(p), engine.format_quantity(q)] for side, p, q in changed_levels if side == BUY]
+            asks = [[engine.format_price(p), engine.format_quantity(q)] for side, p, q in changed_levels if side == SELL]
+            self._publish(f"{prefix}@depth", {
+                "e": "depthUpdate",
+                "E": now,
+                "s": symbol.symbol,
+                "U": symbol.update_id,
+                "u": symbol.update_id,
+                "b": bids,
+                "a": asks,
+            })
+            self._publish(f"{prefix}@bookTicker", self._get_book_ticker(symbol))
+
+    def _get_book_ticker(self, symbol: _Symbol) -> dict:
+        engine = symbol.engine
+        bid = engine.best_bid()
+        ask = engine.best_ask()
+        return {
+            "u": symbol.update_id,
+            "s": symbol.symbol,
+            "b": engine.format_price(bid or 0),
+            "B": engine.format_quantity(engine.get_level_quantity(BUY, bid) if bid else 0),
+            "a": engine.format_price(ask or 0),
+            "A": engine.format_quantity(engine.get_level_quantity(SELL, ask) if ask else 0),
+        }
+
+    def _new_order(self, symbol: _Symbol, owner: str, side: str, order_type: str, time_in_force: str, price: int, quantity: int, client_order_id: str = None) -> Order:
+        order = Order(
+            order_id=self.next_order_id,
+            client_order_id=client_order_id or uuid.uuid4().hex,
+            symbol=symbol.symbol,
+            side=side,
+            type=order_type,
+            time_in_force=time_in_force,
+            price=price,
+            quantity=quantity,
+            owner=owner)
+        self.next_order_id += 1
+        return order
+
+    def seed_liquidity(self, market: str, mid_price: Decimal, levels: int, step_bps: float = 5, notional: Decimal = Decimal(1000)):
+        """Place synthetic maker orders on both sides of the book around a mid price.
+
+        :param notional: Value of the orders on each level in the quote asset
+        """
+        with self.lock:
+            symbol = self.symbols[market]
+            mid = symbol.to_ticks(mid_price, ROUND_HALF_EVEN)
+            step = max(1, int(mid * step_bps / 10000))
+            for level in range(1, levels + 1):
+                for side, price in ((BUY, mid - level * step), (SELL, mid + level * step)):
+                    if price <= 0:
+                        continue
+                    quantity = int(notional / symbol.get_quote_amount(price))
+                    if quantity:
+                        self._place(symbol, self._new_order(symbol, MAKER, side, "LIMIT", "GTC", price, quantity))
+
+    def apply_replay_message(self, msg: dict):
+        """Apply a recorded depth diff or trade to the book.
+
+        Depth diffs replace the replay account liquidity on the changed levels.
+        Trades are replayed as IOC orders, which fill any of our orders the market traded through.
+        """
+        event_type = msg.get("e")
+        if event_type not in ("depthUpdate", "trade"):
+            return
+        with self.lock:
+            symbol = self.symbols.get(msg["s"])
+            if symbol is None:
+                return
+            if event_type == "trade":
+                # Buyer is maker: the taker sold
+                side = SELL if msg["m"] else BUY
+                quantity = symbol.to_lots(msg["q"], ROUND_DOWN)
+                if quantity:
+                    price = symbol.to_ticks(msg["p"], ROUND_HALF_EVEN)
+                    self._place(symbol, self._new_order(symbol, REPLAY, side, "LIMIT", "IOC", price, quantity))
+                return
+
+            # Apply removals first, so that the new levels do not match against stale ones
+            updates = [(BUY, level) for level in msg["b"]] + [(SELL, level) for level in msg["a"]]
+            updates.sort(key=lambda u: Decimal(u[1][1]) != 0)
+            for side, (price, quantity) in updates:
+                ticks = symbol.to_ticks(price, ROUND_HALF_EVEN)
+                key = (symbol.symbol, side, ticks)
+                order = self.replay_orders.pop(key, None)
+                if order is not None and order.is_open():
+                    self._cancel(symbol, order)
+                lots = symbol.to_lots(quantity, ROUND_DOWN)
+                if lots:
+                    order = self._new_order(symbol, REPLAY, side, "LIMIT", "GTC", ticks, lots)
+                    self._place(symbol, order)
+                    if order.is_open():
+                        self.replay_orders[key] = order
+
+    #
+    # REST endpoints
+    #
+
+    def create_order(self, owner: str, params: dict) -> dict:
+        symbol = self._get_symbol(params)
+        side = params.get("side")
+        if side not in (BUY, SELL):
+            raise _api_error(-1117, "Invalid side.")
+        order_type = params.get("type")
+        if order_type not in ("LIMIT", "MARKET"):
+            raise _api_error(-1116, "Invalid orderType.")
+
+        if "quantity" not in params:
+            raise _api_error(-1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+        quantity = symbol.to_lots(params["quantity"])
+        if quantity <= 0:
+            raise _api_error(-1013, "Filter failure: LOT_SIZE")
+
+        if order_type == "LIMIT":
+            time_in_force = params.get("timeInForce")
+            if time_in_force not in ("GTC", "IOC", "FOK"):
+                raise _api_error(-1115, "Invalid timeInForce.")
+            if "price" not in params:
+                raise _api_error(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+            price = symbol.to_ticks(params["price"])
+            if price <= 0:
+                raise _api_error(-1013, "Filter failure: PRICE_FILTER")
+            if symbol.get_quote_amount(price * quantity) < symbol.min_notional:
+                raise _api_error(-1013, "Filter failure: MIN_NOTIONAL")
+        else:
+            time_in_force = ""
+            price = 0
+
+        with self.lock:
+            client_order_id = params.get("newClientOrderId")
+            if client_order_id:
+                existing = self.client_order_ids.get((owner, symbol.symbol, client_order_id))
+                if existing and existing.is_open():
+                    raise _api_error(-2010, "Duplicate order sent.")
+            order = self._new_order(symbol, owner, side, order_type, time_in_force, price, quantity, client_order_id)
+            trades = self._place(symbol, order)
+            self.client_order_ids[(owner, symbol.symbol, order.client_order_id)] = order
+
+            response_type = params.get("newOrderRespType", "FULL")
+            if response_type == "ACK":
+                return {
+                    "symbol": order.symbol,
+                    "orderId": order.order_id,
+                    "orderListId": -1,
+                    "clientOrderId": order.client_order_id,
+                    "transactTime": order.time,
+                }
+            return symbol.engine.order_response(order, trades if response_type == "FULL" else None)
+
+    def _find_order(self, owner: str, symbol: _Symbol, params: dict) -> Order:
+        order = None
+        if params.get("orderId"):
+            order = self.orders.get(int(params["orderId"]))
+        elif params.get("origClientOrderId"):
+            order = self.client_order_ids.get((owner, symbol.symbol, params["origClientOrderId"]))
+        else:
+            raise _api_error(-1102, "Param 'origClientOrderId' or 'orderId' must be sent, but both were empty/null!")
+        if order is None or order.owner != owner or order.symbol != symbol.symbol:
+            raise _api_error(-2013, "Order does not exist.")
+        return order
+
+    def get_order(self, owner: str, params: dict) -> dict:
+        symbol = self._get_symbol(params)
+        with self.lock:
+            order = self._find_order(owner, symbol, params)
+            return symbol.engine.order_response(order)
+
+    def cancel_order(self, owner: str, params: dict) -> dict:
+        symbol = self._get_symbol(params)
+        with self.lock:
+            try:
+                order = self._find_order(owner, symbol, params)
+            except BinanceAPIException:
+                raise _api_error(-2011, "Unknown order sent.")
+            if not order.is_open():
+                raise _api_error(-2011, "Unknown order sent.")
+            self._cancel(symbol, order)
+            response = symbol.engine.order_response(order)
+            response["origClientOrderId"] = order.client_order_id
+            return response
+
+    def get_open_orders(self, owner: str, params: dict) -> List[dict]:
+        symbols = [self._get_symbol(params)] if params.get("symbol") else self.symbols.values()
+        with self.lock:
+            return [
+                symbol.engine.order_response(order)
+                for symbol in symbols
+                for order in symbol.engine.get_open_orders()
+                if order.owner == owner
+            ]
+
+    def cancel_open_orders(self, owner: str, params: dict) -> List[dict]:
+        symbol = self._get_symbol(params)
+        with self.lock:
+            orders = [o for o in symbol.engine.get_open_orders() if o.owner == owner]
+            if not orders:
+                raise _api_error(-2011, "Unknown order sent.")
+            result = []
+            for order in orders:
+                self._cancel(symbol, order)
+                result.append(symbol.engine.order_response(order))
+            return result
+
+    def get_account(self, owner: str, params: dict) -> dict:
+        with self.lock:
+            account = self._get_account(owner)
+            return {
+                "makerCommission": 0,
+                "takerCommission": 0,
+                "buyerCommission": 0,
+                "sellerCommission": 0,
+                "canTrade": True,
+                "canWithdraw": False,
+                "canDeposit": False,
+                "updateTime": int(time.time() * 1000),
+                "accountType": "SPOT",
+                "balances": [
+                    {"asset": asset, "free": _format_amount(free), "locked": _format_amount(locked)}
+                    for asset, (free, locked) in sorted(account.items())
+                ],
+                "permissions": ["SPOT"],
+            }
+
+    def get_depth(self, owner: str, params: dict) -> dict:
+        symbol = self._get_symbol(params)
+        limit = int(params.get("limit", 100))
+        with self.lock:
+            engine = symbol.engine
+            bids, asks = engine.get_depth(limit)
+            return {
+                "lastUpdateId": symbol.update_id,
+                "bids": [[engine.format_price(p), engine.format_quantity(q)] for p, q in bids],
+                "asks": [[engine.format_price(p), engine.format_quantity(q)] for p, q in asks],
+            }
+
+    def _get_price(self, symbol: _Symbol) -> str:
+        """Last trade price, or the mid price if nothing has traded."""
+        engine = symbol.engine
+        if symbol.last_price is not None:
+            return engine.format_price(symbol.last_price)
+        bid, ask = engine.best_bid(), engine.best_ask()
+        if bid and ask:
+            return engine.format_price((bid + ask) // 2)
+        return str(symbol.reference_price)
+
+    def get_avg_price(self, owner: str, params: dict) -> dict:
+        symbol = self._get_symbol(params)
+        with self.lock:
+            return {"mins": 5, "price": self._get_price(symbol)}
+
+    def get_ticker_price(self, owner: str, params: dict):
+        with self.lock:
+            if params.get("symbol"):
+                symbol = self._get_symbol(params)
+                return {"symbol": symbol.symbol, "price": self._get_price(symbol)}
+            return [{"symbol": s.symbol, "price": self._get_price(s)} for s in self.symbols.values()]
+
+    def get_book_tickers(self, owner: str, params: dict):
+        def _ticker(symbol: _Symbol) -> dict:
+            t = self._get_book_ticker(symbol)
+            return {"symbol": t["s"], "bidPrice": t["b"], "bidQty": t["B"], "askPrice": t["a"], "askQty": t["A"]}
+
+        with self.lock:
+            if params.get("symbol"):
+                return _ticker(self._get_symbol(params))
+            return [_ticker(s) for s in self.symbols.values()]
+
+    def start_user_stream(self, owner: str, params: dict) -> dict:
+        with self.lock:
+            for listen_key, o in self.listen_keys.items():
+                if o == owner:
+                    return {"listenKey": listen_key}
+            listen_key = uuid.uuid4().hex
+            self.listen_keys[listen_key] = owner
+            return {"listenKey": listen_key}
+
+    def keepalive_user_stream(self, owner: str, params: dict) -> dict:
+        if params.get("listenKey") not in self.listen_keys:
+            raise _api_error(-1125, "This listenKey does not exist.")
+        return {}
+
+    def close_user_stream(self, owner: str, params: dict) -> dict:
+        with self.lock:
+            self.listen_keys.pop(params.get("listenKey"), None)
+        return {}
+
+    def handle_request(self, method: str, path: str, params: dict, owner: str):
+        """Dispatch a REST call.
+
+        :param path: Endpoint path without the API version, like ``order`` or ``system/status``
+        :raise BinanceAPIException: Like Binance would
+        """
+        handler = _ROUTES.get((method, path))
+        if handler is None:
+            raise _api_error(-1000, f"{method} {path} is not supported by the local exchange", status_code=404)
+        return handler(self, owner, params)
+
+
+_ROUTES = {
+    ("GET", "ping"): lambda exchange, owner, params: {},
+    ("GET", "time"): lambda exchange, owner, params: {"serverTime": int(time.time() * 1000)},
+    ("GET", "system/status"): lambda exchange, owner, params: {"status": 0, "msg": "normal"},
+    ("GET", "exchangeInfo"): lambda exchange, owner, params: exchange.exchange_info,
+    ("GET", "depth"): LocalExchange.get_depth,
+    ("GET", "avgPrice"): LocalExchange.get_avg_price,
+    ("GET", "ticker/price"): LocalExchange.get_ticker_price,
+    ("GET", "ticker/bookTicker"): LocalExchange.get_book_tickers,
+    ("GET", "account"): LocalExchange.get_account,
+    ("POST", "order"): LocalExchange.create_order,
+    ("GET", "order"): LocalExchange.get_order,
+    ("DELETE", "order"): LocalExchange.cancel_order,
+    ("GET", "openOrders"): LocalExchange.get_open_orders,
+    ("DELETE", "openOrders"): LocalExchange.cancel_open_orders,
+    ("POST", "userDataStream"): LocalExchange.start_user_stream,
+    ("PUT", "userDataStream"): LocalExchange.keepalive_user_stream,
+    ("DELETE", "userDataStream"): LocalExchange.close_user_stream,
+}
+
+
+class LocalClient(Client):
+    """python-binance client talking to a :py:class:`LocalExchange` in the same process."""
+
+    API_URL = LOCAL_API_URL
+
+    def __init__(self, exchange: LocalExchange, api_key: str = None, api_secret: str = None):
+        """
+        :param api_key: Identifies the account, any value goes
+        """
+        # Same as Client() without the ping
+        BaseClient.__init__(self, api_key=api_key or "local", api_secret=api_secret or "local")
+        self.exchange = exchange
+        self.network = "local"
+        #: :py:class:`binance_testnet_tool.metrics.RequestMetrics` set by ``install_metrics()``
+        self.metrics = None
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        path = _ENDPOINT_PATH.search(uri).group(1)
+        params = dict(kwargs.get("data") or kwargs.get("params") or {})
+        if self.metrics is None:
+            return self.exchange.handle_request(method.upper(), path, params, self.API_KEY)
+
+        # There is no HTTP response for the session hook, so time the call here
+        started = time.perf_counter()
+        try:
+            result = self.exchange.handle_request(method.upper(), path, params, self.API_KEY)
+        except BinanceAPIException as e:
+            self.metrics.record(method.upper(), urlparse(uri).path, time.perf_counter() - started, e.status_code, e.code)
+            raise
+        self.metrics.record(method.upper(), urlparse(uri).path, time.perf_counter() - started, 200)
+        return result
+
+
+class LocalWebsocketManager:
+    """Deliver local exchange events with the ``ThreadedWebsocketManager`` interface.
+
+    Callbacks are called from a dispatcher thread, in the order the exchange published the events.
+    """
+
+    def __init__(self, exchange: LocalExchange, api_key: str = None):
+        self.exchange = exchange
+        self.owner = api_key or "local"
+        #: conn key -> (stream names, callback, multiplexed)
+        self.sockets: Dict[str, Tuple[frozenset, Callable[[dict], None], bool]] = {}
+        self.queue = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self._client_params = {"testnet": False}
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="local-websocket", daemon=True)
+        self.thread.start()
+        self.exchange.add_listener(self._on_event)
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.exchange.remove_listener(self._on_event)
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def join(self, timeout: float = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _on_event(self, stream: str, msg: dict):
+        self.queue.put((stream, msg))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            stream, msg = item
+            for streams, callback, multiplexed in list(self.sockets.values()):
+                if stream in streams:
+                    try:
+                        callback({"stream": stream, "data": msg} if multiplexed else msg)
+                    except Exception:
+                        logger.exception("Websocket callback failed")
+
+    def _add_socket(self, streams: Iterable[str], callback: Callable[[dict], None], multiplexed: bool = False) -> str:
+        conn_key = uuid.uuid4().hex
+        self.sockets[conn_key] = (frozenset(streams), callback, multiplexed)
+        return conn_key
+
+    def stop_socket(self, conn_key: str):
+        self.sockets.pop(conn_key, None)
+
+    def start_user_socket(self, callback: Callable[[dict], None]) -> str:
+        self.exchange.start_user_stream(self.owner, {})
+        return self._add_socket([f"user:{self.owner}"], callback)
+
+    def start_depth_socket(self, callback: Callable[[dict], None], symbol: str, depth: str = None, interval: int = None) -> str:
+        if depth:
+            raise RuntimeError("Partial book depth streams are not supported by the local exchange")
+        return self._add_socket([f"{symbol.lower()}@depth"], callback)
+
+    def start_trade_socket(self, callback: Callable[[dict], None], symbol: str) -> str:
+        return self._add_socket([f"{symbol.lower()}@trade"], callback)
+
+    def start_symbol_book_ticker_socket(self, callback: Callable[[dict], None], symbol: str) -> str:
+        return self._add_socket([f"{symbol.lower()}@bookTicker"], callback)
+
+    def start_multiplex_socket(self, callback: Callable[[dict], None], streams: List[str]) -> str:
+        # btcusdt@depth@100ms -> btcusdt@depth, the local exchange publishes every change
+        names = ["@".join(s.split("@")[:2]) for s in streams]
+        return self._add_socket(names, callback, multiplexed=True)
+
+
+class ReplayFeeder:
+    """Feed recorded market data to the local exchange in a background thread."""
+
+    def __init__(self, exchange: LocalExchange, paths: List[str], speed: float = 1.0):
+        """
+        :param paths: Files written by the ``record`` command, replayed in the given order
+        :param speed: Replay speed multiplier, zero replays as fast as possible
+        """
+        self.exchange = exchange
+        self.paths = paths
+        self.speed = speed
+        self.replayed = 0
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="replay", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        started_at = time.monotonic()
+        first_received_at = None
+        try:
+            for path in self.paths:
+                for received_at_us, msg in read_records(path):
+                    if self.stopped.is_set():
+                        return
+                    if self.speed:
+                        if first_received_at is None:
+                            first_received_at = received_at_us
+                        delay = (received_at_us - first_received_at) / 1_000_000 / self.speed - (time.monotonic() - started_at)
+                        if delay > 0 and self.stopped.wait(delay):
+                            return
+                    self.exchange.apply_replay_message(msg)
+                    self.replayed += 1
+            logger.info("Replay finished after %d messages", self.replayed)
+        finally:
+            self.done.set()
+
+
+def get_replay_paths(path: str) -> List[str]:
+    """A recording file, or all recordings in a directory in the order they were written."""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".bttr"))
+    return [path]
+
+
+_exchange: Optional[LocalExchange] = None
+_exchange_lock = threading.Lock()
+
+
+def get_local_exchange() -> LocalExchange:
+    """The exchange shared by all local clients in this process.
+
+    Configured from the environment:
+
+    - ``BINANCE_LOCAL_REPLAY``: a recording file or directory to replay instead of seeding synthetic liquidity
+    - ``BINANCE_LOCAL_REPLAY_SPEED``: replay speed multiplier, default 10, zero for as fast as possible
+    """
+    global _exchange
+    with _exchange_lock:
+        if _exchange is None:
+            replay = os.environ.get("BINANCE_LOCAL_REPLAY")
+            if replay:
+                _exchange = LocalExchange(seed_levels=0)
+                speed = float(os.environ.get("BINANCE_LOCAL_REPLAY_SPEED", 10))
+                ReplayFeeder(_exchange, get_replay_paths(replay), speed).start()
+                logger.info("Replaying %s at %sx speed", replay, speed)
+            else:
+                _exchange = LocalExchange()
+        return _exchange
+
+
+def create_local_client(api_key: str = None, api_secret: str = None, exchange: LocalExchange = None) -> Tuple[LocalClient, LocalWebsocketManager]:
+    """Create a client and websocket manager for the local network."""
+    exchange = exchange or get_local_exchange()
+    client = LocalClient(exchange, api_key, api_secret)
+    bm = LocalWebsocketManager(exchange, client.API_KEY)
+    return client, bm
@@ -11,35 +11,68 @@ Tutorials:
 
 """
 
+import asyncio
+import atexit
+from collections import Counter
 import logging
 from decimal import Decimal
 from dataclasses import dataclass
-from functools import partial
+from functools import lru_cache, partial
 from inspect import getmembers, isfunction
 import os
 import sys
-from typing import Tuple
+import time
+from typing import Awaitable, Callable, List, Tuple, TYPE_CHECKING
 
 import click
-from binance.client import Client
 from binance_testnet_tool.logs import setup_logging
 from binance_testnet_tool.console import print_colorful_json
-from binance_testnet_tool.utils import quantize_price, check_accounted_api_client
-from binance_testnet_tool.utils import quantize_quantity
-from binance_testnet_tool.requesthelpers import hook_request_dump
+from binance_testnet_tool.eventoutput import EventWriter, OUTPUT_FORMATS as EVENT_OUTPUT_FORMATS
+from binance_testnet_tool.utils import check_accounted_api_client
+from binance_testnet_tool.quantize import get_quantizer
+from binance_testnet_tool.requesthelpers import RequestDumper
+from binance_testnet_tool.ratelimit import get_rate_limiter, install_rate_limiter, install_rate_limiter_async
+from binance_testnet_tool.metrics import RequestMetrics, get_metrics, install_metrics, install_metrics_async, start_metrics_server
+from binance_testnet_tool.clocksync import ClockSync, DEFAULT_RECV_WINDOW, estimate_offset, install_clock_sync, install_clock_sync_async
+from binance_testnet_tool.cancel import cancel_all_orders, cancel_all_orders_async
+from binance_testnet_tool.loadtest import make_price_ladder, run_load_test
+from binance_testnet_tool.batch import FORMATS as BATCH_FORMATS, guess_format, place_orders, prepare_orders, read_order_rows
+from binance_testnet_tool.ordertracker import OrderLatencyTracker
 from binance_testnet_tool.depth import get_depth_info, Side
-from binance import enums as binance_enums
-from binance import ThreadedWebsocketManager
-from pycoingecko import CoinGeckoAPI
+from binance_testnet_tool.orderbook import fetch_order_book, fetch_order_book_async, load_order_book, register_live_stream, OrderBookStream
+from binance_testnet_tool.accountcache import AccountCache, load_balances, load_open_orders, register_account_cache
+from binance_testnet_tool.symbols import get_symbol_registry, get_symbol_registry_async
+from binance_testnet_tool.scan import MarketDepthSummary, SORT_KEYS, rank_markets, scan_markets, scan_markets_async
+from binance_testnet_tool.slippage import DEFAULT_BANDS, DEFAULT_NOTIONAL_SIZES, get_execution_curve, get_liquidity_bands, get_slippage
+from binance_testnet_tool.lazy import LazyProxy
+from binance_testnet_tool.refprice import PRICE_SOURCES, get_reference_price_source
+from binance_testnet_tool.recorder import RecordingWriter, STREAM_TYPES, start_recording
+from binance_testnet_tool.history import DownloadResult, HISTORY_KINDS, HistoryStore, download_history, get_default_db_path
+from binance_testnet_tool.daemon import CommandServer, LOCAL_ONLY_COMMANDS, SERVER_OPTIONS, forward_command, get_default_socket_path, is_server_running
 from dotenv import load_dotenv
-from tabulate import tabulate
+
+# python-binance, tabulate and pycoingecko are slow to import,
+# so commands import them only when they are needed
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+    from binance import ThreadedWebsocketManager
 
 
 logger = logging.getLogger()
 
-client: Client = None
+#: Created on the first use, see :py:class:`LazyProxy`
+client: "Client" = None
+
+bm: "ThreadedWebsocketManager" = None
+
+#: Set by ``--async``: commands run their independent API calls concurrently on AsyncClient
+use_async = False
+
+#: (api_key, api_secret, network) used to create the async client
+client_config: Tuple[str, str, str] = None
 
-bm: ThreadedWebsocketManager = None
+#: Server clock offset applied to signed requests, None with ``--no-clock-sync``
+clock_sync: ClockSync = None
 
 # https://github.com/pallets/click/issues/646#issuecomment-435317967
 click.option = partial(click.option, show_default=True)
@@ -59,6 +92,7 @@ class BinanceUrlConfig:
     network: str
 
     def __init__(self, network: str):
+        from binance.client import Client
         self.network = network
         if network == "spot-testnet":
             self.api_end_point = "https://testnet.binance.vision/api"
@@ -68,37 +102,79 @@ class BinanceUrlConfig:
             self.api_end_point = Client.API_URL
             # self.user_stream_endpoint = "userDataStream"
             self.stream_url = "wss://stream.binance.{}:9443/ws/"
+        elif network == "local":
+            from binance_testnet_tool.localexchange import LOCAL_API_URL, LOCAL_STREAM_URL
+            self.api_end_point = LOCAL_API_URL
+            self.stream_url = LOCAL_STREAM_URL
         else:
             raise RuntimeError(f"Unknown Binance network {network}")
 
+        # Point the REST API to a stand-in server, e.g. for benchmarks
+        self.api_end_point = os.environ.get("BINANCE_API_URL", self.api_end_point)
+
     def is_testnet(self):
         return self.network == "spot-testnet"
 
 
-def create_client(api_key, api_secret, network: str) -> Tuple[Client, ThreadedWebsocketManager]:
-    """Create Binance client with proper testnet configuration."""
+def resolve_client_config(api_key, api_secret, network: str) -> Tuple[str, str, str]:
+    """Fill in the API credentials and network from the environment if not given."""
 
     if not network:
         network = os.environ.get("BINANCE_NETWORK")
 
     assert network, "You need to choose Binance API network"
 
-    # Patch the client for testnet if needed
-    urls = BinanceUrlConfig(network)
-    Client.API_URL = urls.api_end_point
-
     if not api_key:
         api_key = os.environ.get("BINANCE_API_KEY")
 
     if not api_secret:
         api_secret = os.environ.get("BINANCE_API_SECRET")
 
-    client = Client(api_key=api_key, api_secret=api_secret)
+    return api_key, api_secret, network
+
+
+def create_client(api_key, api_secret, network: str, request_dumper: RequestDumper = None, clock: ClockSync = None) -> Tuple["Client", "ThreadedWebsocketManager"]:
+    """Create Binance client with proper testnet configuration.
+
+    :param request_dumper: HTTP request/response dumper. By default requests are dumped only with debug logging.
+    :param clock: Sign requests with the server clock instead of the local one
+    """
+    from binance.client import BaseClient, Client
+    from binance import ThreadedWebsocketManager
+
+    api_key, api_secret, network = resolve_client_config(api_key, api_secret, network)
+
+    if network == "local":
+        # In-process exchange, no rate limits, nothing to dump and no clock to sync with
+        from binance_testnet_tool.localexchange import create_local_client
+        logger.info("Using the local exchange")
+        client, bm = create_local_client(api_key, api_secret)
+        install_metrics(client, get_metrics())
+        return client, bm
+
+    # Patch the client for testnet if needed
+    urls = BinanceUrlConfig(network)
+    Client.API_URL = urls.api_end_point
+
+    # Same as Client(), but skip the ping round-trip of the constructor,
+    # the first real request sets up the connection anyway
+    client = Client.__new__(Client)
+    BaseClient.__init__(client, api_key=api_key, api_secret=api_secret)
 
     client.network = network
 
-    # Add our HTTP POST debug dumper
-    client.session.hooks["response"].append(hook_request_dump)
+    # Add our HTTP debug dumper only if somebody is going to read the dumps
+    if request_dumper is None and logger.isEnabledFor(logging.DEBUG):
+        request_dumper = RequestDumper()
+
+    if request_dumper:
+        client.session.hooks["response"].append(request_dumper)
+
+    # Stay within request weight and order rate limits
+    install_rate_limiter(client, get_rate_limiter())
+    install_metrics(client, get_metrics())
+    if clock:
+        install_clock_sync(client, clock)
 
     bm = ThreadedWebsocketManager(api_key=api_key, api_secret=api_secret, testnet=urls.is_testnet())
 
@@ -113,18 +189,62 @@ def create_client(api_key, api_secret, network: str) -> Tuple[Client, ThreadedWe
     return client, bm
 
 
+async def create_async_client(api_key, api_secret, network: str, clock: ClockSync = None) -> "AsyncClient":
+    """Create asyncio Binance client.
+
+    All requests share one pooled aiohttp session.
+    Must be called within a running event loop and closed with ``close_connection()``.
+    """
+    from binance.client import AsyncClient
+
+    api_key, api_secret, network = resolve_client_config(api_key, api_secret, network)
+    if network == "local":
+        raise RuntimeError("The local exchange does not support --async")
+    urls = BinanceUrlConfig(network)
+
+    # Unlike AsyncClient.create(), do not spend round-trips on ping and server time here
+    async_client = AsyncClient(api_key=api_key, api_secret=api_secret, testnet=urls.is_testnet())
+    async_client.network = network
+    if "BINANCE_API_URL" in os.environ:
+        # AsyncClient picks its URL by the testnet flag, follow the override like the sync client does
+        async_client.API_URL = async_client.API_TESTNET_URL = urls.api_end_point
+    install_metrics_async(async_client, get_metrics())
+    install_rate_limiter_async(async_client, get_rate_limiter())
+    if clock:
+        install_clock_sync_async(async_client, clock)
+    return async_client
+
+
+def run_async(func: Callable[..., Awaitable], *args):
+    """Run an async command implementation in an event loop with a fresh async client.
+
+    :param func: Coroutine function taking the async client as the first argument
+    """
+
+    async def _run():
+        async_client = await create_async_client(*client_config, clock=clock_sync)
+        try:
+            return await func(async_client, *args)
+        finally:
+            await async_client.close_connection()
+
+    return asyncio.run(_run())
+
+
 @click.command()
 @click.option('--market', default="BTCUSDT", help='Market where the order is made', required=True)
 @click.option('--side', help='Are you buying or selling', type=click.Choice(['buy', 'sell']), required=True)
 @click.option('--quantity', default="0.01", help='Amount of base pair is being traded (e.g. BTC)', required=True, type=float)
 @click.option('--price-amount', default=None, help='Set price as quote pair (e.g. in Dollar)', required=False, type=float)
-@click.option('--price-percent', default=None, help='Set price as a +/- % to reference price based on Coingecko', required=False, type=float)
-def create_limit_order(market: str, side: str, quantity: float, price_amount: float, price_percent: float):
+@click.option('--price-percent', default=None, help='Set price as a +/- % to the reference price', required=False, type=float)
+@click.option('--price-source', 'price_sources', default=list(PRICE_SOURCES), multiple=True, help='Where to get the reference price, tried in the given order', type=click.Choice(PRICE_SOURCES), required=False)
+def create_limit_order(market: str, side: str, quantity: float, price_amount: float, price_percent: float, price_sources: Tuple[str]):
     """Add liquidity to the market.
 
     Show the Binance order execution results.
     Limit orders can be immediately executed (reflected in the result) or left open.
     """
+    from binance import enums as binance_enums
 
     check_accounted_api_client(client)
 
@@ -134,19 +254,17 @@ def create_limit_order(market: str, side: str, quantity: float, price_amount: fl
     if price_amount:
         price = Decimal(price_amount)
     else:
-        assert market == "BTCUSDT", "No other markets supported at the yet"
-        cg = CoinGeckoAPI()
-        data = cg.get_price(ids='bitcoin', vs_currencies='usd')
-        price = Decimal(data["bitcoin"]["usd"])
+        source = get_reference_price_source(client, price_sources)
+        price = source.get_price(market)
+        logger.info("Reference price of %s is %s from %s", market, price, source.get_provider_name(market))
 
         assert price_percent > -100
         assert price_percent < 100
 
         price *= Decimal(1) + Decimal(price_percent / 100.0)
 
-    # Always use decimals and present prices up a certain decimal
-    price = quantize_price(price)
-    quantity = quantize_quantity(quantity)
+    # Round to the tick and lot sizes of the market, so that the order is not rejected by the filters
+    price, quantity = get_quantizer(client, market).quantize_order(price, quantity)
 
     logger.info("Creating a %s limit order for %s, at %f for %f crypto", side, market, price, quantity)
 
@@ -171,10 +289,13 @@ def create_market_order(market: str, side: str, quantity: float):
 
     Binance markets orders do not have price.
     """
+    from binance import enums as binance_enums
 
     check_accounted_api_client(client)
 
-    quantity = quantize_quantity(quantity)
+    quantizer = get_quantizer(client, market)
+    quantity = quantizer.quantize_quantity(quantity, market=True)
+    quantizer.validate(None, quantity)
 
     logger.info("Creating a %s market order for %s, for %f crypto", side, market, quantity)
     order = client.create_order(
@@ -189,6 +310,41 @@ def create_market_order(market: str, side: str, quantity: float):
         logger.warning("Could not fill the order, executed only %s", order["executedQty"])
 
 
+@click.command()
+@click.option('--file', 'input_file', default="-", help='CSV or JSON lines file of orders, - for stdin', required=True, type=click.File("r"))
+@click.option('--format', 'fmt', default=None, help='Input format, guessed from the file extension if not given', type=click.Choice(BATCH_FORMATS), required=False)
+@click.option('--output', default="-", help='Write the results as JSON lines to this file, - for stdout', required=True, type=click.File("w"))
+@click.option('--concurrency', default=8, help='Maximum orders in flight', required=True, type=int)
+@click.option('--skip-invalid/--no-skip-invalid', default=False, help='Place the valid orders even if some rows fail validation')
+def place_batch(input_file, fmt: str, output, concurrency: int, skip_invalid: bool):
+    """Place many orders from a CSV or JSON lines file.
+
+    Every order is validated against the symbol filters before anything is sent.
+    """
+    import json
+
+    check_accounted_api_client(client)
+
+    fmt = fmt or guess_format(input_file.name)
+    orders, errors = prepare_orders(client, read_order_rows(input_file, fmt))
+    for line, error in errors:
+        logger.error("Invalid order on line %d: %s", line, error)
+    if errors and not skip_invalid:
+        raise RuntimeError(f"{len(errors)} invalid orders, nothing was placed")
+
+    logger.info("Placing %d orders, %d in flight", len(orders), concurrency)
+    started = time.perf_counter()
+    statuses = Counter()
+    for entry in place_orders(client, orders, concurrency):
+        statuses[entry["status"]] += 1
+        output.write(json.dumps(entry) + "\n")
+    output.flush()
+    duration = time.perf_counter() - started
+
+    summary = ", ".join(f"{status} {count}" for status, count in sorted(statuses.items()))
+    logger.info("Placed %d orders in %.2f s (%.0f orders/s): %s", len(orders), duration, len(orders) / duration if duration else 0, summary or "no orders")
+
+
 @click.command()
 def status():
     """Print exchange status"""
@@ -199,6 +355,7 @@ def status():
 @click.command()
 def available_markets():
     """Available pairs for the user to trade"""
+    from tabulate import tabulate
     tokens = client.get_all_tickers()
     tokens = sorted(tokens, key=lambda x: x["symbol"])
 
@@ -215,39 +372,54 @@ def available_markets():
 @click.option('--market', default="BTCUSDT", help='Which market', required=True)
 def market_info(market: str):
     """Information on a single trading pair"""
-    info = client.get_symbol_info(market)
+    info = get_symbol_registry(client, symbol=market).get_symbol_info(market)
     print_colorful_json(info)
 
 
+async def _fetch_current_price_async(async_client: "AsyncClient", market: str):
+    return await asyncio.gather(
+        fetch_order_book_async(async_client, market),
+        async_client.get_avg_price(symbol=market),
+    )
+
+
 @click.command()
 @click.option('--market', default="BTCUSDT", help='Which market', required=True)
 def current_price(market: str):
     """Current price info for a trading pair"""
-    depth = client.get_order_book(symbol=market)
-    avg = client.get_avg_price(symbol=market)
+    if use_async:
+        book, avg = run_async(_fetch_current_price_async, market)
+    else:
+        book = load_order_book(client, market)
+        avg = client.get_avg_price(symbol=market)
 
     print("Pair", market)
     print("Mid price:", avg["price"], "for the period of", avg["mins"], "minutes")
-    asks = sorted(depth["asks"], key=lambda x: float(x[0]))
-    if asks:
-        top_ask, top_ask_quantity = asks[0]
-        top_ask = float(top_ask)
+    best_ask = book.best_ask()
+    if best_ask:
+        top_ask, top_ask_quantity = best_ask
         print("Ask top (most money you can make by buying):", top_ask)
     else:
         top_ask = None
         print("No asks (nobody is selling)")
 
-    bids = sorted(depth["bids"], key=lambda x: -float(x[0]))
-    if bids:
-        top_bid, top_bid_quantity = bids[0]
-        top_bid = float(top_bid)
+    best_bid = book.best_bid()
+    if best_bid:
+        top_bid, top_bid_quantity = best_bid
         print("Bid top (most money you can make by selling):", top_bid)
     else:
         top_bid = None
         print("No bids (nobody is buying)")
 
     if top_ask and top_bid:
-        print("Spread", 100 * (top_ask - top_bid) / top_bid, "%")
+        print("Spread", 100 * book.spread(), "%")
+
+
+async def _fetch_depth_async(async_client: "AsyncClient", market: str):
+    return await asyncio.gather(
+        get_symbol_registry_async(async_client, symbol=market),
+        fetch_order_book_async(async_client, market),
+    )
 
 
 @click.command()
@@ -255,8 +427,15 @@ def current_price(market: str):
 def depth(market: str):
     """Show orderbook depth"""
 
+    # Both sides are read from the same snapshot
+    if use_async:
+        # Symbol info is now in the registry for get_depth_info() to read
+        _, book = run_async(_fetch_depth_async, market)
+    else:
+        book = load_order_book(client, market)
+
     for side in (Side.ask, Side.bid):
-        info = get_depth_info(client, market, side)
+        info = get_depth_info(client, market, side, book)
         if info.empty:
             print(f"Order book has no {info.side.value}s - cannot {info.market_order_name}")
             continue
@@ -265,13 +444,84 @@ def depth(market: str):
         print(f"Total {info.cumulative_depth} {info.base_asset} {info.side.value}s at the liquidity of {info.total_liquidity:,} {info.quote_asset}, average price is {info.avg_price} {info.quote_asset}")
 
 
+async def _depth_scan_async(async_client: "AsyncClient", markets: List[str], limit: int, band: float, workers: int):
+    return await scan_markets_async(async_client, markets, limit, band, max_concurrency=workers)
+
+
+@click.command()
+@click.option('--market', 'markets', default=["all"], multiple=True, help='Market to scan, can be given many times, or all for every market', required=True)
+@click.option('--quote', default=None, help='With all markets, scan only the markets quoted in this asset, e.g. USDT', required=False)
+@click.option('--limit', default="100", help='How many order book levels to load per market', type=click.Choice(["5", "10", "20", "50", "100", "500", "1000"]), required=True)
+@click.option('--band', default=1.0, help='Count depth within this % of the mid price', type=float, required=True)
+@click.option('--workers', default=8, help='How many order books can be fetched at the same time', type=int, required=True)
+@click.option('--sort-by', default="depth", help='Rank the markets by', type=click.Choice(SORT_KEYS), required=True)
+@click.option('--top', default=None, help='Show only this many best ranked markets', type=int, required=False)
+def depth_scan(markets: Tuple[str], quote: str, limit: str, band: float, workers: int, sort_by: str, top: int):
+    """Rank many markets by spread and depth.
+
+    Notionals are in the quote currency of each market, use --quote to compare markets with the same quote currency.
+    """
+    from tabulate import tabulate
+
+    if "all" in markets:
+        markets = [t["symbol"] for t in client.get_all_tickers()]
+        if quote:
+            registry = get_symbol_registry(client)
+            markets = [m for m in markets if m in registry.symbols and registry.symbols[m]["quoteAsset"] == quote]
+
+    logger.info("Scanning %d markets", len(markets))
+    if use_async:
+        summaries = run_async(_depth_scan_async, list(markets), int(limit), band, workers)
+    else:
+        summaries = scan_markets(client, markets, int(limit), band, max_workers=workers)
+
+    summaries = rank_markets(summaries, sort_by)[:top]
+    print(tabulate([s.get_row() for s in summaries], MarketDepthSummary.get_headers(band), floatfmt=",.8g", missingval="-"))
+
+
+@click.command()
+@click.option('--market', default="BTCUSDT", help='Which market', required=True)
+@click.option('--limit', default="1000", help='How many order book levels to load', type=click.Choice(["100", "500", "1000", "5000"]), required=True)
+@click.option('--size', 'sizes', default=list(DEFAULT_NOTIONAL_SIZES), multiple=True, help='Market order size in the quote currency, can be given many times', type=float, required=True)
+@click.option('--band', 'bands', default=list(DEFAULT_BANDS), multiple=True, help='Show liquidity within this % of the mid price, can be given many times', type=float, required=True)
+@click.option('--curve-points', default=10, help='How many points of the execution price curve to show per side, 0 to skip', type=int, required=True)
+def slippage(market: str, limit: str, sizes: Tuple[float], bands: Tuple[float], curve_points: int):
+    """Market order slippage and liquidity around the mid price"""
+    from tabulate import tabulate
+
+    book = fetch_order_book(client, market, limit=int(limit))
+    symbol_info = get_symbol_registry(client, symbol=market).get_symbol_info(market)
+    base, quote = symbol_info["baseAsset"], symbol_info["quoteAsset"]
+    mid_price = book.mid_price()
+    if mid_price is None:
+        raise RuntimeError(f"Order book of {market} is one-sided, cannot compute slippage")
+
+    print(f"{market} mid price {mid_price} {quote}, {len(book.bids)} bid and {len(book.asks)} ask levels loaded")
+    print("")
+
+    rows = [info.get_row() for side in (Side.ask, Side.bid) for info in get_slippage(book, side, sizes)]
+    headers = ["Side", f"Size {quote}", f"Quantity {base}", "Avg price", "Worst price", "Slippage bps"]
+    print(tabulate(rows, headers, floatfmt=".8g", missingval="not enough liquidity"))
+    print("")
+
+    headers = ["Within %", f"Bids {base}", f"Bids {quote}", f"Asks {base}", f"Asks {quote}"]
+    print(tabulate(get_liquidity_bands(book, bands), headers, floatfmt=".8g"))
+
+    if curve_points:
+        for side in (Side.ask, Side.bid):
+            print("")
+            headers = ["Levels eaten", f"{side.value.capitalize()}s {base}", f"{side.value.capitalize()}s {quote}", "Avg price", "Slippage bps"]
+            print(tabulate(get_execution_curve(book, side, curve_points), headers, floatfmt=".8g"))
+
+
 @click.command()
 def balances():
     """Account balances"""
+    from tabulate import tabulate
 
     check_accounted_api_client(client)
 
-    tokens = client.get_account()["balances"]
+    tokens = load_balances(client)
     tokens = sorted(tokens, key=lambda x: x["asset"])
 
     def get_entries():
@@ -286,10 +536,11 @@ def balances():
 @click.command()
 def orders():
     """Open orders"""
+    from tabulate import tabulate
 
     check_accounted_api_client(client)
 
-    orders = client.get_open_orders()
+    orders = load_open_orders(client)
     orders = sorted(orders, key=lambda x: x["orderId"])
     def get_entries():
         entries = []
@@ -320,40 +571,330 @@ def fees(market: str):
     print_colorful_json(order_data)
 
 
+async def _cancel_all_async(async_client: "AsyncClient", workers: int):
+    orders = await async_client.get_open_orders()
+
+    if len(orders) == 0:
+        print("No open orders to cancel")
+        return
+
+    cancelled = await cancel_all_orders_async(async_client, orders, max_concurrency=workers)
+    print(f"Cancelled {cancelled} of {len(orders)} orders")
+
+
 @click.command()
-def cancel_all():
+@click.option('--workers', default=8, help='How many cancels can be in flight at the same time', required=False, type=int)
+def cancel_all(workers: int):
     """Cancel all open orders"""
 
     check_accounted_api_client(client)
 
+    if use_async:
+        run_async(_cancel_all_async, workers)
+        return
+
     orders = client.get_open_orders()
 
     if len(orders) == 0:
         print("No open orders to cancel")
+        return
+
+    cancelled = cancel_all_orders(client, orders, max_workers=workers)
+    print(f"Cancelled {cancelled} of {len(orders)} orders")
+
+
+@click.command()
+@click.option('--market', default="BTCUSDT", help='Market where the orders are made', required=True)
+@click.option('--side', default="buy", help='Are you buying or selling', type=click.Choice(['buy', 'sell']), required=True)
+@click.option('--order-type', default="limit", help='Limit orders are laddered around the mid price and rest on the book', type=click.Choice(['limit', 'market']), required=True)
+@click.option('--quantity', default="0.001", help='Amount of base pair per order (e.g. BTC)', required=True, type=float)
+@click.option('--rate', default=5.0, help='Orders per second', required=True, type=float)
+@click.option('--concurrency', default=8, help='Maximum orders in flight', required=True, type=int)
+@click.option('--duration', default=10.0, help='How long to send orders, seconds', required=True, type=float)
+@click.option('--count', default=None, help='Stop after this many orders', required=False, type=int)
+@click.option('--levels', default=10, help='Limit order price ladder levels', required=True, type=int)
+@click.option('--step-bps', default=10.0, help='Distance between the ladder levels in basis points', required=True, type=float)
+@click.option('--cleanup/--no-cleanup', default=True, help='Cancel the orders of the run left open on the market')
+@click.option('--track-events/--no-track-events', default=False, help='Measure the latency of execution reports on the user data stream')
+def load_test(market: str, side: str, order_type: str, quantity: float, rate: float, concurrency: int, duration: float, count: int, levels: int, step_bps: float, cleanup: bool, track_events: bool):
+    """Place orders at a steady rate and measure ack latency"""
+    from binance import enums as binance_enums
+    from tabulate import tabulate
+
+    check_accounted_api_client(client)
 
-    for o in orders:
-        logger.info("Cancelling order %s", o["orderId"])
-        client.cancel_order(symbol=o["symbol"], orderId=o["orderId"])
+    quantizer = get_quantizer(client, market)
+    binance_side = binance_enums.SIDE_BUY if side == "buy" else binance_enums.SIDE_SELL
+
+    if order_type == "limit":
+        book = load_order_book(client, market)
+        mid_price = book.mid_price()
+        if mid_price is None:
+            raise RuntimeError(f"Order book of {market} is one-sided, cannot place a price ladder")
+        prices = make_price_ladder(quantizer, mid_price, binance_side, levels, step_bps)
+        quantity = quantizer.quantize_quantity(quantity)
+        for price in prices:
+            quantizer.validate(price, quantity)
+    else:
+        prices = None
+        quantity = quantizer.quantize_quantity(quantity, market=True)
+        quantizer.validate(None, quantity)
+
+    def make_order(seq: int) -> dict:
+        params = dict(
+            symbol=market,
+            side=binance_side,
+            quantity=str(quantity),
+            # Do not wait for the order to be matched before acknowledging it
+            newOrderRespType=binance_enums.ORDER_RESP_TYPE_ACK)
+        if prices:
+            params.update(
+                type=binance_enums.ORDER_TYPE_LIMIT,
+                timeInForce=binance_enums.TIME_IN_FORCE_GTC,
+                price=str(prices[seq % len(prices)]))
+        else:
+            params.update(type=binance_enums.ORDER_TYPE_MARKET)
+        return params
+
+    if track_events:
+        tracker = OrderLatencyTracker()
+        bm.start()
+        bm.start_user_socket(tracker.process_event)
+    else:
+        tracker = None
+
+    # Keep the clock in sync during long runs, the local exchange has no clock to sync with
+    clock = getattr(client, "clock_sync", None)
+    if clock:
+        clock.start(client)
+
+    logger.info("Placing %s %s orders on %s at %.1f orders/sec for %.1f seconds", side, order_type, market, rate, duration)
+    try:
+        result = run_load_test(client, make_order, rate=rate, duration=duration, concurrency=concurrency, max_orders=count, tracker=tracker)
+        if tracker:
+            tracker.wait_for_events()
+    finally:
+        if clock:
+            clock.stop()
+        if tracker:
+            bm.stop()
+
+    if cleanup and prices:
+        # Leave alone the orders placed by others on the same account
+        placed = set(result.order_ids)
+        open_orders = [o for o in client.get_open_orders(symbol=market) if o["orderId"] in placed]
+        cancel_all_orders(client, open_orders, max_workers=concurrency, per_order=True)
+
+    latency = result.get_latency_summary()
+    print(tabulate([latency.get_row()], latency.get_headers(), floatfmt=".1f"))
+    print("")
+    # The local exchange has no rate limiter
+    limiter = getattr(client, "rate_limiter", None)
+    entries = [
+        ("Accepted", result.accepted),
+        ("Rejected", result.rejected),
+        ("Errors", result.errors),
+        ("Duration s", f"{result.duration:.2f}"),
+        ("Throughput orders/s", f"{result.get_throughput():.2f}"),
+        ("Held back by rate limiter s", f"{limiter.throttled_seconds if limiter else 0:.2f}"),
+    ]
+    entries += [(f"Rejected with code {code}", n) for code, n in result.rejections.most_common()]
+    if clock:
+        entries += clock.get_report_rows()
+    print(tabulate(entries, missingval="-"))
+
+    if tracker:
+        print("")
+        print(tracker.format_report())
 
 
 @click.command()
-def order_event_stream():
+@click.option('--format', 'fmt', default="auto", help='pretty prints colored JSON, jsonl one compact JSON object per line, auto picks pretty for terminals', type=click.Choice(EVENT_OUTPUT_FORMATS), required=True)
+@click.option('--events', default=None, help='Comma separated event types to show, e.g. executionReport,outboundAccountPosition', required=False)
+@click.option('--keys', default=None, help='Comma separated event keys to show, e.g. e,E,s,i,X,z', required=False)
+@click.option('--output', default="-", help='Write the events to this file, - for stdout', required=True, type=click.File("w"))
+def order_event_stream(fmt: str, events: str, keys: str, output):
     """Open order event stream"""
 
     check_accounted_api_client(client)
 
-    def process_message(msg: dict):
-        logger.info("Received event %s", msg["e"])
-        print_colorful_json(msg)
+    writer = EventWriter(
+        output,
+        fmt,
+        events=events.split(",") if events else None,
+        keys=keys.split(",") if keys else None)
+    writer.start()
 
     logger.info("Connecting to the websocket")
 
     # start any sockets here, i.e a trade socket
-    conn_key = bm.start_user_socket(process_message)
+    conn_key = bm.start_user_socket(writer.process_message)
     # then start the socket manager
 
     logger.info("Connected - stream running - do some orders in another terminal")
     bm.start()
+    try:
+        bm.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bm.stop()
+        writer.stop()
+        logger.info("Wrote %d events, filtered out %d", sum(writer.counts.values()), writer.filtered)
+
+
+@click.command()
+@click.option('--socket', 'socket_path', default=None, help='Unix socket path, defaults to BINANCE_TOOL_SOCKET or ~/.cache/binance-testnet-tool/daemon.sock', required=False)
+@click.option('--book', 'books', multiple=True, help='Keep the order book of this market live from the depth websocket, can be given many times', required=False)
+@click.option('--account-cache/--no-account-cache', default=False, help='Serve orders and balances from the user data stream instead of REST')
+def serve(socket_path: str, books: Tuple[str], account_cache: bool):
+    """Keep a warm client running and serve commands over a local socket"""
+    socket_path = socket_path or get_default_socket_path()
+    ctx = click.get_current_context()
+    group = ctx.parent.command
+
+    def run_command(args):
+        if not args:
+            raise click.UsageError("No command given")
+        name, rest = args[0], args[1:]
+        if name in LOCAL_ONLY_COMMANDS:
+            raise click.UsageError(f"Command {name} cannot be run on the server")
+        cmd = group.get_command(ctx.parent, name)
+        if cmd is None:
+            raise click.UsageError(f"No such command {name}")
+        cmd.main(args=rest, prog_name=name, standalone_mode=False)
+
+    # Open the connection and load exchange info before the first command needs them
+    get_symbol_registry(client)
+
+    clock = getattr(client, "clock_sync", None)
+    if clock:
+        clock.sync(client)
+        clock.start(client)
+
+    streams = []
+    if books or account_cache:
+        bm.start()
+        for market in books:
+            stream = OrderBookStream(client, bm, market)
+            stream.start()
+            register_live_stream(stream)
+            streams.append(stream)
+
+    cache = None
+    if account_cache:
+        check_accounted_api_client(client)
+        cache = AccountCache(client, bm)
+        cache.start()
+        register_account_cache(cache)
+
+    server = CommandServer(socket_path, run_command)
+    logger.info("Serving commands at %s", socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if clock:
+            clock.stop()
+        for stream in streams:
+            stream.stop()
+        if cache:
+            register_account_cache(None)
+            cache.stop()
+        if books or account_cache:
+            bm.stop()
+
+
+@click.command()
+@click.option('--market', 'markets', default=["BTCUSDT"], multiple=True, help='Market to record, can be given many times', required=True)
+@click.option('--stream', 'streams', default=list(STREAM_TYPES), multiple=True, help='Stream types to record, can be given many times', type=click.Choice(STREAM_TYPES), required=True)
+@click.option('--output-dir', default="recordings", help='Where to write the recordings', required=True, type=click.Path(file_okay=False))
+@click.option('--rotate-mb', default=256, help='Start a new file after this many megabytes', required=True, type=int)
+@click.option('--rotate-minutes', default=None, help='Start a new file after this many minutes', required=False, type=float)
+@click.option('--duration', default=None, help='Stop after this many seconds, default is to run until interrupted', required=False, type=float)
+def record(markets: Tuple[str], streams: Tuple[str], output_dir: str, rotate_mb: int, rotate_minutes: float, duration: float):
+    """Record market data streams to binary files for replay"""
+    writer = RecordingWriter(
+        output_dir,
+        list(markets),
+        rotate_bytes=rotate_mb * 1024 * 1024,
+        rotate_seconds=rotate_minutes * 60 if rotate_minutes else None)
+
+    bm.start()
+    recorder = start_recording(bm, writer, streams)
+    logger.info("Recording %s of %s, press CTRL+C to stop", ", ".join(streams), ", ".join(markets))
+    started_at = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - started_at < duration:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bm.stop()
+        recorder.stop()
+
+    for name, count in sorted(recorder.counts.items()):
+        print(f"{name}: {count} messages")
+    print("Files:", ", ".join(writer.files))
+
+
+@click.command()
+@click.option('--market', 'markets', default=["BTCUSDT"], multiple=True, help='Market to download, can be given many times', required=True)
+@click.option('--kind', default="klines", help='Candles or aggregate trades', type=click.Choice(HISTORY_KINDS), required=True)
+@click.option('--interval', default="1m", help='Kline interval, e.g. 1m, 1h, 1d', required=True)
+@click.option('--start', default="30 days ago UTC", help='Start of the range, a date or a relative time like "30 days ago UTC"', required=True)
+@click.option('--end', default=None, help='End of the range, defaults to now', required=False)
+@click.option('--workers', default=8, help='How many requests can be in flight at the same time', type=int, required=True)
+@click.option('--db', 'db_path', default=None, help='SQLite database to store the data in, defaults to history.sqlite in the cache directory', required=False, type=click.Path(dir_okay=False))
+def history(markets: Tuple[str], kind: str, interval: str, start: str, end: str, workers: int, db_path: str):
+    """Download historical klines or trades to a local database"""
+    from binance.helpers import date_to_milliseconds
+    from tabulate import tabulate
+
+    start_ms = date_to_milliseconds(start)
+    end_ms = date_to_milliseconds(end) if end else int(time.time() * 1000)
+    if start_ms >= end_ms:
+        raise RuntimeError(f"Start {start} is not before the end")
+
+    store = HistoryStore(db_path or get_default_db_path())
+    logger.info("Downloading %s of %s to %s", kind, ", ".join(markets), store.path)
+
+    def progress(done: int, total: int):
+        if done % 100 == 0 or done == total:
+            logger.info("%d / %d windows done", done, total)
+
+    started = time.perf_counter()
+    try:
+        results = download_history(client, store, kind, markets, start_ms, end_ms, interval=interval, workers=workers, progress=progress)
+    finally:
+        store.close()
+    duration = time.perf_counter() - started
+
+    print(tabulate([r.get_row() for r in results], DownloadResult.get_headers(), missingval="-"))
+    logger.info("Downloaded in %.2f s", duration)
+
+
+@click.command()
+@click.option('--samples', default=5, help='How many server time requests to make', required=True, type=int)
+def clock_offset(samples: int):
+    """Measure how far the local clock is from the server clock"""
+    from tabulate import tabulate
+
+    rows = []
+    measured = []
+    for idx in range(1, samples + 1):
+        sent_at = time.time() * 1000
+        server_time = client.get_server_time()["serverTime"]
+        offset, rtt = estimate_offset(sent_at, server_time, time.time() * 1000)
+        measured.append((offset, rtt))
+        rows.append((idx, offset, rtt))
+
+    print(tabulate(rows, ["Sample", "Offset ms", "Round-trip ms"], floatfmt=".1f"))
+    offset, rtt = min(measured, key=lambda s: s[1])
+    print("")
+    print(f"Server clock is {offset:+.1f} ms from the local clock, measured with the fastest round-trip of {rtt:.1f} ms")
 
 
 @click.command()
@@ -371,6 +912,8 @@ def console():
     imported_objects = {}
     import datetime
     from IPython import embed
+    from binance import enums as binance_enums
+    from tabulate import tabulate
 
     # Import some generic commands
     imported_objects["client"] = client
@@ -420,23 +963,92 @@ def console():
     embed(user_ns=imported_objects, colors="Linux")
 
 
-@click.group("Binance API Tester command line tool")
+class _Group(click.Group):
+    """Keep the subcommand line around, so that ``--use-daemon`` can forward it."""
+
+    def invoke(self, ctx):
+        ctx.meta["command_args"] = ctx.protected_args + ctx.args
+        return super().invoke(ctx)
+
+
+def print_metrics_summary():
+    """Print the request metrics to stderr, so that they do not mix with the command output."""
+    from tabulate import tabulate
+
+    rows = get_metrics().get_summary_rows()
+    if not rows:
+        return
+    print("", file=sys.stderr)
+    print(tabulate(rows, RequestMetrics.get_summary_headers(), floatfmt=".4g", missingval="-"), file=sys.stderr)
+
+    if clock_sync and clock_sync.signed_requests:
+        print("", file=sys.stderr)
+        print(tabulate(clock_sync.get_report_rows(), missingval="-"), file=sys.stderr)
+
+
+@click.group("Binance API Tester command line tool", cls=_Group)
 @click.option('--api-key', default=None, help='Binance API key', required=False)
 @click.option('--api-secret', default=None, help='Binance API secret', required=False)
 @click.option('--log-level', default="info", help='Python logging level', required=False)
 @click.option('--config-file', default=None, help='Read environment variables from this INI config file', required=False, type=click.Path(exists=True))
-@click.option('--network',  help='Binance API endpoint to use', type=click.Choice(['production', 'spot-testnet']), required=False)
-def main(api_key, api_secret, network, log_level, config_file):
+@click.option('--network',  help='Binance API endpoint to use', type=click.Choice(['production', 'spot-testnet', 'local']), required=False)
+@click.option('--async', 'async_', default=False, is_flag=True, help='Run independent API calls of a command concurrently using asyncio', required=False)
+@click.option('--dump-file', default=None, help='Write HTTP request/response dumps to this file as JSON lines', required=False, type=click.Path())
+@click.option('--dump-every', default=1, help='Dump only every Nth HTTP request', required=False, type=int)
+@click.option('--dump-body-limit', default=None, help='Truncate dumped HTTP bodies to this many characters', required=False, type=int)
+@click.option('--use-daemon', default=False, is_flag=True, envvar="BINANCE_TOOL_USE_DAEMON", help='Run the command on a server started with serve if one is running', required=False)
+@click.option('--metrics', 'print_metrics', default=False, is_flag=True, help='Print per-endpoint request latencies and errors when the command exits', required=False)
+@click.option('--metrics-port', default=None, help='Serve request metrics in Prometheus format at http://127.0.0.1:<port>/metrics', required=False, type=int)
+@click.option('--clock-sync/--no-clock-sync', 'sync_clock', default=True, help='Sign requests with the server clock, measured from the server time endpoint')
+@click.option('--recv-window', default=DEFAULT_RECV_WINDOW, help='How many milliseconds a signed request stays valid, at most 60000', required=False, type=int)
+@click.pass_context
+def main(ctx, api_key, api_secret, network, log_level, config_file, async_, dump_file, dump_every, dump_body_limit, use_daemon, print_metrics, metrics_port, sync_clock, recv_window):
     global client
     global bm
+    global use_async
+    global client_config
+    global clock_sync
     setup_logging(log_level)
 
+    if use_daemon and ctx.invoked_subcommand not in LOCAL_ONLY_COMMANDS and is_server_running(get_default_socket_path()):
+        # The server would silently run the command with its own options instead
+        given = ["/".join(p.opts + p.secondary_opts) for p in ctx.command.params if p.name in SERVER_OPTIONS and ctx.params[p.name] != p.default]
+        if given:
+            raise click.UsageError(f"{', '.join(given)} cannot be used with --use-daemon while a server is running, give them to serve instead")
+        result = forward_command(ctx.meta["command_args"])
+        if result is not None:
+            exit_code, output = result
+            sys.stdout.write(output)
+            ctx.exit(exit_code)
+    if use_daemon:
+        logger.info("No server running, running the command locally")
+
     # Read the configuratation
     if config_file:
         load_dotenv(dotenv_path=config_file, verbose=True)
         logger.info("Loaded API keys from %s", config_file)
 
-    client, bm = create_client(api_key, api_secret, network)
+    if dump_file or logger.isEnabledFor(logging.DEBUG):
+        request_dumper = RequestDumper(sample_every=dump_every, max_body=dump_body_limit, jsonl_path=dump_file)
+        atexit.register(request_dumper.close)
+    else:
+        request_dumper = None
+
+    if print_metrics:
+        atexit.register(print_metrics_summary)
+
+    if metrics_port:
+        start_metrics_server(get_metrics(), metrics_port)
+
+    # Shared by the sync and async clients, synced on the first signed request
+    clock_sync = ClockSync(recv_window=recv_window) if sync_clock else None
+
+    # Do not construct the clients until a command needs them
+    create_clients = lru_cache(maxsize=None)(partial(create_client, api_key, api_secret, network, request_dumper, clock_sync))
+    client = LazyProxy(lambda: create_clients()[0])
+    bm = LazyProxy(lambda: create_clients()[1])
+    use_async = async_
+    client_config = (api_key, api_secret, network)
     # Here jumps to the subcommand by click
 
 
@@ -445,14 +1057,22 @@ main.add_command(available_markets)
 main.add_command(market_info)
 main.add_command(create_limit_order)
 main.add_command(create_market_order)
+main.add_command(place_batch)
 main.add_command(current_price)
 main.add_command(depth)
+main.add_command(depth_scan)
+main.add_command(slippage)
 main.add_command(balances)
 main.add_command(fees)
 main.add_command(orders)
 main.add_command(check_order)
 main.add_command(cancel_all)
+main.add_command(load_test)
 main.add_command(order_event_stream)
+main.add_command(serve)
+main.add_command(record)
+main.add_command(history)
+main.add_command(clock_offset)
 main.add_command(version)
 main.add_command(console)
 
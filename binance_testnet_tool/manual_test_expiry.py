@@ -10,8 +10,11 @@ import logging
 from binance import enums as binance_enums
 from binance_testnet_tool.depth import Side, get_depth_info
 from binance_testnet_tool.logs import setup_logging
+from binance_testnet_tool.orderbook import OrderBookStream
+from binance_testnet_tool.ordertracker import OrderLatencyTracker
 from binance_testnet_tool.main import create_client
-from binance_testnet_tool.utils import check_accounted_api_client, quantize_price
+from binance_testnet_tool.utils import check_accounted_api_client
+from binance_testnet_tool.quantize import get_quantizer
 from binance_testnet_tool.console import print_colorful_json
 from dotenv import load_dotenv
 
@@ -23,11 +26,13 @@ logger = logging.getLogger()
 @click.option('--api-secret', default=None, help='Binance API secret', required=False)
 @click.option('--log-level', default="info", help='Python logging level', required=False)
 @click.option('--config-file', default=None, help='Read environment variables from this INI config file', required=False, type=click.Path(exists=True))
-def main(api_key, api_secret, log_level, config_file):
-    _main(api_key, api_secret, log_level, config_file)
+@click.option('--network', default="spot-testnet", help='Use local to run offline against the local exchange', type=click.Choice(['spot-testnet', 'local']), required=False)
+@click.option('--wait', default=15.0, help='How long to keep listening for events after the test order, seconds', required=False, type=float)
+def main(api_key, api_secret, log_level, config_file, network, wait):
+    _main(api_key, api_secret, log_level, config_file, network, wait)
 
 
-def _main(api_key, api_secret, log_level, config_file):
+def _main(api_key, api_secret, log_level, config_file, network="spot-testnet", wait=15.0):
     setup_logging(log_level)
 
     # Read the configuratation
@@ -35,16 +40,18 @@ def _main(api_key, api_secret, log_level, config_file):
         load_dotenv(dotenv_path=config_file, verbose=True)
         logger.info("Loaded API keys from %s", config_file)
 
-    network = "spot-testnet"
     client, bm = create_client(api_key, api_secret, network)
 
     # Subscribe to the events
     check_accounted_api_client(client)
     done = False
+    order_id = None
+    tracker = OrderLatencyTracker()
 
     def process_message(msg: dict):
         nonlocal done
         nonlocal order_id
+        tracker.process_event(msg)
         logger.info("Received event %s", msg["e"])
         print_colorful_json(msg)
 
@@ -61,26 +68,38 @@ def _main(api_key, api_secret, log_level, config_file):
     # Try to create 500 USD order that will get half filled
     market = "BTCUSDT"
     side = Side.ask
-    info = get_depth_info(client, market, side)
+
+    logger.info("Connecting to the websocket")
+    bm.start()
+
+    # Follow the order book locally instead of polling REST snapshots
+    book_stream = OrderBookStream(client, bm, market)
+    book_stream.start()
+    book = book_stream.get_book()
+    info = get_depth_info(client, market, side, book)
 
     print("*** Order book status before meddling")
     print(f"Top {info.side.value} is {info.top_order_price} {info.quote_asset} with the quantity of {info.top_order_quantity} {info.base_asset}")
     print(f"Total {info.cumulative_depth} {info.base_asset} {info.side.value}s at the liquidity of {info.total_liquidity:,} {info.quote_asset}, average price is {info.avg_price} {info.quote_asset}")
 
     # Create a sell order we are later going to buy
-    quantity = 0.005
+    quantizer = get_quantizer(client, market)
+    price, quantity = quantizer.quantize_order(info.top_order_price - 1, 0.005)
     order = client.create_order(
         symbol=market,
         side=binance_enums.SIDE_SELL,
         type=binance_enums.ORDER_TYPE_LIMIT,
         timeInForce=binance_enums.TIME_IN_FORCE_GTC,
         quantity=str(quantity),
-        price=str(info.top_order_price - 1))
+        price=str(price))
 
     print("Our counter-sell order is", order)
     assert order["status"] == "NEW"
 
-    info = get_depth_info(client, market, side)
+    # Wait until the diff stream has caught up with our order
+    if not book_stream.wait_for_update(book.last_update_id):
+        logger.warning("Did not receive order book updates for %s", market)
+    info = get_depth_info(client, market, side, book_stream.get_book())
     print("*** Order book after our test order injected")
     print(f"Top {info.side.value} is {info.top_order_price} {info.quote_asset} with the quantity of {info.top_order_quantity} {info.base_asset}")
     print(f"Total {info.cumulative_depth} {info.base_asset} {info.side.value}s at the liquidity of {info.total_liquidity:,} {info.quote_asset}, average price is {info.avg_price} {info.quote_asset}")
@@ -92,11 +111,7 @@ def _main(api_key, api_secret, log_level, config_file):
         sys.exit(f"There is no liquidity available to perform the test")
 
     # Create a limit IOC order that cannot be fully filled
-    quantity = 0.006
-    order_start_price = info.top_order_price
-
-    logger.info("Connecting to the websocket")
-    bm.start()
+    order_start_price, quantity = quantizer.quantize_order(info.top_order_price, 0.006)
 
     # start any sockets here, i.e a trade socket
     bm.start_user_socket(process_message)
@@ -110,6 +125,7 @@ def _main(api_key, api_secret, log_level, config_file):
         # is given to the client - maybe I am doing it wrong.
         print(f"Creating buy IOK order at {order_start_price} {info.quote_asset} for {quantity} {info.base_asset}")
         order_id = str(uuid.uuid4())
+        tracker.record_send(order_id)
         order = client.create_order(
             newClientOrderId=order_id,
             symbol=market,
@@ -118,6 +134,7 @@ def _main(api_key, api_secret, log_level, config_file):
             timeInForce=binance_enums.TIME_IN_FORCE_IOC,
             quantity=str(quantity),
             price=str(order_start_price))
+        tracker.record_ack(order_id)
 
         #  data: {'symbol': 'BTCUSDT', 'orderId': 2474558, 'orderListId': -1, 'clientOrderId': 'e3010788-fca3-45d1-a437-cc90c9f4bd28', 'transactTime': 1620987128677, 'price': '48557.00000000', 'origQty': '0.00600000', 'executedQty': '0.00400500', 'cummulativeQuoteQty': '194.47078500', 'status': 'EXPIRED', 'timeInForce': 'IOC', 'type': 'LIMIT', 'side': 'BUY', 'fills': [{'price': '48557.00000000', 'qty': '0.00400500', 'commission': '0.00000000', 'commissionAsset': 'BTC', 'tradeId': 652155}]}
         print(f"Created order, data: {order}")
@@ -136,11 +153,14 @@ def _main(api_key, api_secret, log_level, config_file):
         executed_price = total_liquidity_executed / float(order["executedQty"])
         print(f"Executed at price {executed_price} {info.quote_asset}, liquidity removed was {total_liquidity_executed} {info.quote_asset}")
 
-        end_time = time.time() + 15
+        end_time = time.time() + wait
         while time.time() < end_time:
             print("Sill waiting", end_time - time.time(), "seconds")
             time.sleep(1.0)
 
+        print("*** Order to event latency")
+        print(tracker.format_report())
+
     finally:
         print("Done, closing down might take a while")
         bm.stop()
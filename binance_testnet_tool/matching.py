@@ -0,0 +1,370 @@
+"""Order matching for the local exchange.
+
+Prices and quantities are integers counted in symbol ticks and lot steps,
+so that the matching never accumulates decimal rounding errors.
+Responses and events are formatted to the same shape and decimal strings Binance uses.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from heapq import heapify, heappop, heappush, nlargest, nsmallest
+from typing import Deque, Dict, List, Optional, Tuple
+
+BUY = "BUY"
+SELL = "SELL"
+
+#: Binance formats all decimals with 8 digits
+DECIMALS = Decimal("0.00000001")
+
+
+@dataclass
+class Order:
+    """An order in tick and lot units."""
+
+    order_id: int
+    client_order_id: str
+    symbol: str
+    side: str
+    #: LIMIT or MARKET
+    type: str
+    #: GTC, IOC or FOK, empty for market orders
+    time_in_force: str
+    #: Limit price in ticks, zero for market orders
+    price: int
+    #: Quantity in lot steps
+    quantity: int
+    #: Account that placed the order
+    owner: str = ""
+    executed: int = 0
+    #: Executed quote amount in tick * lot units
+    quote: int = 0
+    status: str = "NEW"
+    #: Milliseconds
+    time: int = field(default_factory=lambda: int(time.time() * 1000))
+
+    def get_remaining(self) -> int:
+        return self.quantity - self.executed
+
+    def is_open(self) -> bool:
+        return self.status in ("NEW", "PARTIALLY_FILLED")
+
+
+@dataclass
+class Trade:
+    """A single fill between a resting maker order and an incoming taker order."""
+
+    trade_id: int
+    price: int
+    quantity: int
+    maker: Order
+    taker: Order
+
+
+class MatchingEngine:
+    """Price-time priority order book of a single symbol.
+
+    Each price level is a FIFO queue of orders. The level prices of both sides are kept in heaps,
+    bids negated, so that the best price is found without sorting the book.
+    Cancelled orders and emptied levels are removed lazily when they come up in matching.
+    """
+
+    def __init__(self, symbol: str, tick_size: Decimal, step_size: Decimal):
+        self.symbol = symbol
+        self.tick_size = tick_size
+        self.step_size = step_size
+        #: price: orders in arrival order
+        self.bid_queues: Dict[int, Deque[Order]] = {}
+        self.ask_queues: Dict[int, Deque[Order]] = {}
+        #: Negated bid prices and ask prices, may contain prices of emptied levels
+        self.bid_heap: List[int] = []
+        self.ask_heap: List[int] = []
+        #: Total resting quantity per price
+        self.bid_levels: Dict[int, int] = {}
+        self.ask_levels: Dict[int, int] = {}
+        #: Resting orders by order id
+        self.orders: Dict[int, Order] = {}
+        #: (side, price) of the levels changed since the last :py:meth:`pop_changed_levels`
+        self.changed_levels = set()
+        self.next_trade_id = 1
+
+    def _rest(self, order: Order):
+        price = order.price
+        if order.side == BUY:
+            queues, levels, heap, key = self.bid_queues, self.bid_levels, self.bid_heap, -price
+        else:
+            queues, levels, heap, key = self.ask_queues, self.ask_levels, self.ask_heap, price
+        queue = queues.get(price)
+        if queue is None:
+            queue = queues[price] = deque()
+            if len(heap) > 2 * len(levels) + 64:
+                # Levels emptied by cancels come back often with replayed books, drop their stale heap entries
+                heap[:] = [-p for p in levels] if order.side == BUY else list(levels)
+                heapify(heap)
+            heappush(heap, key)
+        queue.append(order)
+        levels[price] = levels.get(price, 0) + order.get_remaining()
+        self.orders[order.order_id] = order
+        self.changed_levels.add((order.side, price))
+
+    def _best_key(self, heap: List[int], levels: Dict[int, int], negated: bool) -> Optional[int]:
+        """Heap key of the best level, dropping emptied levels from the top of the heap."""
+        while heap:
+            key = heap[0]
+            if (-key if negated else key) in levels:
+                return key
+            heappop(heap)
+        return None
+
+    def get_fillable_quantity(self, side: str, price: Optional[int], quantity: int) -> int:
+        """How much of an incoming order could be filled right away, up to ``quantity``.
+
+        :param price: Limit price, None for market orders
+        """
+        total = 0
+        if side == BUY:
+            levels = self.ask_levels.items() if price is None else ((p, q) for p, q in self.ask_levels.items() if p <= price)
+        else:
+            levels = self.bid_levels.items() if price is None else ((p, q) for p, q in self.bid_levels.items() if p >= price)
+        for p, q in levels:
+            total += q
+            if total >= quantity:
+                return quantity
+        return total
+
+    def get_fill_cost(self, side: str, quantity: int) -> int:
+        """Price times quantity of filling a market order right away, in ticks times lots.
+
+        Only the part of ``quantity`` the book can fill is counted.
+        """
+        if side == BUY:
+            heap, levels, negated = list(self.ask_heap), self.ask_levels, False
+        else:
+            heap, levels, negated = list(self.bid_heap), self.bid_levels, True
+        # Pop the best levels off a copy of the heap until the quantity is covered
+        cost = 0
+        seen = set()
+        while quantity and heap:
+            price = -heappop(heap) if negated else heappop(heap)
+            # The heap may hold emptied levels, and a price again after its level came back
+            if price in seen or price not in levels:
+                continue
+            seen.add(price)
+            fill = min(quantity, levels[price])
+            cost += fill * price
+            quantity -= fill
+        return cost
+
+    def submit(self, order: Order) -> List[Trade]:
+        """Match an incoming order.
+
+        What is left of a GTC limit order rests on the book. IOC and market orders expire with what they could fill.
+        FOK orders expire without filling anything unless they can be filled completely.
+
+        :return: Fills in the order they happened
+        """
+        trades = []
+        is_market = order.type == "MARKET"
+        if order.time_in_force == "FOK" and self.get_fillable_quantity(order.side, None if is_market else order.price, order.quantity) < order.quantity:
+            order.status = "EXPIRED"
+            return trades
+
+        if order.side == BUY:
+            queues, levels, heap, negated, maker_side = self.ask_queues, self.ask_levels, self.ask_heap, False, SELL
+        else:
+            queues, levels, heap, negated, maker_side = self.bid_queues, self.bid_levels, self.bid_heap, True, BUY
+
+        remaining = order.quantity - order.executed
+        changed_levels = self.changed_levels
+        orders = self.orders
+        while remaining:
+            key = self._best_key(heap, levels, negated)
+            if key is None:
+                break
+            price = -key if negated else key
+            if not is_market and (price > order.price if not negated else price < order.price):
+                break
+
+            queue = queues[price]
+            level_quantity = levels[price]
+            while remaining and queue:
+                maker = queue[0]
+                maker_remaining = maker.quantity - maker.executed
+                if maker.status not in ("NEW", "PARTIALLY_FILLED"):
+                    # Cancelled while resting
+                    queue.popleft()
+                    continue
+                quantity = remaining if remaining < maker_remaining else maker_remaining
+                trades.append(Trade(self.next_trade_id, price, quantity, maker, order))
+                self.next_trade_id += 1
+                remaining -= quantity
+                level_quantity -= quantity
+                maker.executed += quantity
+                maker.quote += quantity * price
+                order.quote += quantity * price
+                if quantity == maker_remaining:
+                    maker.status = "FILLED"
+                    queue.popleft()
+                    del orders[maker.order_id]
+                else:
+                    maker.status = "PARTIALLY_FILLED"
+
+            changed_levels.add((maker_side, price))
+            if level_quantity:
+                levels[price] = level_quantity
+            else:
+                del levels[price]
+                del queues[price]
+                heappop(heap)
+
+        order.executed = order.quantity - remaining
+        if remaining:
+            if order.executed:
+                order.status = "PARTIALLY_FILLED"
+            if not is_market and order.time_in_force == "GTC":
+                self._rest(order)
+            else:
+                order.status = "EXPIRED"
+        else:
+            order.status = "FILLED"
+        return trades
+
+    def cancel(self, order_id: int) -> Optional[Order]:
+        """Remove a resting order.
+
+        The order stays in its level queue until matching reaches it.
+
+        :return: None if the order is not on the book
+        """
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        if order.side == BUY:
+            queues, levels = self.bid_queues, self.bid_levels
+        else:
+            queues, levels = self.ask_queues, self.ask_levels
+        remaining = levels[order.price] - order.get_remaining()
+        if remaining:
+            levels[order.price] = remaining
+        else:
+            # Level is left empty, the heap drops the price lazily
+            del levels[order.price]
+            del queues[order.price]
+        self.changed_levels.add((order.side, order.price))
+        order.status = "CANCELED"
+        return order
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        return self.orders.get(order_id)
+
+    def get_open_orders(self) -> List[Order]:
+        return list(self.orders.values())
+
+    def best_bid(self) -> Optional[int]:
+        key = self._best_key(self.bid_heap, self.bid_levels, True)
+        return None if key is None else -key
+
+    def best_ask(self) -> Optional[int]:
+        return self._best_key(self.ask_heap, self.ask_levels, False)
+
+    def get_depth(self, limit: int) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Aggregated (price, quantity) levels, best first."""
+        bids = [(p, self.bid_levels[p]) for p in nlargest(limit, self.bid_levels)]
+        asks = [(p, self.ask_levels[p]) for p in nsmallest(limit, self.ask_levels)]
+        return bids, asks
+
+    def get_level_quantity(self, side: str, price: int) -> int:
+        levels = self.bid_levels if side == BUY else self.ask_levels
+        return levels.get(price, 0)
+
+    def pop_changed_levels(self) -> List[Tuple[str, int, int]]:
+        """Levels changed since the last call as (side, price, new total quantity)."""
+        changed = [(side, price, self.get_level_quantity(side, price)) for side, price in self.changed_levels]
+        self.changed_levels.clear()
+        return changed
+
+    def format_price(self, ticks: int) -> str:
+        return format((ticks * self.tick_size).quantize(DECIMALS), "f")
+
+    def format_quantity(self, lots: int) -> str:
+        return format((lots * self.step_size).quantize(DECIMALS), "f")
+
+    def format_quote(self, quote: int) -> str:
+        return format((quote * self.tick_size * self.step_size).quantize(DECIMALS), "f")
+
+    def order_response(self, order: Order, trades: List[Trade] = None) -> dict:
+        """Order as in ``POST /api/v3/order`` FULL response, or ``GET /api/v3/order`` without the fills."""
+        response = {
+            "symbol": order.symbol,
+            "orderId": order.order_id,
+            "orderListId": -1,
+            "clientOrderId": order.client_order_id,
+            "transactTime": order.time,
+            "price": self.format_price(order.price),
+            "origQty": self.format_quantity(order.quantity),
+            "executedQty": self.format_quantity(order.executed),
+            "cummulativeQuoteQty": self.format_quote(order.quote),
+            "status": order.status,
+            "timeInForce": order.time_in_force or "GTC",
+            "type": order.type,
+            "side": order.side,
+        }
+        if trades is not None:
+            response["fills"] = [
+                {
+                    "price": self.format_price(t.price),
+                    "qty": self.format_quantity(t.quantity),
+                    "commission": "0.00000000",
+                    "commissionAsset": "BNB",
+                    "tradeId": t.trade_id,
+                } for t in trades
+            ]
+        return response
+
+    def execution_report(self, order: Order, execution_type: str, trade: Trade = None, status: str = None, executed: int = None, quote: int = None) -> dict:
+        """User data stream ``executionReport`` event for an order status change.
+
+        The status and executed amounts default to the current state of the order.
+        Give them to report an earlier state, e.g. the NEW event of an order that has been filled since.
+
+        :param execution_type: NEW, CANCELED, TRADE or EXPIRED
+        :param trade: The fill for TRADE events
+        """
+        event_time = int(time.time() * 1000)
+        status = status or order.status
+        executed = order.executed if executed is None else executed
+        quote = order.quote if quote is None else quote
+        return {
+            "e": "executionReport",
+            "E": event_time,
+            "s": order.symbol,
+            "c": order.client_order_id,
+            "S": order.side,
+            "o": order.type,
+            "f": order.time_in_force or "GTC",
+            "q": self.format_quantity(order.quantity),
+            "p": self.format_price(order.price),
+            "P": "0.00000000",
+            "F": "0.00000000",
+            "g": -1,
+            "C": order.client_order_id if execution_type == "CANCELED" else "",
+            "x": execution_type,
+            "X": status,
+            "r": "NONE",
+            "i": order.order_id,
+            "l": self.format_quantity(trade.quantity) if trade else "0.00000000",
+            "z": self.format_quantity(executed),
+            "L": self.format_price(trade.price) if trade else "0.00000000",
+            "n": "0",
+            "N": None,
+            "T": event_time,
+            "t": trade.trade_id if trade else -1,
+            "I": 0,
+            "w": status in ("NEW", "PARTIALLY_FILLED"),
+            "m": trade is not None and trade.maker is order,
+            "M": False,
+            "O": order.time,
+            "Z": self.format_quote(quote),
+            "Y": self.format_quote(trade.price * trade.quantity) if trade else "0.00000000",
+            "Q": "0.00000000",
+        }
@@ -0,0 +1,242 @@
+"""Per-endpoint REST API metrics.
+
+A requests session response hook records the latency, HTTP status and Binance error code
+of every response, and the used request weight the response reports.
+Long running commands can expose the metrics in Prometheus text format over HTTP,
+one-shot commands can print a summary table when they exit.
+"""
+import logging
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, TYPE_CHECKING
+
+from binance_testnet_tool.stats import LatencySummary
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+
+
+logger = logging.getLogger()
+
+#: Prometheus histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+#: How many latest latency samples per endpoint are kept for percentiles
+MAX_SAMPLES = 10_000
+
+_shared_metrics: Optional["RequestMetrics"] = None
+
+
+@dataclass
+class EndpointMetrics:
+    """Counters of one ``METHOD /path`` endpoint."""
+
+    count: int = 0
+    total_seconds: float = 0
+    #: Count of samples per :py:data:`LATENCY_BUCKETS` bound, the last one is +Inf
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    statuses: Counter = field(default_factory=Counter)
+    #: Binance error code -> count
+    error_codes: Counter = field(default_factory=Counter)
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=MAX_SAMPLES))
+
+    def record(self, seconds: float, status: int, error_code: Optional[int]):
+        self.count += 1
+        self.total_seconds += seconds
+        idx = 0
+        while idx < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[idx]:
+            idx += 1
+        self.buckets[idx] += 1
+        self.statuses[status] += 1
+        if error_code is not None:
+            self.error_codes[error_code] += 1
+        self.samples.append(seconds)
+
+    @property
+    def errors(self) -> int:
+        return sum(c for s, c in self.statuses.items() if s >= 400)
+
+
+def _get_error_code(response) -> Optional[int]:
+    """Binance error code from an error response body."""
+    if response.status_code < 400:
+        return None
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class RequestMetrics:
+    """Thread safe per-endpoint request metrics."""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+        #: Latest X-MBX-USED-WEIGHT-1M
+        self.used_weight: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def record(self, method: str, path: str, seconds: float, status: int, error_code: Optional[int] = None, used_weight: Optional[int] = None):
+        """
+        :param path: URL path without the query string, e.g. ``/api/v3/order``
+        """
+        endpoint = f"{method} {path}"
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.record(seconds, status, error_code)
+            if used_weight is not None:
+                self.used_weight = used_weight
+
+    def record_used_weight(self, used_weight: int):
+        with self.lock:
+            self.used_weight = used_weight
+
+    def hook(self, response, *args, **kwargs):
+        """requests session response hook."""
+        request = response.request
+        used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        self.record(
+            request.method,
+            request.path_url.split("?", 1)[0],
+            # Time until the response headers were parsed
+            response.elapsed.total_seconds(),
+            response.status_code,
+            _get_error_code(response),
+            int(used_weight) if used_weight is not None else None,
+        )
+
+    def get_summary_rows(self) -> List[list]:
+        """Endpoints sorted by the total time spent on them, most first."""
+        with self.lock:
+            items = [(endpoint, m, list(m.samples)) for endpoint, m in self.endpoints.items()]
+        wall_total = sum(m.total_seconds for _, m, _ in items) or 1
+        rows = []
+        for endpoint, m, samples in sorted(items, key=lambda i: i[1].total_seconds, reverse=True):
+            summary = LatencySummary.from_samples(samples)
+            codes = ", ".join(f"{code}×{count}" for code, count in sorted(m.error_codes.items()))
+            rows.append([endpoint, m.count, m.errors, codes or None, m.total_seconds, m.total_seconds / wall_total * 100, summary.p50, summary.p95, summary.max])
+        return rows
+
+    @staticmethod
+    def get_summary_headers() -> List[str]:
+        return ["Endpoint", "Requests", "Errors", "Error codes", "Total s", "Time %", "p50 ms", "p95 ms", "Max ms"]
+
+    def format_prometheus(self) -> str:
+        """Metrics in Prometheus text exposition format."""
+        lines = [
+            "# HELP binance_request_duration_seconds REST API response time",
+            "# TYPE binance_request_duration_seconds histogram",
+        ]
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, m in endpoints:
+                label = f'endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), m.buckets):
+                    cumulative += count
+                    lines.append(f'binance_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"binance_request_duration_seconds_sum{{{label}}} {m.total_seconds}")
+                lines.append(f"binance_request_duration_seconds_count{{{label}}} {m.count}")
+
+            lines += ["# HELP binance_responses_total REST API responses by HTTP status", "# TYPE binance_responses_total counter"]
+            for endpoint, m in endpoints:
+                for status, count in sorted(m.statuses.items()):
+                    lines.append(f'binance_responses_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            lines += ["# HELP binance_api_errors_total REST API errors by Binance error code", "# TYPE binance_api_errors_total counter"]
+            for endpoint, m in endpoints:
+                for code, count in sorted(m.error_codes.items()):
+                    lines.append(f'binance_api_errors_total{{endpoint="{_escape(endpoint)}",code="{code}"}} {count}')
+
+            if self.used_weight is not None:
+                lines += [
+                    "# HELP binance_used_weight_1m Request weight used in the current minute as reported by Binance",
+                    "# TYPE binance_used_weight_1m gauge",
+                    f"binance_used_weight_1m {self.used_weight}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+def get_metrics() -> RequestMetrics:
+    """The metrics shared by all clients in this process."""
+    global _shared_metrics
+    if _shared_metrics is None:
+        _shared_metrics = RequestMetrics()
+    return _shared_metrics
+
+
+def install_metrics(client: "Client", metrics: RequestMetrics):
+    client.session.hooks["response"].append(metrics.hook)
+    # The local client does not use HTTP and records the metrics itself
+    client.metrics = metrics
+
+
+def install_metrics_async(async_client: "AsyncClient", metrics: RequestMetrics):
+    """Same as :py:func:`install_metrics` for the async client.
+
+    Must be installed before the rate limiter, so that the waits for the limiter are not counted.
+    """
+    import time
+    from urllib.parse import urlparse
+    from binance.exceptions import BinanceAPIException
+
+    request = async_client._request
+    handle_response = async_client._handle_response
+
+    async def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        path = urlparse(uri).path
+        started = time.perf_counter()
+        try:
+            result = await request(method, uri, signed, force_params, **kwargs)
+        except BinanceAPIException as e:
+            metrics.record(method.upper(), path, time.perf_counter() - started, e.status_code, e.code)
+            raise
+        metrics.record(method.upper(), path, time.perf_counter() - started, 200)
+        return result
+
+    async def _handle_response(response):
+        used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        if used_weight is not None:
+            metrics.record_used_weight(int(used_weight))
+        return await handle_response(response)
+
+    async_client._request = _request
+    async_client._handle_response = _handle_response
+
+
+def start_metrics_server(metrics: RequestMetrics, port: int, host: str = "127.0.0.1"):
+    """Serve ``/metrics`` from a daemon thread.
+
+    :return: The running ``ThreadingHTTPServer``
+    """
+    # http.server takes tens of milliseconds to import, only pay for it when serving
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.format_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("Metrics request: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics at http://%s:%d/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,456 @@
+"""Locally maintained order book.
+
+The book is seeded from a REST depth snapshot and kept current from the ``<symbol>@depth`` diff stream.
+Update ids are sequenced as described in Binance docs, so that a missed diff is detected and the book resynced:
+
+https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#how-to-manage-a-local-order-book-correctly
+"""
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+    from binance import ThreadedWebsocketManager
+
+
+logger = logging.getLogger()
+
+
+#: (price, quantity)
+PriceLevel = Tuple[float, float]
+
+#: Seconds to wait before reloading a snapshot older than the diff stream, doubled on each attempt
+SNAPSHOT_RETRY_DELAY = 0.5
+
+#: Snapshots loaded before giving up on a resync
+MAX_SNAPSHOT_ATTEMPTS = 6
+
+#: Streams kept running by a long lived process, see :py:func:`load_order_book`
+_live_streams: Dict[str, "OrderBookStream"] = {}
+
+
+class OrderBookGap(Exception):
+    """The diff stream skipped update ids and the book must be resynced from a new snapshot."""
+
+
+class BookSide:
+    """One side of the order book kept sorted in parallel numeric arrays.
+
+    Levels are stored best price first. For bids the sort key is the negated price,
+    so both sides can be searched with :py:mod:`bisect`.
+    Prefix sums of quantity and notional are rebuilt lazily after the side has been modified,
+    so repeated reads between updates are O(1) or O(log n).
+    """
+
+    def __init__(self, descending: bool):
+        #: True for bids
+        self.descending = descending
+        self.keys = array("d")
+        self.quantities = array("d")
+        self._cum_quantity: Optional[array] = None
+        self._cum_notional: Optional[array] = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def price_at(self, idx: int) -> float:
+        return -self.keys[idx] if self.descending else self.keys[idx]
+
+    def load(self, levels: Iterable[Tuple[str, str]]):
+        """Replace all levels with (price, quantity) pairs from a REST snapshot."""
+        parsed = sorted((self._key(float(p)), float(q)) for p, q in levels)
+        self.keys = array("d", (k for k, q in parsed if q))
+        self.quantities = array("d", (q for k, q in parsed if q))
+        self._cum_quantity = None
+
+    def update(self, price: float, quantity: float):
+        """Set the quantity of a price level, zero quantity removes the level."""
+        key = self._key(price)
+        idx = bisect_left(self.keys, key)
+        exists = idx < len(self.keys) and self.keys[idx] == key
+        if quantity == 0:
+            if exists:
+                del self.keys[idx]
+                del self.quantities[idx]
+        elif exists:
+            self.quantities[idx] = quantity
+        else:
+            self.keys.insert(idx, key)
+            self.quantities.insert(idx, quantity)
+        self._cum_quantity = None
+
+    def copy(self) -> "BookSide":
+        side = BookSide(self.descending)
+        side.keys = array("d", self.keys)
+        side.quantities = array("d", self.quantities)
+        return side
+
+    def levels(self) -> List[PriceLevel]:
+        """All levels, the best price first."""
+        return [(self.price_at(i), q) for i, q in enumerate(self.quantities)]
+
+    def top(self) -> Optional[PriceLevel]:
+        if not self.keys:
+            return None
+        return self.price_at(0), self.quantities[0]
+
+    def _prefix_sums(self) -> Tuple[array, array]:
+        if self._cum_quantity is None:
+            sign = -1 if self.descending else 1
+            self._cum_quantity = array("d", accumulate(self.quantities))
+            self._cum_notional = array("d", accumulate(sign * k * q for k, q in zip(self.keys, self.quantities)))
+        return self._cum_quantity, self._cum_notional
+
+    def total_quantity(self) -> float:
+        cum_quantity, _ = self._prefix_sums()
+        return cum_quantity[-1] if cum_quantity else 0
+
+    def total_notional(self) -> float:
+        _, cum_notional = self._prefix_sums()
+        return cum_notional[-1] if cum_notional else 0
+
+    def fill_notional(self, quantity: float) -> Optional[float]:
+        """How much quote currency a market order of ``quantity`` would take from this side.
+
+        :return: None if there is not enough quantity on the book
+        """
+        cum_quantity, cum_notional = self._prefix_sums()
+        idx = bisect_left(cum_quantity, quantity)
+        if idx >= len(cum_quantity):
+            return None
+        filled_quantity = cum_quantity[idx - 1] if idx else 0
+        filled_notional = cum_notional[idx - 1] if idx else 0
+        return filled_notional + (quantity - filled_quantity) * self.price_at(idx)
+
+    def fill_for_notional(self, notional: float) -> Optional[Tuple[float, float]]:
+        """How much base currency a market order spending ``notional`` quote currency would get from this side.
+
+        :return: (quantity, price of the last level touched) or None if there is not enough liquidity on the book
+        """
+        cum_quantity, cum_notional = self._prefix_sums()
+        idx = bisect_left(cum_notional, notional)
+        if idx >= len(cum_notional):
+            return None
+        filled_quantity = cum_quantity[idx - 1] if idx else 0
+        filled_notional = cum_notional[idx - 1] if idx else 0
+        price = self.price_at(idx)
+        return filled_quantity + (notional - filled_notional) / price, price
+
+    def execution_curve(self) -> List[Tuple[float, float]]:
+        """Cumulative quantity and notional after eating each level, the best price first.
+
+        Average execution price of a market order sweeping through level ``i`` is ``notional[i] / quantity[i]``.
+
+        :return: List of (cumulative quantity, cumulative notional)
+        """
+        cum_quantity, cum_notional = self._prefix_sums()
+        return list(zip(cum_quantity, cum_notional))
+
+    def vwap(self, quantity: float) -> Optional[float]:
+        """Average execution price for a market order of ``quantity`` eating into this side."""
+        notional = self.fill_notional(quantity)
+        if notional is None or quantity <= 0:
+            return None
+        return notional / quantity
+
+    def liquidity_within(self, percent: float, reference_price: float = None) -> Tuple[float, float]:
+        """Quantity and notional available within ``percent`` of the reference price.
+
+        :param reference_price: Defaults to the top of this side
+        :return: (quantity, notional)
+        """
+        if not self.keys:
+            return 0, 0
+        if reference_price is None:
+            reference_price = self.price_at(0)
+        # Tolerate float noise, so that a level exactly at the bound is included
+        if self.descending:
+            bound = reference_price * (1 - percent / 100) * (1 - 1e-12)
+        else:
+            bound = reference_price * (1 + percent / 100) * (1 + 1e-12)
+        idx = bisect_right(self.keys, self._key(bound))
+        if idx == 0:
+            return 0, 0
+        cum_quantity, cum_notional = self._prefix_sums()
+        return cum_quantity[idx - 1], cum_notional[idx - 1]
+
+
+class OrderBook:
+    """Order book for a single market built from a depth snapshot and diff events."""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_update_id: Optional[int] = None
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        # The first diff after a snapshot is allowed to overlap with the snapshot
+        self.first_diff = True
+
+    @classmethod
+    def from_snapshot(cls, symbol: str, snapshot: dict) -> "OrderBook":
+        """Create a book out of ``client.get_order_book()`` response."""
+        book = cls(symbol)
+        book.apply_snapshot(snapshot)
+        return book
+
+    def is_synced(self) -> bool:
+        return self.last_update_id is not None
+
+    def apply_snapshot(self, snapshot: dict):
+        """Replace the book content with a REST depth snapshot."""
+        self.bids.load(snapshot["bids"])
+        self.asks.load(snapshot["asks"])
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.first_diff = True
+
+    def apply_diff(self, event: dict) -> bool:
+        """Apply a ``depthUpdate`` event from the diff stream.
+
+        :return: False if the event was older than the book and was ignored
+        :raise OrderBookGap: If we have missed events between the book and this event
+        """
+        assert self.is_synced(), "Cannot apply diffs before the snapshot has been loaded"
+
+        first_update_id = event["U"]
+        final_update_id = event["u"]
+
+        if final_update_id <= self.last_update_id:
+            return False
+
+        if self.first_diff:
+            if first_update_id > self.last_update_id + 1:
+                raise OrderBookGap(f"{self.symbol}: first diff starts at {first_update_id}, snapshot is at {self.last_update_id}")
+        elif first_update_id != self.last_update_id + 1:
+            raise OrderBookGap(f"{self.symbol}: expected diff starting at {self.last_update_id + 1}, got {first_update_id}")
+
+        _apply_levels(self.bids, event["b"])
+        _apply_levels(self.asks, event["a"])
+        self.last_update_id = final_update_id
+        self.first_diff = False
+        return True
+
+    def get_asks(self) -> List[PriceLevel]:
+        """Asks, the best (the lowest) price first."""
+        return self.asks.levels()
+
+    def get_bids(self) -> List[PriceLevel]:
+        """Bids, the best (the highest) price first."""
+        return self.bids.levels()
+
+    def best_ask(self) -> Optional[PriceLevel]:
+        return self.asks.top()
+
+    def best_bid(self) -> Optional[PriceLevel]:
+        return self.bids.top()
+
+    def mid_price(self) -> Optional[float]:
+        if not (self.asks and self.bids):
+            return None
+        return (self.asks.price_at(0) + self.bids.price_at(0)) / 2
+
+    def spread(self) -> Optional[float]:
+        """Spread as a fraction of the best bid."""
+        if not (self.asks and self.bids):
+            return None
+        top_bid = self.bids.price_at(0)
+        return (self.asks.price_at(0) - top_bid) / top_bid
+
+    def copy(self) -> "OrderBook":
+        book = OrderBook(self.symbol)
+        book.last_update_id = self.last_update_id
+        book.bids = self.bids.copy()
+        book.asks = self.asks.copy()
+        book.first_diff = self.first_diff
+        return book
+
+
+def _apply_levels(side: BookSide, updates: list):
+    """Update price levels in place, zero quantity removes the level."""
+    for price, quantity in updates:
+        side.update(float(price), float(quantity))
+
+
+def fetch_order_book(client: "Client", market: str, limit: int = 100) -> OrderBook:
+    """Load a one-off order book using a REST snapshot."""
+    return OrderBook.from_snapshot(market, client.get_order_book(symbol=market, limit=limit))
+
+
+async def fetch_order_book_async(client: "AsyncClient", market: str, limit: int = 100) -> OrderBook:
+    """Load a one-off order book using a REST snapshot over the async client."""
+    return OrderBook.from_snapshot(market, await client.get_order_book(symbol=market, limit=limit))
+
+
+def register_live_stream(stream: "OrderBookStream"):
+    """Let :py:func:`load_order_book` read the market from a running stream instead of REST."""
+    _live_streams[stream.market] = stream
+
+
+def load_order_book(client: "Client", market: str, limit: int = 100) -> OrderBook:
+    """Get the order book from a live stream if one is running, otherwise load a REST snapshot."""
+    stream = _live_streams.get(market)
+    if stream and stream.book.is_synced():
+        return stream.get_book()
+    return fetch_order_book(client, market, limit)
+
+
+class OrderBookStream:
+    """Keep a local order book up-to-date from the depth websocket.
+
+    Readers get a consistent copy of the book with :py:meth:`get_book`
+    instead of doing a REST round-trip per read.
+    """
+
+    def __init__(
+            self,
+            client: "Client",
+            bm: "ThreadedWebsocketManager",
+            market: str,
+            limit: int = 1000,
+            interval: int = 100,
+            retry_delay: float = SNAPSHOT_RETRY_DELAY,
+            max_attempts: int = MAX_SNAPSHOT_ATTEMPTS):
+        """
+        :param bm: Websocket manager, must be started with ``bm.start()`` before calling :py:meth:`start`
+        :param limit: How many levels we load for the initial snapshot
+        :param interval: Diff stream update speed in milliseconds, 100 or 1000
+        :param retry_delay: Seconds to wait before reloading a snapshot older than the diffs, doubled on each attempt
+        :param max_attempts: Snapshots loaded before giving up on a resync
+        """
+        self.client = client
+        self.bm = bm
+        self.market = market
+        self.limit = limit
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.book = OrderBook(market)
+        self.conn_key = None
+        self.resync_count = 0
+        #: Diff events received while a snapshot is loading
+        self.pending: Optional[List[dict]] = None
+        #: Background resync started from the websocket thread, None when not running
+        self.resync_thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        self.updated = threading.Condition()
+
+    def start(self):
+        """Subscribe to the diff stream and load the initial snapshot."""
+        # Buffer the diffs from the very first one, the snapshot may be older than them
+        self._begin_resync()
+        self.stopped.clear()
+        self.conn_key = self.bm.start_depth_socket(self.process_message, symbol=self.market, interval=self.interval)
+        self._load_snapshot()
+
+    def stop(self):
+        self.stopped.set()
+        if self.conn_key:
+            self.bm.stop_socket(self.conn_key)
+            self.conn_key = None
+
+    def resync(self):
+        """Reload the book from a REST snapshot, blocking until it is loaded."""
+        self._begin_resync()
+        self._load_snapshot()
+
+    def _begin_resync(self):
+        with self.updated:
+            if self.pending is None:
+                self.pending = []
+            # Readers fall back to REST until the new snapshot is in
+            self.book.last_update_id = None
+
+    def _load_snapshot(self):
+        """Load snapshots until one is recent enough to continue with the buffered diffs.
+
+        https://binance-docs.github.io/apidocs/spot/en/#how-to-manage-a-local-order-book-correctly
+
+        :raise RuntimeError: If no snapshot caught up with the diffs in ``max_attempts``
+        """
+        for attempt in range(self.max_attempts):
+            # Back off, a snapshot costs up to 50 weight and the next one may lag behind the diffs just the same
+            if attempt and self.stopped.wait(self.retry_delay * 2 ** (attempt - 1)):
+                return
+            if self.stopped.is_set():
+                return
+            # Do not hold the lock over the request, so the websocket thread can keep buffering
+            logger.debug("Loading order book snapshot for %s", self.market)
+            snapshot = self.client.get_order_book(symbol=self.market, limit=self.limit)
+            with self.updated:
+                book = OrderBook.from_snapshot(self.market, snapshot)
+                try:
+                    # Diffs older than the snapshot are skipped by apply_diff()
+                    for msg in self.pending:
+                        book.apply_diff(msg)
+                except OrderBookGap as e:
+                    logger.info("Order book snapshot of %s is older than the buffered diffs, reloading: %s", self.market, e)
+                    continue
+                self.book = book
+                self.pending = None
+                self.resync_count += 1
+                self.updated.notify_all()
+                return
+        raise RuntimeError(f"No order book snapshot of {self.market} caught up with the diff stream in {self.max_attempts} attempts")
+
+    def _resync_in_background(self):
+        try:
+            self._load_snapshot()
+        except Exception:
+            logger.exception("Order book resync of %s failed", self.market)
+            with self.updated:
+                # Stop buffering, the next diff starts another resync
+                self.pending = None
+        finally:
+            with self.updated:
+                self.resync_thread = None
+
+    def process_message(self, msg: dict):
+        """Websocket callback for depth diff events."""
+        if msg.get("e") == "error":
+            logger.error("Depth stream for %s failed: %s", self.market, msg)
+            return
+
+        with self.updated:
+            if self.pending is not None:
+                # Snapshot is loading, the diffs are applied on top of it
+                self.pending.append(msg)
+                return
+            if self.book.is_synced():
+                try:
+                    self.book.apply_diff(msg)
+                    self.updated.notify_all()
+                    return
+                except OrderBookGap as e:
+                    logger.warning("Order book out of sync, resyncing: %s", e)
+            else:
+                logger.warning("Order book of %s is not synced after a failed resync, resyncing", self.market)
+            self._begin_resync()
+            self.pending.append(msg)
+            if self.resync_thread is None:
+                # Do not block the websocket thread with the REST request
+                self.resync_thread = threading.Thread(target=self._resync_in_background, name=f"{self.market}-book-resync", daemon=True)
+                self.resync_thread.start()
+
+    def wait_for_update(self, after_update_id: int = None, timeout: float = 10.0) -> bool:
+        """Block until the book is synced and has moved past the given update id.
+
+        :return: False on timeout
+        """
+        def _ready():
+            if not self.book.is_synced():
+                return False
+            return after_update_id is None or self.book.last_update_id > after_update_id
+
+        with self.updated:
+            return self.updated.wait_for(_ready, timeout=timeout)
+
+    def get_book(self) -> OrderBook:
+        """Get a copy of the current book that is safe to read from another thread."""
+        with self.updated:
+            return self.book.copy()
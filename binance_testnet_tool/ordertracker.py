@@ -0,0 +1,113 @@
+"""Order-to-event latency measurement.
+
+Correlates the REST order acknowledgement with the first ``executionReport`` the user data stream
+delivers for the same ``clientOrderId``. This tells how stale an event driven client's view is
+compared to the REST response.
+"""
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from binance_testnet_tool.stats import LatencySummary, histogram
+
+
+logger = logging.getLogger()
+
+
+@dataclass
+class OrderTiming:
+    """Timestamps of an order taken with the clock of the tracker."""
+
+    sent_at: float
+    acked_at: Optional[float] = None
+    first_event_at: Optional[float] = None
+    #: Execution type of the first event, e.g. NEW or TRADE
+    first_event_type: Optional[str] = None
+
+
+class OrderLatencyTracker:
+    """Record send, REST ack and first execution report times per client order id.
+
+    Thread safe: orders are sent from the worker threads while events arrive on the websocket thread.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        :param clock: Monotonic seconds the times are taken with
+        """
+        self.clock = clock
+        self.orders: Dict[str, OrderTiming] = {}
+        #: Events for orders we did not send
+        self.unknown_events = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def new_client_order_id() -> str:
+        return uuid.uuid4().hex
+
+    def record_send(self, client_order_id: str):
+        with self.lock:
+            self.orders[client_order_id] = OrderTiming(sent_at=self.clock())
+
+    def record_ack(self, client_order_id: str):
+        now = self.clock()
+        with self.lock:
+            timing = self.orders.get(client_order_id)
+            if timing:
+                timing.acked_at = now
+
+    def process_event(self, msg: dict):
+        """Feed a user data stream message.
+
+        Can be called directly from the websocket callback, other than execution reports are ignored.
+        """
+        if msg.get("e") != "executionReport":
+            return
+        now = self.clock()
+        with self.lock:
+            timing = self.orders.get(msg["c"])
+            if timing is None:
+                self.unknown_events += 1
+                return
+            if timing.first_event_at is None:
+                timing.first_event_at = now
+                timing.first_event_type = msg.get("x")
+
+    def get_samples(self) -> Dict[str, List[float]]:
+        """Latency samples in seconds per measured interval."""
+        with self.lock:
+            timings = list(self.orders.values())
+        return {
+            "send → ack": [t.acked_at - t.sent_at for t in timings if t.acked_at],
+            "send → event": [t.first_event_at - t.sent_at for t in timings if t.first_event_at],
+            "ack → event": [t.first_event_at - t.acked_at for t in timings if t.acked_at and t.first_event_at],
+        }
+
+    def get_missing_events(self) -> int:
+        """Acknowledged orders we never saw an execution report for."""
+        with self.lock:
+            return sum(1 for t in self.orders.values() if t.acked_at and not t.first_event_at)
+
+    def wait_for_events(self, timeout: float = 5.0):
+        """Give the user data stream some time to catch up with the acknowledged orders."""
+        deadline = time.time() + timeout
+        while self.get_missing_events() and time.time() < deadline:
+            time.sleep(0.1)
+
+    def format_report(self) -> str:
+        """Latency percentiles and histograms as printable tables."""
+        from tabulate import tabulate
+        samples = self.get_samples()
+        rows = [[name] + LatencySummary.from_samples(values).get_row() for name, values in samples.items()]
+        output = [tabulate(rows, ["Interval"] + LatencySummary.get_headers(), floatfmt=".1f")]
+        for name, values in samples.items():
+            buckets = histogram(values)
+            if buckets:
+                output.append("")
+                output.append(tabulate(buckets, [name, "Orders"]))
+        output.append("")
+        output.append(f"Orders sent: {len(self.orders)}, acknowledged orders without events: {self.get_missing_events()}")
+        return "\n".join(output)
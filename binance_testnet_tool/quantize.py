@@ -0,0 +1,175 @@
+"""Round prices and quantities to what the symbol filters accept.
+
+Orders that do not align with PRICE_FILTER tickSize or LOT_SIZE stepSize, or are below MIN_NOTIONAL,
+are rejected by Binance with errors like::
+
+    binance.exceptions.BinanceAPIException: APIError(code=-1013): Filter failure: LOT_SIZE
+
+:py:class:`SymbolQuantizer` precomputes the quantums for a symbol once from the cached exchange info,
+so that we can fix up orders locally before sending them.
+"""
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN
+from typing import Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from binance_testnet_tool.symbols import SymbolRegistry, get_symbol_registry
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+#: Used when the symbol does not restrict the precision
+DEFAULT_QUANTUM = Decimal("0.00000001")
+
+ZERO = Decimal(0)
+
+
+class FilterFailure(RuntimeError):
+    """The order would be rejected by the symbol filters."""
+
+
+def to_decimal(value) -> Decimal:
+    """Convert a number to decimal without dragging in float binary representation noise.
+
+    ``Decimal(0.3)`` is ``0.299999999999999988897769753748...``, which would round down to the previous step.
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def _filter_decimal(f: Optional[dict], param: str) -> Decimal:
+    if not f or param not in f:
+        return ZERO
+    return Decimal(f[param])
+
+
+def _quantum(step: Decimal) -> Decimal:
+    """The number of decimals used to present values of a step, e.g. 0.00100000 -> 0.001"""
+    if not step:
+        return DEFAULT_QUANTUM
+    return Decimal(1).scaleb(min(step.normalize().as_tuple().exponent, 0))
+
+
+def _round_to_step(value: Decimal, step: Decimal, quantum: Decimal, rounding: str) -> Decimal:
+    if step:
+        value = (value / step).to_integral_value(rounding=rounding) * step
+    return value.quantize(quantum, rounding=rounding)
+
+
+@dataclass
+class SymbolQuantizer:
+    """Price and quantity rounding rules of a single symbol."""
+
+    symbol: str
+    tick_size: Decimal
+    step_size: Decimal
+    min_qty: Decimal
+    min_notional: Decimal
+    #: MARKET_LOT_SIZE stepSize, zero if the symbol uses LOT_SIZE for market orders
+    market_step_size: Decimal = ZERO
+    #: LOT_SIZE maxQty, zero for no limit
+    max_qty: Decimal = ZERO
+    #: MARKET_LOT_SIZE minQty and maxQty, None if the symbol uses LOT_SIZE for market orders
+    market_min_qty: Optional[Decimal] = None
+    market_max_qty: Optional[Decimal] = None
+
+    def __post_init__(self):
+        self.price_quantum = _quantum(self.tick_size)
+        self.quantity_quantum = _quantum(self.step_size)
+        if self.market_step_size:
+            self.market_quantity_quantum = _quantum(self.market_step_size)
+        else:
+            self.market_step_size = self.step_size
+            self.market_quantity_quantum = self.quantity_quantum
+        if self.market_min_qty is None:
+            self.market_min_qty = self.min_qty
+        if self.market_max_qty is None:
+            self.market_max_qty = self.max_qty
+
+    @classmethod
+    def from_registry(cls, registry: SymbolRegistry, symbol: str) -> "SymbolQuantizer":
+        price_filter = registry.get_filter(symbol, "PRICE_FILTER")
+        lot_size = registry.get_filter(symbol, "LOT_SIZE")
+        market_lot_size = registry.get_filter(symbol, "MARKET_LOT_SIZE")
+        min_notional = registry.get_filter(symbol, "MIN_NOTIONAL")
+        return cls(
+            symbol=symbol,
+            tick_size=_filter_decimal(price_filter, "tickSize"),
+            step_size=_filter_decimal(lot_size, "stepSize"),
+            min_qty=_filter_decimal(lot_size, "minQty"),
+            min_notional=_filter_decimal(min_notional, "minNotional"),
+            market_step_size=_filter_decimal(market_lot_size, "stepSize"),
+            max_qty=_filter_decimal(lot_size, "maxQty"),
+            market_min_qty=_filter_decimal(market_lot_size, "minQty") if market_lot_size else None,
+            market_max_qty=_filter_decimal(market_lot_size, "maxQty") if market_lot_size else None,
+        )
+
+    def quantize_price(self, price, rounding=ROUND_HALF_EVEN) -> Decimal:
+        """Round the price to the nearest tick."""
+        return _round_to_step(to_decimal(price), self.tick_size, self.price_quantum, rounding)
+
+    def quantize_quantity(self, quantity, market=False) -> Decimal:
+        """Round the quantity down to the lot step, so that we never try to trade more than asked."""
+        if market:
+            return _round_to_step(to_decimal(quantity), self.market_step_size, self.market_quantity_quantum, ROUND_DOWN)
+        return _round_to_step(to_decimal(quantity), self.step_size, self.quantity_quantum, ROUND_DOWN)
+
+    def validate(self, price: Optional[Decimal], quantity: Decimal):
+        """Check already quantized values against quantity limits and minimum notional.
+
+        :param price: None for market orders, then MARKET_LOT_SIZE limits apply and notional is not checked
+        :raise FilterFailure: If Binance would not accept the order
+        """
+        if price is None:
+            filter_name, min_qty, max_qty = "MARKET_LOT_SIZE", self.market_min_qty, self.market_max_qty
+        else:
+            filter_name, min_qty, max_qty = "LOT_SIZE", self.min_qty, self.max_qty
+        if quantity <= 0 or quantity < min_qty:
+            raise FilterFailure(f"{self.symbol}: quantity {quantity} is below {filter_name} minQty {min_qty}")
+        if max_qty and quantity > max_qty:
+            raise FilterFailure(f"{self.symbol}: quantity {quantity} is above {filter_name} maxQty {max_qty}")
+        if price is not None:
+            if price <= 0:
+                raise FilterFailure(f"{self.symbol}: price {price} rounds to zero with tickSize {self.tick_size}")
+            if price * quantity < self.min_notional:
+                raise FilterFailure(f"{self.symbol}: order value {price * quantity} is below MIN_NOTIONAL {self.min_notional}")
+
+    def quantize_order(self, price, quantity) -> Tuple[Decimal, Decimal]:
+        """Quantize and validate a limit order.
+
+        :raise FilterFailure: If Binance would not accept the order
+        """
+        price = self.quantize_price(price)
+        quantity = self.quantize_quantity(quantity)
+        self.validate(price, quantity)
+        return price, quantity
+
+    def quantize_orders(self, orders: Iterable[Tuple[object, object]]) -> List[Tuple[Decimal, Decimal]]:
+        """Quantize and validate many (price, quantity) pairs at once.
+
+        :raise FilterFailure: On the first order that Binance would not accept
+        """
+        quantize_price = self.quantize_price
+        quantize_quantity = self.quantize_quantity
+        validate = self.validate
+        result = []
+        for price, quantity in orders:
+            price = quantize_price(price)
+            quantity = quantize_quantity(quantity)
+            validate(price, quantity)
+            result.append((price, quantity))
+        return result
+
+
+def get_quantizer(client: "Client", market: str) -> SymbolQuantizer:
+    """Get a quantizer for a symbol, built once per exchange info download."""
+    registry = get_symbol_registry(client, symbol=market)
+    quantizer = registry.quantizers.get(market)
+    if quantizer is None:
+        if market not in registry.symbols:
+            raise RuntimeError(f"Unknown market {market}")
+        quantizer = registry.quantizers[market] = SymbolQuantizer.from_registry(registry, market)
+    return quantizer
@@ -0,0 +1,261 @@
+"""Binance request weight and order rate limiting.
+
+Binance counts request weight per minute and placed orders per 10 seconds.
+Going over the limit gives HTTP 429 and repeating that gets the IP banned with HTTP 418.
+
+We keep local token buckets for both, charge them with known endpoint weights before a request is sent,
+and correct them from ``X-MBX-USED-WEIGHT-1M`` and ``X-MBX-ORDER-COUNT-10S`` response headers.
+
+https://github.com/binance/binance-spot-api-docs/blob/master/rest-api.md#limits
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Mapping, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+
+
+logger = logging.getLogger()
+
+#: Spot API REQUEST_WEIGHT limit per minute
+WEIGHT_LIMIT_1M = 1200
+
+#: Spot API ORDERS limit per 10 seconds
+ORDER_LIMIT_10S = 50
+
+#: Request weights of the endpoints we use, without the API version prefix.
+#: Endpoints not listed here cost 1.
+ENDPOINT_WEIGHTS = {
+    ("GET", "exchangeInfo"): 20,
+    ("GET", "account"): 20,
+    ("GET", "myTrades"): 20,
+    ("GET", "allOrders"): 20,
+    ("GET", "avgPrice"): 2,
+    ("GET", "klines"): 2,
+    ("GET", "aggTrades"): 2,
+    ("GET", "historicalTrades"): 25,
+    ("GET", "order"): 4,
+    ("POST", "order/test"): 1,
+}
+
+_shared_limiter: Optional["RateLimiter"] = None
+
+
+def _depth_weight(limit: int) -> int:
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def get_request_weight(method: str, uri: str, params: Optional[dict]) -> Tuple[int, int]:
+    """Estimate the cost of a request.
+
+    :param uri: Full request URI like ``https://testnet.binance.vision/api/v3/depth``
+    :param params: Request parameters as passed to python-binance ``_request()``
+    :return: (request weight, order count)
+    """
+    method = method.upper()
+    # api/v3/depth -> depth
+    path = uri.split("/api/", 1)[-1].split("/", 1)[-1]
+    params = params or {}
+    has_symbol = bool(params.get("symbol"))
+
+    if path == "depth":
+        return _depth_weight(int(params.get("limit", 100))), 0
+    if path == "openOrders":
+        if method == "GET":
+            return (6 if has_symbol else 80), 0
+        return 1, 0
+    if path in ("ticker/price", "ticker/bookTicker"):
+        return (2 if has_symbol else 4), 0
+    if path == "ticker/24hr":
+        return (2 if has_symbol else 80), 0
+    if method == "POST" and path == "order":
+        return 1, 1
+    if method == "POST" and path == "order/oco":
+        return 1, 2
+
+    return ENDPOINT_WEIGHTS.get((method, path), 1), 0
+
+
+class TokenBucket:
+    """Tokens refill continuously so that ``capacity`` tokens are available per ``period`` seconds."""
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def get_delay(self, amount: float, now: float) -> float:
+        """How long until ``amount`` tokens are available, seconds."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def sync_used(self, used: float, limit: float):
+        """The server says we have used this much of the limit."""
+        self.tokens = min(self.tokens, self.capacity - used * self.capacity / limit)
+
+
+class RateLimiter:
+    """Request weight and order count limiter shared by all clients of the process.
+
+    Thread safe. Sync clients block in :py:meth:`acquire`, async clients await :py:meth:`acquire_async`.
+    """
+
+    def __init__(self, weight_limit: int = WEIGHT_LIMIT_1M, order_limit: int = ORDER_LIMIT_10S, safety_margin: float = 0.8):
+        """
+        :param safety_margin: Use only this fraction of the limits, as other processes may share the same IP and key
+        """
+        self.weight_limit = weight_limit
+        self.order_limit = order_limit
+        self.weight_bucket = TokenBucket(weight_limit * safety_margin, 60)
+        self.order_bucket = TokenBucket(order_limit * safety_margin, 10)
+        #: Set when we get HTTP 429 or 418, time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        #: Last values reported by the server
+        self.used_weight = 0
+        self.order_count = 0
+        #: How many times and for how long we have held back requests
+        self.throttle_count = 0
+        self.throttled_seconds = 0.0
+        #: Cost charged by :py:meth:`acquire_ahead` for the next request of the thread
+        self.prepaid = threading.local()
+
+    def reserve(self, weight: int, orders: int = 0) -> float:
+        """Take the tokens for a request if available.
+
+        :return: 0 if the request can go now, otherwise seconds to wait before trying again
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = max(
+                self.blocked_until - now,
+                self.weight_bucket.get_delay(weight, now),
+                self.order_bucket.get_delay(orders, now) if orders else 0,
+            )
+            if delay > 0:
+                return delay
+            self.weight_bucket.take(weight)
+            if orders:
+                self.order_bucket.take(orders)
+            return 0
+
+    def _record_wait(self, delay: float):
+        with self.lock:
+            self.throttle_count += 1
+            self.throttled_seconds += delay
+        logger.debug("Rate limit reached, waiting %.2f seconds", delay)
+
+    def acquire(self, weight: int, orders: int = 0):
+        """Block until the request fits within the limits."""
+        while True:
+            delay = self.reserve(weight, orders)
+            if not delay:
+                return
+            self._record_wait(delay)
+            time.sleep(delay)
+
+    def acquire_ahead(self, weight: int, orders: int = 0):
+        """Block until the next request of this thread fits within the limits.
+
+        The request is not charged again when it is sent, so the wait can be kept out of its latency.
+        """
+        self.acquire(weight, orders)
+        self.prepaid.cost = (weight, orders)
+
+    def take_prepaid(self, cost: Tuple[int, int]) -> bool:
+        """Whether this thread already paid for a request costing ``cost``."""
+        if getattr(self.prepaid, "cost", None) != cost:
+            return False
+        self.prepaid.cost = None
+        return True
+
+    async def acquire_async(self, weight: int, orders: int = 0):
+        while True:
+            delay = self.reserve(weight, orders)
+            if not delay:
+                return
+            self._record_wait(delay)
+            await asyncio.sleep(delay)
+
+    def update(self, status_code: int, headers: Mapping[str, str]):
+        """Correct the local state from case-insensitive response headers."""
+        used_weight = headers.get("X-MBX-USED-WEIGHT-1M")
+        order_count = headers.get("X-MBX-ORDER-COUNT-10S")
+        with self.lock:
+            if used_weight is not None:
+                self.used_weight = int(used_weight)
+                self.weight_bucket.sync_used(self.used_weight, self.weight_limit)
+            if order_count is not None:
+                self.order_count = int(order_count)
+                self.order_bucket.sync_used(self.order_count, self.order_limit)
+            if status_code in (418, 429):
+                retry_after = int(headers.get("Retry-After", 60))
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                logger.error("Binance rate limit hit with HTTP %d, holding requests for %d seconds", status_code, retry_after)
+
+    def hook(self, response, *args, **kwargs):
+        """requests session response hook."""
+        self.update(response.status_code, response.headers)
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The limiter shared by all clients in this process."""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter
+
+
+def install_rate_limiter(client: "Client", limiter: RateLimiter):
+    """Make all REST calls of a client go through the limiter."""
+
+    request = client._request
+
+    def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        cost = get_request_weight(method, uri, kwargs.get("data"))
+        if not limiter.take_prepaid(cost):
+            limiter.acquire(*cost)
+        return request(method, uri, signed, force_params, **kwargs)
+
+    client._request = _request
+    client.session.hooks["response"].append(limiter.hook)
+    client.rate_limiter = limiter
+
+
+def install_rate_limiter_async(async_client: "AsyncClient", limiter: RateLimiter):
+    """Same as :py:func:`install_rate_limiter` for the async client."""
+
+    request = async_client._request
+    handle_response = async_client._handle_response
+
+    async def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        await limiter.acquire_async(*get_request_weight(method, uri, kwargs.get("data")))
+        return await request(method, uri, signed, force_params, **kwargs)
+
+    async def _handle_response(response):
+        limiter.update(response.status, response.headers)
+        return await handle_response(response)
+
+    async_client._request = _request
+    async_client._handle_response = _handle_response
+    async_client.rate_limiter = limiter
@@ -0,0 +1,264 @@
+"""Record market data streams to compact binary files.
+
+Trades, best bid/offer and depth diffs of many symbols are received over one multiplexed websocket
+connection. The websocket callback only queues the raw message, a writer thread packs it to a
+fixed layout binary record and writes it through a large file buffer.
+
+File layout, all integers little endian:
+
+- Header: ``b"BTTR"``, format version ``H``, symbol count ``H``, then each symbol as ``B`` length + ASCII name
+- Records: ``B`` record type, ``H`` symbol index, ``q`` local receive time in microseconds,
+  ``q`` event time in milliseconds, followed by the payload of the record type
+
+Each file has its own header, so rotated files can be read and replayed independently.
+Prices and quantities are stored as doubles.
+"""
+import datetime
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from collections import Counter
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance import ThreadedWebsocketManager
+
+
+logger = logging.getLogger()
+
+MAGIC = b"BTTR"
+
+FORMAT_VERSION = 1
+
+#: Stream names we know how to record, as in ``btcusdt@trade``
+STREAM_TYPES = ("trade", "bookTicker", "depth")
+
+RECORD_TRADE = 1
+RECORD_BOOK_TICKER = 2
+RECORD_DEPTH = 3
+
+_file_header = struct.Struct("<4sHH")
+_record_header = struct.Struct("<BHqq")
+#: trade id, price, quantity, buyer is maker
+_trade = struct.Struct("<qddB")
+#: update id, bid price, bid quantity, ask price, ask quantity
+_book_ticker = struct.Struct("<qdddd")
+#: first update id, final update id, bid levels, ask levels
+_depth = struct.Struct("<qqHH")
+_level = struct.Struct("<dd")
+
+#: Rotate files at this size by default
+DEFAULT_ROTATE_BYTES = 256 * 1024 * 1024
+
+#: Write buffer size
+BUFFER_SIZE = 1024 * 1024
+
+
+def get_stream_names(symbols: Iterable[str], stream_types: Iterable[str] = STREAM_TYPES, depth_interval: int = 100) -> List[str]:
+    """Multiplexed stream names for the symbols, e.g. ``btcusdt@depth@100ms``."""
+    names = []
+    for symbol in symbols:
+        for stream_type in stream_types:
+            name = f"{symbol.lower()}@{stream_type}"
+            if stream_type == "depth":
+                name += f"@{depth_interval}ms"
+            names.append(name)
+    return names
+
+
+def _pack_levels(levels: List[List[str]]) -> bytes:
+    return b"".join(_level.pack(float(price), float(quantity)) for price, quantity in levels)
+
+
+def encode_message(symbol_index: int, data: dict, received_at_us: int) -> Optional[bytes]:
+    """Pack a stream message to a binary record.
+
+    :param data: Message payload without the multiplexing envelope
+    :return: None if we do not record this message type
+    """
+    event_type = data.get("e")
+    if event_type == "trade":
+        return _record_header.pack(RECORD_TRADE, symbol_index, received_at_us, data["E"]) + \
+            _trade.pack(data["t"], float(data["p"]), float(data["q"]), data["m"])
+    if event_type == "depthUpdate":
+        bids, asks = data["b"], data["a"]
+        return _record_header.pack(RECORD_DEPTH, symbol_index, received_at_us, data["E"]) + \
+            _depth.pack(data["U"], data["u"], len(bids), len(asks)) + _pack_levels(bids) + _pack_levels(asks)
+    if event_type is None and "b" in data and "a" in data:
+        # bookTicker messages have no event type or event time
+        return _record_header.pack(RECORD_BOOK_TICKER, symbol_index, received_at_us, 0) + \
+            _book_ticker.pack(data["u"], float(data["b"]), float(data["B"]), float(data["a"]), float(data["A"]))
+    return None
+
+
+def _read_exact(inp: BinaryIO, size: int) -> bytes:
+    data = inp.read(size)
+    if len(data) != size:
+        raise EOFError
+    return data
+
+
+def _unpack_levels(inp: BinaryIO, count: int) -> List[List[str]]:
+    data = _read_exact(inp, _level.size * count)
+    return [[repr(price), repr(quantity)] for price, quantity in _level.iter_unpack(data)]
+
+
+def read_records(path: str) -> Iterator[Tuple[int, dict]]:
+    """Read a recorded file back.
+
+    A truncated last record, as left by a killed recorder, is ignored.
+
+    :return: Iterator of (local receive time in microseconds, message) where the message is shaped like the
+        original Binance stream payload, with prices and quantities as shortest round-tripping decimal strings
+    """
+    with open(path, "rb", buffering=BUFFER_SIZE) as inp:
+        magic, version, symbol_count = _file_header.unpack(_read_exact(inp, _file_header.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise RuntimeError(f"{path} is not a version {FORMAT_VERSION} market data recording")
+        symbols = []
+        for i in range(symbol_count):
+            length = _read_exact(inp, 1)[0]
+            symbols.append(_read_exact(inp, length).decode("ascii"))
+
+        while True:
+            try:
+                header = inp.read(_record_header.size)
+                if not header:
+                    return
+                if len(header) != _record_header.size:
+                    raise EOFError
+                record_type, symbol_index, received_at_us, event_time = _record_header.unpack(header)
+                symbol = symbols[symbol_index]
+                if record_type == RECORD_TRADE:
+                    trade_id, price, quantity, maker = _trade.unpack(_read_exact(inp, _trade.size))
+                    msg = {"e": "trade", "E": event_time, "s": symbol, "t": trade_id, "p": repr(price), "q": repr(quantity), "m": bool(maker)}
+                elif record_type == RECORD_BOOK_TICKER:
+                    update_id, bid, bid_qty, ask, ask_qty = _book_ticker.unpack(_read_exact(inp, _book_ticker.size))
+                    msg = {"u": update_id, "s": symbol, "b": repr(bid), "B": repr(bid_qty), "a": repr(ask), "A": repr(ask_qty)}
+                elif record_type == RECORD_DEPTH:
+                    first_id, final_id, bid_count, ask_count = _depth.unpack(_read_exact(inp, _depth.size))
+                    bids = _unpack_levels(inp, bid_count)
+                    asks = _unpack_levels(inp, ask_count)
+                    msg = {"e": "depthUpdate", "E": event_time, "s": symbol, "U": first_id, "u": final_id, "b": bids, "a": asks}
+                else:
+                    raise RuntimeError(f"{path}: unknown record type {record_type}")
+            except EOFError:
+                logger.warning("%s ends with a truncated record", path)
+                return
+            yield received_at_us, msg
+
+
+class RecordingWriter:
+    """Write binary records to size and time rotated files."""
+
+    def __init__(self, directory: str, symbols: List[str], rotate_bytes: int = DEFAULT_ROTATE_BYTES, rotate_seconds: float = None, prefix: str = "market-data"):
+        """
+        :param rotate_seconds: Also start a new file after this many seconds
+        """
+        self.directory = directory
+        self.symbols = [s.upper() for s in symbols]
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.prefix = prefix
+        self.out: Optional[BinaryIO] = None
+        self.path: Optional[str] = None
+        self.written = 0
+        self.opened_at = 0.0
+        #: Paths of all files written
+        self.files: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
+        self.path = os.path.join(self.directory, f"{self.prefix}-{stamp}.bttr")
+        self.out = open(self.path, "wb", buffering=BUFFER_SIZE)
+        header = _file_header.pack(MAGIC, FORMAT_VERSION, len(self.symbols))
+        header += b"".join(bytes([len(s)]) + s.encode("ascii") for s in self.symbols)
+        self.out.write(header)
+        self.written = len(header)
+        self.opened_at = time.monotonic()
+        self.files.append(self.path)
+        logger.info("Recording to %s", self.path)
+
+    def _should_rotate(self) -> bool:
+        if self.written >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self.opened_at >= self.rotate_seconds
+
+    def write(self, record: bytes):
+        if self.out is None or self._should_rotate():
+            self.close()
+            self._open()
+        self.out.write(record)
+        self.written += len(record)
+
+    def flush(self):
+        if self.out:
+            self.out.flush()
+
+    def close(self):
+        if self.out:
+            self.out.close()
+            self.out = None
+
+
+class StreamRecorder:
+    """Record multiplexed stream messages without blocking the websocket thread."""
+
+    def __init__(self, writer: RecordingWriter):
+        self.writer = writer
+        self.queue = queue.SimpleQueue()
+        self.counts = Counter()
+        self.thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def process_message(self, msg: dict):
+        """Websocket callback, only timestamps and queues the message."""
+        self.queue.put((int(time.time() * 1_000_000), msg))
+
+    def stop(self):
+        """Write out the queued messages and close the file."""
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.close()
+
+    def _run(self):
+        writer = self.writer
+        symbol_index = writer.symbol_index
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            received_at_us, msg = item
+            data = msg.get("data", msg)
+            if msg.get("e") == "error" or "s" not in data:
+                logger.error("Stream error: %s", msg)
+                self.counts["error"] += 1
+                continue
+            index = symbol_index.get(data["s"])
+            record = None if index is None else encode_message(index, data, received_at_us)
+            if record is None:
+                self.counts["ignored"] += 1
+                continue
+            writer.write(record)
+            self.counts[data.get("e", "bookTicker")] += 1
+            if self.queue.empty():
+                # Idle, make the data visible to readers of the file
+                writer.flush()
+
+
+def start_recording(bm: "ThreadedWebsocketManager", writer: RecordingWriter, stream_types: Iterable[str] = STREAM_TYPES) -> StreamRecorder:
+    """Subscribe to the streams of the writer symbols over one multiplexed connection.
+
+    :param bm: Started websocket manager
+    """
+    recorder = StreamRecorder(writer)
+    recorder.start()
+    bm.start_multiplex_socket(recorder.process_message, streams=get_stream_names(writer.symbols, stream_types))
+    return recorder
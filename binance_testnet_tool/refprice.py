@@ -0,0 +1,194 @@
+"""Reference prices for pricing orders relative to the market.
+
+Prices come from a chain of providers: when a provider cannot price a symbol,
+the next one is asked. All providers share one TTL cache, so that placing many
+percent-priced orders in a row, or from a long lived server, costs one lookup per symbol and TTL.
+Providers price many symbols with one request where the API allows it.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from binance_testnet_tool.symbols import get_symbol_registry
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+logger = logging.getLogger()
+
+#: How long a fetched price is used, seconds
+DEFAULT_PRICE_TTL = 10.0
+
+#: Provider names in the default fallback order
+PRICE_SOURCES = ("book", "avg", "coingecko")
+
+_sources: Dict[Tuple[int, Tuple[str, ...]], "ReferencePriceSource"] = {}
+
+
+class PriceProvider:
+    """Base class for reference price providers."""
+
+    #: Name used in the command line options
+    name = ""
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        """Price symbols, leaving out the ones this provider cannot price."""
+        raise NotImplementedError()
+
+
+class BookTickerProvider(PriceProvider):
+    """Mid price of the best bid and ask from ``GET /api/v3/ticker/bookTicker``.
+
+    Several symbols are priced with one all-symbols request, weight 4.
+    """
+
+    name = "book"
+
+    def __init__(self, client: "Client"):
+        self.client = client
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        from binance.exceptions import BinanceAPIException
+
+        if len(symbols) == 1:
+            try:
+                tickers = [self.client.get_orderbook_ticker(symbol=symbols[0])]
+            except BinanceAPIException as e:
+                logger.debug("No book ticker for %s: %s", symbols[0], e)
+                return {}
+        else:
+            tickers = self.client.get_orderbook_tickers()
+
+        wanted = set(symbols)
+        prices = {}
+        for t in tickers:
+            bid, ask = Decimal(t["bidPrice"]), Decimal(t["askPrice"])
+            # One sided or empty books have zero prices
+            if t["symbol"] in wanted and bid and ask:
+                prices[t["symbol"]] = (bid + ask) / 2
+        return prices
+
+
+class AvgPriceProvider(PriceProvider):
+    """Five minute average price from ``GET /api/v3/avgPrice``, weight 2 per symbol."""
+
+    name = "avg"
+
+    def __init__(self, client: "Client"):
+        self.client = client
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        from binance.exceptions import BinanceAPIException
+
+        prices = {}
+        for symbol in symbols:
+            try:
+                price = Decimal(self.client.get_avg_price(symbol=symbol)["price"])
+            except BinanceAPIException as e:
+                logger.debug("No average price for %s: %s", symbol, e)
+                continue
+            if price:
+                prices[symbol] = price
+        return prices
+
+
+class CoingeckoProvider(PriceProvider):
+    """Coingecko prices, useful when the testnet books are too thin to tell the real price."""
+
+    name = "coingecko"
+
+    def __init__(self, client: "Client"):
+        self.client = client
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        from binance_testnet_tool.coingecko import fetch_coingecko_prices
+
+        registry = get_symbol_registry(self.client)
+        pairs = []
+        for symbol in symbols:
+            info = registry.get_symbol_info(symbol)
+            if info:
+                pairs.append((symbol, info["baseAsset"], info["quoteAsset"]))
+        return fetch_coingecko_prices(pairs)
+
+
+PROVIDERS = {cls.name: cls for cls in (BookTickerProvider, AvgPriceProvider, CoingeckoProvider)}
+
+
+class ReferencePriceSource:
+    """Price symbols from the first provider that can, with a shared TTL cache."""
+
+    def __init__(self, providers: List[PriceProvider], ttl: float = DEFAULT_PRICE_TTL):
+        self.providers = providers
+        self.ttl = ttl
+        #: symbol -> (price, provider name, time.monotonic() when fetched)
+        self.cache: Dict[str, Tuple[Decimal, str, float]] = {}
+        self.lock = threading.Lock()
+
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, Decimal]:
+        """Price many symbols, asking each provider only for what is still missing.
+
+        :return: symbol -> price, symbols no provider could price are left out
+        """
+        now = time.monotonic()
+        prices = {}
+        missing = []
+        with self.lock:
+            for symbol in dict.fromkeys(symbols):
+                cached = self.cache.get(symbol)
+                if cached and now - cached[2] < self.ttl:
+                    prices[symbol] = cached[0]
+                else:
+                    missing.append(symbol)
+
+        for provider in self.providers:
+            if not missing:
+                break
+            try:
+                fetched = provider.fetch_prices(missing)
+            except Exception as e:
+                logger.warning("Reference price provider %s failed: %s", provider.name, e)
+                continue
+            fetched_at = time.monotonic()
+            with self.lock:
+                for symbol, price in fetched.items():
+                    self.cache[symbol] = (price, provider.name, fetched_at)
+            prices.update(fetched)
+            missing = [s for s in missing if s not in fetched]
+
+        return prices
+
+    def get_price(self, symbol: str) -> Decimal:
+        """
+        :raise RuntimeError: If no provider can price the symbol
+        """
+        price = self.get_prices([symbol]).get(symbol)
+        if price is None:
+            names = ", ".join(p.name for p in self.providers)
+            raise RuntimeError(f"No reference price for {symbol} from {names}")
+        return price
+
+    def get_provider_name(self, symbol: str) -> Optional[str]:
+        """Which provider gave the cached price of a symbol."""
+        cached = self.cache.get(symbol)
+        return cached[1] if cached else None
+
+
+def get_reference_price_source(client: "Client", sources: Iterable[str] = PRICE_SOURCES, ttl: float = DEFAULT_PRICE_TTL) -> ReferencePriceSource:
+    """Get a price source for a client, kept around so that the cache is shared between commands.
+
+    :param sources: Provider names in the fallback order
+    """
+    sources = tuple(sources)
+    key = (id(client), sources)
+    source = _sources.get(key)
+    if source is None:
+        unknown = [s for s in sources if s not in PROVIDERS]
+        if unknown:
+            raise RuntimeError(f"Unknown reference price sources {unknown}")
+        source = _sources[key] = ReferencePriceSource([PROVIDERS[s](client) for s in sources], ttl)
+    source.ttl = ttl
+    return source
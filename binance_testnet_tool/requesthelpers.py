@@ -1,31 +1,150 @@
+import json
 import logging
+import re
 import textwrap
+import threading
+import time
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import Client
 
 
 logger = logging.getLogger(__name__)
 
+#: Request headers carrying credentials, lowercase
+SECRET_HEADERS = ("x-mbx-apikey",)
+
+_SIGNATURE_PARAM = re.compile(r"(^|[?&])signature=[^&]*")
+
+REDACTED = "<redacted>"
+
+
+def format_headers(d) -> str:
+    return '\n'.join(f'{k}: {v}' for k, v in d.items())
+
+
+def redact_headers(headers) -> dict:
+    """Hide the API key so that dumps can be shared."""
+    return {k: REDACTED if k.lower() in SECRET_HEADERS else v for k, v in headers.items()}
+
+
+def redact_params(text: Optional[str]) -> Optional[str]:
+    """Hide the signature of an URL or an urlencoded request body."""
+    if not text:
+        return text
+    return _SIGNATURE_PARAM.sub(rf"\1signature={REDACTED}", text)
+
+
+def _truncate(text, max_length: Optional[int]):
+    if text is None or max_length is None or len(text) <= max_length:
+        return text
+    return text[:max_length] + f"... ({len(text)} characters)"
+
+
+def _decode(body) -> Optional[str]:
+    if isinstance(body, bytes):
+        return body.decode("utf-8", errors="replace")
+    return body
+
+
+class _LazyDump:
+    """Format the request/response pair only if the log record is actually emitted."""
+
+    def __init__(self, response, max_body: Optional[int]):
+        self.response = response
+        self.max_body = max_body
+
+    def __str__(self):
+        response = self.response
+        return textwrap.dedent('''
+            ---------------- request ----------------
+            {req.method} {requrl}
+            {reqhdrs}
+
+            {reqbody}
+            ---------------- response ----------------
+            {res.status_code} {res.reason} {resurl}
+            {reshdrs}
+
+            {resbody}
+        ''').format(
+            req=response.request,
+            res=response,
+            requrl=redact_params(response.request.url),
+            reqhdrs=format_headers(redact_headers(response.request.headers)),
+            reqbody=_truncate(redact_params(_decode(response.request.body)), self.max_body),
+            resurl=redact_params(response.url),
+            reshdrs=format_headers(response.headers),
+            resbody=_truncate(response.text, self.max_body),
+        )
+
+
 # https://stackoverflow.com/questions/20658572/python-requests-print-entire-http-request-raw
-def hook_request_dump(response, *args, **kwargs):
-    """Dump HTTP request/response pairs.
+class RequestDumper:
+    """requests response hook dumping HTTP request/response pairs.
+
+    The API key header and request signatures are redacted.
 
     More information: https://2.python-requests.org/en/master/user/advanced/
     """
 
-    format_headers = lambda d: '\n'.join(f'{k}: {v}' for k, v in d.items())
-    logger.debug(textwrap.dedent('''
-        ---------------- request ----------------
-        {req.method} {req.url}
-        {reqhdrs}
-
-        {req.body}
-        ---------------- response ----------------
-        {res.status_code} {res.reason} {res.url}
-        {reshdrs}
-
-        {res.text}
-    ''').format(
-        req=response.request,
-        res=response,
-        reqhdrs=format_headers(response.request.headers),
-        reshdrs=format_headers(response.headers),
-    ))
\ No newline at end of file
+    def __init__(self, sample_every: int = 1, max_body: Optional[int] = None, jsonl_path: Optional[str] = None):
+        """
+        :param sample_every: Dump only every Nth request
+        :param max_body: Truncate request and response bodies to this many characters
+        :param jsonl_path: Write dumps as JSON lines to this file instead of the debug log
+        """
+        self.sample_every = max(1, sample_every)
+        self.max_body = max_body
+        self.counter = 0
+        self.lock = threading.Lock()
+        self.output = open(jsonl_path, "at") if jsonl_path else None
+
+    def close(self):
+        if self.output:
+            self.output.close()
+            self.output = None
+
+    def __call__(self, response, *args, **kwargs):
+        with self.lock:
+            self.counter += 1
+            if (self.counter - 1) % self.sample_every:
+                return
+
+        if self.output:
+            self.write_json(response)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", _LazyDump(response, self.max_body))
+
+    def write_json(self, response):
+        request = response.request
+        entry = {
+            "time": time.time(),
+            "method": request.method,
+            "url": redact_params(request.url),
+            "status": response.status_code,
+            "elapsed_ms": response.elapsed.total_seconds() * 1000,
+            "request_headers": redact_headers(request.headers),
+            "request_body": _truncate(redact_params(_decode(request.body)), self.max_body),
+            "response_headers": dict(response.headers),
+            "response_body": _truncate(response.text, self.max_body),
+        }
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            if self.output:
+                self.output.write(line)
+
+
+def set_pool_size(client: "Client", size: int):
+    """Let the requests session keep a connection open for each worker thread.
+
+    The pool is only ever grown, so that commands run by ``serve`` keep its warm connections.
+    """
+    from requests.adapters import HTTPAdapter
+    mounted = client.session.adapters.get("https://")
+    if mounted is not None and getattr(mounted, "_pool_maxsize", 0) >= size:
+        return
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
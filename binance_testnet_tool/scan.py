@@ -0,0 +1,120 @@
+"""Order book overview of many markets at once.
+
+Order books are fetched concurrently through a bounded pool, so that a scan takes about as long as
+the rate limiter allows instead of one round-trip per market.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, TYPE_CHECKING
+
+from binance_testnet_tool.orderbook import OrderBook, fetch_order_book, fetch_order_book_async
+from binance_testnet_tool.requesthelpers import set_pool_size
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+
+
+logger = logging.getLogger()
+
+#: Columns the scan can be ranked by, larger is better except for the spread
+SORT_KEYS = ("spread", "depth", "top-size")
+
+
+@dataclass
+class MarketDepthSummary:
+    """Top of the book and near-mid liquidity of a market."""
+
+    market: str
+    #: Set if the order book could not be fetched
+    error: Optional[str] = None
+    mid_price: Optional[float] = None
+    #: Spread in percents of the best bid
+    spread_percent: Optional[float] = None
+    #: Notional of the best bid and ask levels, in the quote currency
+    top_bid_notional: float = 0
+    top_ask_notional: float = 0
+    #: Notional on both sides within the depth band of the mid price, in the quote currency
+    depth_notional: float = 0
+
+    @classmethod
+    def from_book(cls, book: OrderBook, band_percent: float) -> "MarketDepthSummary":
+        summary = cls(market=book.symbol)
+        best_bid = book.best_bid()
+        best_ask = book.best_ask()
+        if best_bid:
+            summary.top_bid_notional = best_bid[0] * best_bid[1]
+        if best_ask:
+            summary.top_ask_notional = best_ask[0] * best_ask[1]
+        summary.mid_price = book.mid_price()
+        if summary.mid_price:
+            summary.spread_percent = book.spread() * 100
+            _, bid_notional = book.bids.liquidity_within(band_percent, summary.mid_price)
+            _, ask_notional = book.asks.liquidity_within(band_percent, summary.mid_price)
+            summary.depth_notional = bid_notional + ask_notional
+        return summary
+
+    def get_sort_key(self, sort_by: str) -> float:
+        """Smaller sorts first, markets without a two-sided book last."""
+        if self.spread_percent is None:
+            return float("inf")
+        if sort_by == "spread":
+            return self.spread_percent
+        if sort_by == "depth":
+            return -self.depth_notional
+        if sort_by == "top-size":
+            return -min(self.top_bid_notional, self.top_ask_notional)
+        raise RuntimeError(f"Unknown sort key {sort_by}")
+
+    @staticmethod
+    def get_headers(band_percent: float) -> List[str]:
+        return ["Market", "Mid price", "Spread %", "Top bid notional", "Top ask notional", f"Depth ±{band_percent}%", "Error"]
+
+    def get_row(self) -> list:
+        if self.error:
+            return [self.market, None, None, None, None, None, self.error]
+        return [self.market, self.mid_price, self.spread_percent, self.top_bid_notional, self.top_ask_notional, self.depth_notional, None]
+
+
+def scan_markets(client: "Client", markets: Iterable[str], limit: int = 100, band_percent: float = 1.0, max_workers: int = 8) -> List[MarketDepthSummary]:
+    """Fetch and summarize the order books of many markets concurrently.
+
+    :param max_workers: How many requests can be in flight at the same time
+    :return: Summaries in the order of the markets
+    """
+    from binance.exceptions import BinanceAPIException
+
+    set_pool_size(client, max_workers)
+
+    def _scan(market: str) -> MarketDepthSummary:
+        try:
+            return MarketDepthSummary.from_book(fetch_order_book(client, market, limit), band_percent)
+        except BinanceAPIException as e:
+            logger.error("Could not fetch the order book of %s: %s", market, e)
+            return MarketDepthSummary(market=market, error=e.message)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_scan, markets))
+
+
+async def scan_markets_async(async_client: "AsyncClient", markets: Iterable[str], limit: int = 100, band_percent: float = 1.0, max_concurrency: int = 8) -> List[MarketDepthSummary]:
+    """Same as :py:func:`scan_markets`, but over the async client."""
+    from binance.exceptions import BinanceAPIException
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _scan(market: str) -> MarketDepthSummary:
+        async with semaphore:
+            try:
+                book = await fetch_order_book_async(async_client, market, limit)
+            except BinanceAPIException as e:
+                logger.error("Could not fetch the order book of %s: %s", market, e)
+                return MarketDepthSummary(market=market, error=e.message)
+        return MarketDepthSummary.from_book(book, band_percent)
+
+    return await asyncio.gather(*(_scan(m) for m in markets))
+
+
+def rank_markets(summaries: List[MarketDepthSummary], sort_by: str) -> List[MarketDepthSummary]:
+    return sorted(summaries, key=lambda s: s.get_sort_key(sort_by))
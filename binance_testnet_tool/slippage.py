@@ -0,0 +1,113 @@
+"""Market order slippage and market impact analytics.
+
+All figures are read from the prefix sums of :py:class:`BookSide`,
+so each order size costs a binary search regardless of the book depth.
+"""
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from binance_testnet_tool.depth import Side
+from binance_testnet_tool.orderbook import BookSide, OrderBook
+
+
+#: Quote currency amounts for the slippage table if not given
+DEFAULT_NOTIONAL_SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+
+#: Percentages from the mid price for the liquidity table if not given
+DEFAULT_BANDS = (0.1, 0.5, 1, 2, 5)
+
+
+@dataclass
+class SlippageInfo:
+    """What a market order of a certain size would do to the book."""
+
+    side: Side
+    #: Quote currency spent or received
+    notional: float
+    #: None if the book does not have enough liquidity
+    quantity: Optional[float] = None
+    avg_price: Optional[float] = None
+    #: Price of the last level the order eats into
+    worst_price: Optional[float] = None
+    #: Average price distance from the mid price, always positive when the order pays the spread
+    slippage_bps: Optional[float] = None
+
+    @staticmethod
+    def get_headers() -> List[str]:
+        return ["Side", "Size", "Quantity", "Avg price", "Worst price", "Slippage bps"]
+
+    def get_row(self) -> list:
+        return [self.side.value, self.notional, self.quantity, self.avg_price, self.worst_price, self.slippage_bps]
+
+
+def _slippage_bps(side: Side, price: float, mid_price: float) -> float:
+    # Buying from the asks pays above the mid, selling to the bids receives below the mid
+    if side == Side.ask:
+        return (price - mid_price) / mid_price * 10_000
+    return (mid_price - price) / mid_price * 10_000
+
+
+def _get_book_side(book: OrderBook, side: Side) -> BookSide:
+    return book.asks if side == Side.ask else book.bids
+
+
+def get_slippage(book: OrderBook, side: Side, notionals: Iterable[float]) -> List[SlippageInfo]:
+    """Slippage of market orders of different sizes.
+
+    :param side: ``Side.ask`` for market buys eating the asks, ``Side.bid`` for market sells
+    :param notionals: Order sizes in the quote currency
+    """
+    book_side = _get_book_side(book, side)
+    mid_price = book.mid_price()
+    result = []
+    for notional in notionals:
+        info = SlippageInfo(side=side, notional=notional)
+        fill = book_side.fill_for_notional(notional)
+        if fill:
+            info.quantity, info.worst_price = fill
+            info.avg_price = notional / info.quantity
+            if mid_price:
+                info.slippage_bps = _slippage_bps(side, info.avg_price, mid_price)
+        result.append(info)
+    return result
+
+
+def get_execution_curve(book: OrderBook, side: Side, points: int = 20) -> List[list]:
+    """Average execution price against order size when sweeping the book level by level.
+
+    :param points: Sample the curve down to this many levels, evenly spread over the book
+    :return: Rows of (level, cumulative quantity, cumulative notional, average price, slippage bps)
+    """
+    book_side = _get_book_side(book, side)
+    curve = book_side.execution_curve()
+    if not curve:
+        return []
+    mid_price = book.mid_price()
+    step = max(1, len(curve) // points)
+    indices = list(range(step - 1, len(curve), step))
+    if indices[-1] != len(curve) - 1:
+        indices.append(len(curve) - 1)
+
+    rows = []
+    for idx in indices:
+        quantity, notional = curve[idx]
+        avg_price = notional / quantity
+        slippage = _slippage_bps(side, avg_price, mid_price) if mid_price else None
+        rows.append([idx + 1, quantity, notional, avg_price, slippage])
+    return rows
+
+
+def get_liquidity_bands(book: OrderBook, percents: Iterable[float]) -> List[list]:
+    """Liquidity on both sides within percentages of the mid price.
+
+    :return: Rows of (percent, bid quantity, bid notional, ask quantity, ask notional)
+    """
+    mid_price = book.mid_price()
+    if mid_price is None:
+        return []
+    rows = []
+    for percent in percents:
+        bid_quantity, bid_notional = book.bids.liquidity_within(percent, mid_price)
+        ask_quantity, ask_notional = book.asks.liquidity_within(percent, mid_price)
+        rows.append([percent, bid_quantity, bid_notional, ask_quantity, ask_notional])
+    return rows
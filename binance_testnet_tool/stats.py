@@ -0,0 +1,78 @@
+"""Latency statistics helpers."""
+import math
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile.
+
+    :param sorted_values: Samples sorted ascending
+    :param p: Percentile 0...100
+    """
+    if not sorted_values:
+        return 0
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+@dataclass
+class LatencySummary:
+    """Latency distribution of a set of samples, in milliseconds."""
+
+    count: int = 0
+    mean: float = 0
+    p50: float = 0
+    p95: float = 0
+    p99: float = 0
+    max: float = 0
+
+    @classmethod
+    def from_samples(cls, seconds: List[float]) -> "LatencySummary":
+        """Summarise latency samples given in seconds."""
+        if not seconds:
+            return cls()
+        values = sorted(s * 1000 for s in seconds)
+        return cls(
+            count=len(values),
+            mean=sum(values) / len(values),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            max=values[-1],
+        )
+
+    @staticmethod
+    def get_headers() -> List[str]:
+        return ["Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+
+    def get_row(self) -> list:
+        return [self.count, self.mean, self.p50, self.p95, self.p99, self.max]
+
+
+#: Default histogram bucket upper bounds in milliseconds
+DEFAULT_HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def histogram(seconds: List[float], bounds_ms: Sequence[float] = DEFAULT_HISTOGRAM_BOUNDS) -> List[tuple]:
+    """Bucket latency samples.
+
+    Negative samples, e.g. an event arriving before the REST response, get their own bucket.
+
+    :param seconds: Samples in seconds
+    :param bounds_ms: Ascending bucket upper bounds in milliseconds
+    :return: List of (bucket label, count) rows, empty buckets at the ends left out
+    """
+    labels = ["< 0 ms"] + [f"<= {b} ms" for b in bounds_ms] + [f"> {bounds_ms[-1]} ms"]
+    counts = [0] * len(labels)
+    for s in seconds:
+        if s < 0:
+            counts[0] += 1
+        else:
+            counts[1 + bisect_left(bounds_ms, s * 1000)] += 1
+
+    nonzero = [i for i, c in enumerate(counts) if c]
+    if not nonzero:
+        return []
+    return list(zip(labels, counts))[nonzero[0]:nonzero[-1] + 1]
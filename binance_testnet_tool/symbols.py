@@ -0,0 +1,157 @@
+"""Exchange info cache.
+
+python-binance ``get_symbol_info()`` downloads the whole exchangeInfo payload on every call.
+Here we load it once, index symbols and their filters by name and persist the payload
+on the disk, so that subsequent command line invocations can skip the download until the cache expires.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from binance.client import AsyncClient, Client
+    from binance_testnet_tool.quantize import SymbolQuantizer
+
+
+logger = logging.getLogger()
+
+#: How long the exchange info stays valid on the disk, seconds
+DEFAULT_CACHE_TTL = 3600
+
+#: A registry younger than this is not downloaded again for an unknown symbol, seconds
+MIN_REFETCH_AGE = 60
+
+#: Networks whose exchange info is cheap to get and must not outlive the process, like the local exchange
+MEMORY_ONLY_NETWORKS = {"local"}
+
+_registries: Dict[str, "SymbolRegistry"] = {}
+
+
+def get_cache_dir() -> str:
+    """Where we store cached exchange data.
+
+    Can be overridden with ``BINANCE_TOOL_CACHE_DIR`` environment variable.
+    """
+    default = os.path.join(os.path.expanduser("~"), ".cache", "binance-testnet-tool")
+    return os.environ.get("BINANCE_TOOL_CACHE_DIR", default)
+
+
+class SymbolRegistry:
+    """Symbol metadata and filters indexed by symbol name."""
+
+    def __init__(self, exchange_info: dict, fetched_at: float):
+        self.exchange_info = exchange_info
+        self.fetched_at = fetched_at
+        self.symbols: Dict[str, dict] = {s["symbol"]: s for s in exchange_info["symbols"]}
+        #: symbol -> filterType -> filter
+        self.filters: Dict[str, Dict[str, dict]] = {
+            name: {f["filterType"]: f for f in info["filters"]}
+            for name, info in self.symbols.items()
+        }
+        #: Per-symbol :py:class:`binance_testnet_tool.quantize.SymbolQuantizer` built from these filters
+        self.quantizers: Dict[str, "SymbolQuantizer"] = {}
+
+    def is_expired(self, ttl: float) -> bool:
+        return time.time() - self.fetched_at > ttl
+
+    def get_symbol_info(self, symbol: str) -> Optional[dict]:
+        """Same as ``client.get_symbol_info()``, but without a network round-trip."""
+        return self.symbols.get(symbol)
+
+    def get_filter(self, symbol: str, filter_type: str) -> Optional[dict]:
+        """Get a symbol filter like PRICE_FILTER or LOT_SIZE.
+
+        :raise KeyError: If the symbol does not exist
+        """
+        filters = self.filters[symbol]
+        if filter_type == "MIN_NOTIONAL" and filter_type not in filters:
+            # Newer exchange info replaces MIN_NOTIONAL with NOTIONAL
+            return filters.get("NOTIONAL")
+        return filters.get(filter_type)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wt") as out:
+            json.dump({"fetched_at": self.fetched_at, "exchange_info": self.exchange_info}, out)
+        os.replace(tmp, path)
+
+    @classmethod
+    def read(cls, path: str) -> Optional["SymbolRegistry"]:
+        """Read the cached exchange info, or None if not available."""
+        try:
+            with open(path, "rt") as inp:
+                data = json.load(inp)
+            return cls(data["exchange_info"], data["fetched_at"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning("Ignoring corrupted exchange info cache %s: %s", path, e)
+            return None
+
+
+def _get_cache_path(network: str, cache_dir: str = None) -> str:
+    return os.path.join(cache_dir or get_cache_dir(), f"exchange-info-{network}.json")
+
+
+def _load_cached_registry(network: str, ttl: float, cache_dir: str = None) -> Optional[SymbolRegistry]:
+    """Get a fresh registry from the memory or the disk cache."""
+    registry = _registries.get(network)
+    if registry and not registry.is_expired(ttl):
+        return registry
+
+    if network in MEMORY_ONLY_NETWORKS:
+        return None
+
+    registry = SymbolRegistry.read(_get_cache_path(network, cache_dir))
+    if registry is None or registry.is_expired(ttl):
+        return None
+
+    _registries[network] = registry
+    return registry
+
+
+def _store_registry(network: str, exchange_info: dict, cache_dir: str = None) -> SymbolRegistry:
+    registry = SymbolRegistry(exchange_info, time.time())
+    _registries[network] = registry
+    if network in MEMORY_ONLY_NETWORKS:
+        return registry
+    path = _get_cache_path(network, cache_dir)
+    try:
+        registry.save(path)
+    except OSError as e:
+        logger.warning("Could not write exchange info cache %s: %s", path, e)
+    return registry
+
+
+def _is_unknown_symbol(registry: SymbolRegistry, symbol: Optional[str]) -> bool:
+    """The symbol may have been listed after the registry was downloaded."""
+    return symbol is not None and symbol not in registry.symbols and time.time() - registry.fetched_at > MIN_REFETCH_AGE
+
+
+def get_symbol_registry(client: "Client", ttl: float = DEFAULT_CACHE_TTL, cache_dir: str = None, symbol: str = None) -> SymbolRegistry:
+    """Get the exchange info registry shared by all commands.
+
+    The registry is loaded once per process per network, from the disk cache if it is fresh enough.
+
+    :param symbol: The symbol the caller is going to look up. If the registry does not have it,
+        the exchange info is downloaded once more, unless the registry is younger than :py:data:`MIN_REFETCH_AGE`.
+    """
+    network = getattr(client, "network", "production")
+    registry = _load_cached_registry(network, ttl, cache_dir)
+    if registry is None or _is_unknown_symbol(registry, symbol):
+        logger.debug("Downloading exchange info for %s", network)
+        registry = _store_registry(network, client.get_exchange_info(), cache_dir)
+    return registry
+
+
+async def get_symbol_registry_async(client: "AsyncClient", ttl: float = DEFAULT_CACHE_TTL, cache_dir: str = None, symbol: str = None) -> SymbolRegistry:
+    """Same as :py:func:`get_symbol_registry`, but downloads using the async client."""
+    network = getattr(client, "network", "production")
+    registry = _load_cached_registry(network, ttl, cache_dir)
+    if registry is None or _is_unknown_symbol(registry, symbol):
+        logger.debug("Downloading exchange info for %s", network)
+        registry = _store_registry(network, await client.get_exchange_info(), cache_dir)
+    return registry
@@ -1,11 +1,24 @@
 from decimal import Decimal
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from binance.client import Client
+from binance_testnet_tool.symbols import get_symbol_registry
+
+if TYPE_CHECKING:
+    from binance.client import Client
+
+
+@lru_cache(maxsize=None)
+def _decimal_quantum(decimals: int) -> Decimal:
+    return Decimal(10) ** Decimal(-decimals)
 
 
 def quantize_price(price, decimals=8) -> Decimal:
-    """Always present prices up to certain amount of decimals"""
-    return Decimal(price).quantize((Decimal(10) ** Decimal(-decimals)))
+    """Always present prices up to certain amount of decimals
+
+    Use :py:class:`binance_testnet_tool.quantize.SymbolQuantizer` to round to the symbol tick size.
+    """
+    return Decimal(price).quantize(_decimal_quantum(decimals))
 
 
 def quantize_quantity(quantity, decimals=8) -> Decimal:
@@ -14,11 +27,23 @@ def quantize_quantity(quantity, decimals=8) -> Decimal:
     Binance does not like e.g.:
 
     quantity=0.00200000000000000004163336342344337026588618755340576171875
+
+    Use :py:class:`binance_testnet_tool.quantize.SymbolQuantizer` to round to the symbol lot size.
+    """
+    return Decimal(quantity).quantize(_decimal_quantum(decimals))
+
+
+def get_filter_param(client, market: str, filter_type: str, param: str) -> Decimal:
+    """Get a numeric symbol filter parameter from the cached exchange info.
+
+    E.g. ``get_filter_param(client, "BTCUSDT", "LOT_SIZE", "stepSize")``.
     """
-    return Decimal(quantity).quantize((Decimal(10) ** Decimal(-decimals)))
+    f = get_symbol_registry(client, symbol=market).get_filter(market, filter_type)
+    if f is None:
+        raise RuntimeError(f"Market {market} does not have filter {filter_type}")
+    return Decimal(f[param])
 
 
-# TODO: Make this generic "get_filter_param"
 def get_tick_size(client, market: str) -> Decimal:
     """Get a tick size.
 
@@ -28,14 +53,11 @@ def get_tick_size(client, market: str) -> Decimal:
 
     :return: Decimal("0.00001")
     """
-    info = client.get_symbol_info(market)
-    filters = {f["filterType"]: f for f in info["filters"]}
     # This is like "0.00001000"
-    tick_size = filters["PRICE_FILTER"]["tickSize"]
-    return Decimal(tick_size)
+    return get_filter_param(client, market, "PRICE_FILTER", "tickSize")
 
 
-def check_accounted_api_client(client: Client, must_be_production=False, permission_needed="USER_DATA"):
+def check_accounted_api_client(client: "Client", must_be_production=False, permission_needed="USER_DATA"):
     """Raises an error if we do not have an API key configured."""
     if not client.API_KEY:
         raise RuntimeError("To call this command you need to have your Binance API key configured")
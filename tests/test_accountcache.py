@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from binance_testnet_tool.accountcache import AccountCache
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+
+
+@pytest.fixture
+def cache():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=2, step_bps=10)
+    client, bm = create_local_client(exchange=exchange)
+    bm.start()
+    client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.01", price="40000")
+    cache = AccountCache(client, bm)
+    cache.start()
+    yield cache
+    cache.stop()
+    bm.stop()
+
+
+def wait_for(cache, condition):
+    with cache.updated:
+        assert cache.updated.wait_for(condition, timeout=5)
+
+
+def test_snapshot_and_events(cache):
+    client = cache.client
+    assert [o["price"] for o in cache.get_open_orders()] == ["40000.00000000"]
+    assert cache.get_balances() == client.get_account()["balances"]
+
+    order = client.create_order(symbol="BTCUSDT", side="SELL", type="LIMIT", timeInForce="GTC", quantity="0.01", price="60000")
+    wait_for(cache, lambda: order["orderId"] in cache.open_orders)
+    assert cache.get_open_orders(symbol="ETHUSDT") == []
+
+    client.cancel_order(symbol="BTCUSDT", orderId=order["orderId"])
+    wait_for(cache, lambda: order["orderId"] not in cache.open_orders)
+
+    client.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.01")
+    wait_for(cache, lambda: cache.get_balances() == client.get_account()["balances"])
+    assert [o["orderId"] for o in cache.get_open_orders()] == [o["orderId"] for o in client.get_open_orders()]
+    assert cache.resync_count == 1
+
+
+class SnapshotClient:
+    """Serves a fixed snapshot, letting events arrive while it loads."""
+
+    def __init__(self, events):
+        self.events = events
+        self.cache = None
+
+    def get_account(self):
+        return {"updateTime": 2000, "balances": [{"asset": "BTC", "free": "1.00000000", "locked": "0.00000000"}]}
+
+    def get_open_orders(self):
+        for msg in self.events:
+            self.cache.process_message(msg)
+        return [{"symbol": "BTCUSDT", "orderId": 1, "status": "PARTIALLY_FILLED", "executedQty": "0.50000000", "updateTime": 2000}]
+
+
+class NoStreamManager:
+
+    def start_user_socket(self, callback):
+        return "user"
+
+    def stop_socket(self, conn_key):
+        pass
+
+
+def execution_report(status: str, executed: str, event_time: int) -> dict:
+    return {
+        "e": "executionReport", "E": event_time, "T": event_time, "s": "BTCUSDT", "c": "a", "C": "", "S": "BUY", "o": "LIMIT",
+        "f": "GTC", "q": "1.00000000", "p": "40000.00000000", "x": "TRADE", "X": status, "i": 1,
+        "z": executed, "Z": "0", "O": 1000,
+    }
+
+
+def balance_update(free: str, update_time: int) -> dict:
+    return {"e": "outboundAccountPosition", "E": update_time, "u": update_time, "B": [{"a": "BTC", "f": free, "l": "0.00000000"}]}
+
+
+def test_stale_events_are_dropped():
+    client = SnapshotClient([
+        execution_report("PARTIALLY_FILLED", "0.25000000", 1500),
+        balance_update("1.25000000", 1500),
+    ])
+    cache = client.cache = AccountCache(client, NoStreamManager())
+    cache.start()
+    assert cache.get_open_orders()[0]["executedQty"] == "0.50000000"
+    assert cache.get_balances()[0]["free"] == "1.00000000"
+
+
+def test_newer_events_are_replayed():
+    client = SnapshotClient([
+        execution_report("PARTIALLY_FILLED", "0.25000000", 1500),
+        execution_report("PARTIALLY_FILLED", "0.50000000", 2000),
+        execution_report("FILLED", "1.00000000", 2500),
+        balance_update("1.50000000", 2500),
+    ])
+    cache = client.cache = AccountCache(client, NoStreamManager())
+    cache.start()
+    assert cache.get_open_orders() == []
+    assert cache.get_balances()[0]["free"] == "1.50000000"
+
+
+class BlockingClient(SnapshotClient):
+    """Holds the snapshot requests until released."""
+
+    def __init__(self):
+        super().__init__([])
+        self.release = threading.Event()
+        self.loads = 0
+
+    def get_account(self):
+        self.loads += 1
+        self.release.wait(5)
+        return super().get_account()
+
+
+def test_error_burst_shares_one_resync():
+    client = BlockingClient()
+    client.release.set()
+    cache = client.cache = AccountCache(client, NoStreamManager())
+    cache.start()
+
+    client.release.clear()
+    cache.process_message({"e": "error", "m": "Connection lost"})
+    thread = cache.resync_thread
+    deadline = time.time() + 5
+    while client.loads < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    # More errors while the resync is loading
+    for _ in range(4):
+        cache.process_message({"e": "error", "m": "Connection lost"})
+    assert cache.resync_thread is thread
+    client.release.set()
+    thread.join(5)
+
+    # The start, the first error and one more for the errors during that resync
+    assert client.loads == 3
+    assert cache.resync_thread is None
+    assert cache.is_synced()
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from binance_testnet_tool import main
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+
+
+class FakeAsyncClient:
+    """AsyncClient lookalike answering from the local exchange."""
+
+    def __init__(self, exchange: LocalExchange, api_key: str):
+        self.client, _ = create_local_client(api_key, exchange=exchange)
+        self.network = "local"
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def _call(*args, **kwargs):
+            self.calls.append(name)
+            # Let the other coroutines run, like a network round-trip would
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return _call
+
+    async def close_connection(self):
+        self.calls.append("close_connection")
+
+
+@pytest.fixture
+def exchange(monkeypatch, tmp_path):
+    exchange = LocalExchange()
+    monkeypatch.setenv("BINANCE_TOOL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("binance_testnet_tool.localexchange.get_local_exchange", lambda: exchange)
+    return exchange
+
+
+@pytest.fixture
+def async_clients(monkeypatch, exchange):
+    """Async clients created by the commands."""
+    clients = []
+
+    async def create_async_client(api_key, api_secret, network, clock=None):
+        clients.append(FakeAsyncClient(exchange, api_key))
+        return clients[-1]
+
+    monkeypatch.setattr(main, "create_async_client", create_async_client)
+    return clients
+
+
+def run(*args):
+    main.main.main(args=["--network", "local", "--log-level", "warning", "--api-key", "alice", "--async"] + list(args), standalone_mode=False)
+
+
+def test_async_cancel_all(exchange, async_clients, capsys):
+    client, _ = create_local_client("alice", exchange=exchange)
+    for price in ("40000", "40001", "40002"):
+        client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.001", price=price)
+    client.create_order(symbol="ETHUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.01", price="2000")
+
+    run("cancel-all")
+
+    assert "Cancelled 4 of 4 orders" in capsys.readouterr().out
+    assert client.get_open_orders() == []
+    async_client, = async_clients
+    assert async_client.calls[0] == "get_open_orders"
+    assert async_client.calls[-1] == "close_connection"
+
+
+def test_async_depth(async_clients, capsys):
+    run("depth", "--market", "BTCUSDT")
+
+    out = capsys.readouterr().out
+    assert "Top ask is" in out
+    assert "Top bid is" in out
+    async_client, = async_clients
+    assert "get_order_book" in async_client.calls
@@ -0,0 +1,55 @@
+import io
+from decimal import Decimal
+
+import pytest
+
+from binance_testnet_tool.batch import place_orders, prepare_orders, read_order_rows
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+
+
+@pytest.fixture
+def client():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=2, step_bps=10)
+    client, bm = create_local_client(exchange=exchange)
+    return client
+
+
+def test_read_csv_and_jsonl():
+    csv_rows = list(read_order_rows(io.StringIO("Market,Side,Quantity,Price\nBTCUSDT,buy,0.001,40000\n"), "csv"))
+    assert csv_rows == [(2, {"market": "BTCUSDT", "side": "buy", "quantity": "0.001", "price": "40000"})]
+
+    jsonl_rows = list(read_order_rows(io.StringIO('\n{"market": "BTCUSDT", "quantity": 0.001}\n'), "jsonl"))
+    assert jsonl_rows == [(2, {"market": "BTCUSDT", "quantity": 0.001})]
+
+
+def test_prepare_orders(client):
+    rows = [
+        (1, {"market": "BTCUSDT", "side": "buy", "quantity": "0.0012345", "price": "40000.123"}),
+        (2, {"market": "btcusdt", "side": "sell", "type": "market", "quantity": 0.001}),
+        (3, {"market": "BTCUSDT", "side": "buy", "quantity": "0.001", "price": "1"}),
+        (4, {"market": "NOPE", "side": "buy", "quantity": "1", "price": "1"}),
+        (5, {"market": "BTCUSDT", "side": "buy", "quantity": "lots", "price": "1"}),
+    ]
+    orders, errors = prepare_orders(client, rows)
+    assert [(o.price, o.quantity, o.type) for o in orders] == [
+        (Decimal("40000.12"), Decimal("0.001234"), "LIMIT"),
+        (None, Decimal("0.001000"), "MARKET"),
+    ]
+    assert [line for line, error in errors] == [3, 4, 5]
+    assert "MIN_NOTIONAL" in errors[0][1]
+
+
+def test_place_orders(client):
+    rows = [
+        (1, {"market": "BTCUSDT", "side": "buy", "quantity": "0.001", "price": str(40000 + i)})
+        for i in range(20)
+    ]
+    rows.append((21, {"market": "BTCUSDT", "side": "buy", "quantity": "1", "price": "40000"}))
+    orders, errors = prepare_orders(client, rows)
+    results = list(place_orders(client, orders, concurrency=4))
+    assert [r["price"] for r in results[:20]] == [f"{40000 + i}.00" for i in range(20)]
+    assert {r["status"] for r in results[:20]} == {"NEW"}
+    # 40 000 USDT is more than the local account has
+    assert results[-1]["status"] == "REJECTED"
+    assert len(client.get_open_orders()) == 20
@@ -1,5 +0,0 @@
-from binance_testnet_limit_filler import __version__
-
-
-def test_version():
-    assert __version__ == '0.1.0'
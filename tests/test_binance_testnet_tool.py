@@ -0,0 +1,5 @@
+from binance_testnet_tool import __version__
+
+
+def test_version():
+    assert __version__ == '0.2.2'
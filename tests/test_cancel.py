@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from binance_testnet_tool.cancel import cancel_all_orders, cancel_all_orders_async
+from binance_testnet_tool.localexchange import LocalExchange, _api_error, create_local_client
+
+
+class CancelClient:
+    """Local client counting the cancel requests, optionally refusing ``DELETE openOrders``."""
+
+    def __init__(self, exchange: LocalExchange, refuse_symbols=(), delay: float = 0):
+        self.client, _ = create_local_client("alice", exchange=exchange)
+        self.refuse_symbols = set(refuse_symbols)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        request = self.client._request
+
+        def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+            path = uri.rsplit("/", 1)[-1]
+            if method == "delete":
+                self.requests.append((path, kwargs["data"]["symbol"]))
+                if path == "openOrders" and kwargs["data"]["symbol"] in self.refuse_symbols:
+                    raise _api_error(-1000, "An unknown error occurred while processing the request.", 500)
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                time.sleep(self.delay)
+                return request(method, uri, signed, force_params, **kwargs)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        self.client._request = _request
+
+
+class AsyncCancelClient:
+    """AsyncClient lookalike over :py:class:`CancelClient`."""
+
+    def __init__(self, cancel_client: CancelClient):
+        self.cancel_client = cancel_client
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _call(self, method, *args, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return method(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    async def _delete(self, path, signed=False, **kwargs):
+        return await self._call(self.cancel_client.client._delete, path, signed, **kwargs)
+
+    async def cancel_order(self, **params):
+        return await self._call(self.cancel_client.client.cancel_order, **params)
+
+
+@pytest.fixture
+def exchange():
+    exchange = LocalExchange()
+    client, _ = create_local_client("alice", exchange=exchange)
+    for i in range(6):
+        client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.001", price=str(40000 + i))
+    for i in range(2):
+        client.create_order(symbol="ETHUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.01", price=str(2000 + i))
+    return exchange
+
+
+def test_cancel_per_symbol(exchange):
+    cancel = CancelClient(exchange)
+    orders = cancel.client.get_open_orders()
+
+    assert cancel_all_orders(cancel.client, orders) == 8
+    assert cancel.client.get_open_orders() == []
+    assert sorted(cancel.requests) == [("openOrders", "BTCUSDT"), ("openOrders", "ETHUSDT")]
+
+
+def test_cancel_counts_only_cancelled_orders(exchange):
+    cancel = CancelClient(exchange)
+    orders = cancel.client.get_open_orders()
+    # One of the orders is closed by someone else before we get to cancel it
+    eth_order = next(o for o in orders if o["symbol"] == "ETHUSDT")
+    cancel.client.cancel_order(symbol="ETHUSDT", orderId=eth_order["orderId"])
+
+    assert cancel_all_orders(cancel.client, orders) == 7
+    assert asyncio.run(cancel_all_orders_async(AsyncCancelClient(cancel), orders)) == 0
+
+
+def test_cancel_falls_back_to_bounded_one_by_one(exchange):
+    cancel = CancelClient(exchange, refuse_symbols={"BTCUSDT"}, delay=0.01)
+    orders = cancel.client.get_open_orders()
+
+    assert cancel_all_orders(cancel.client, orders, max_workers=2) == 8
+    assert cancel.client.get_open_orders() == []
+    assert cancel.requests.count(("order", "BTCUSDT")) == 6
+    assert ("order", "ETHUSDT") not in cancel.requests
+    assert cancel.max_in_flight == 2
+
+
+def test_cancel_async_per_symbol(exchange):
+    cancel = CancelClient(exchange)
+    async_client = AsyncCancelClient(cancel)
+    orders = cancel.client.get_open_orders()
+
+    assert asyncio.run(cancel_all_orders_async(async_client, orders)) == 8
+    assert cancel.client.get_open_orders() == []
+    assert sorted(cancel.requests) == [("openOrders", "BTCUSDT"), ("openOrders", "ETHUSDT")]
+
+
+def test_cancel_async_falls_back_to_bounded_one_by_one(exchange):
+    cancel = CancelClient(exchange, refuse_symbols={"BTCUSDT"})
+    async_client = AsyncCancelClient(cancel)
+    orders = cancel.client.get_open_orders()
+
+    assert asyncio.run(cancel_all_orders_async(async_client, orders, max_concurrency=3)) == 8
+    assert cancel.client.get_open_orders() == []
+    assert cancel.requests.count(("order", "BTCUSDT")) == 6
+    assert async_client.max_in_flight == 3
+
+
+def test_cancel_per_order_leaves_other_orders(exchange):
+    cancel = CancelClient(exchange)
+    orders = cancel.client.get_open_orders(symbol="BTCUSDT")
+
+    assert cancel_all_orders(cancel.client, orders[:2], per_order=True) == 2
+    assert asyncio.run(cancel_all_orders_async(AsyncCancelClient(cancel), orders[2:4], per_order=True)) == 2
+    assert ("openOrders", "BTCUSDT") not in cancel.requests
+    assert len(cancel.client.get_open_orders()) == 4
@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from binance_testnet_tool.clocksync import ClockSync, estimate_offset, install_clock_sync
+
+
+class FakeClient:
+    """Signs and checks timestamps like python-binance and Binance would, with a skewed server clock."""
+
+    def __init__(self, skew: float):
+        self.skew = skew
+        self.timestamp_offset = 0
+        self.time_requests = 0
+        self.signed = []
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        server_time = time.time() * 1000 + self.skew
+        if not signed:
+            self.time_requests += 1
+            return {"serverTime": int(server_time)}
+        data = kwargs["data"]
+        data["timestamp"] = int(time.time() * 1000 + self.timestamp_offset)
+        data["signature"] = "signed"
+        if data["timestamp"] > server_time + 1000 or server_time - data["timestamp"] > data.get("recvWindow", 5000):
+            raise BinanceAPIException(None, 400, '{"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}')
+        self.signed.append(dict(data))
+        return {}
+
+    def get_server_time(self):
+        return self._request("get", "https://example.com/api/v3/time", False)
+
+    def create_order(self, **params):
+        return self._request("post", "https://example.com/api/v3/order", True, data=params)
+
+
+def test_estimate_offset():
+    # Server read its clock halfway through a 100 ms round-trip
+    assert estimate_offset(1000, 5050, 1100) == (4000, 100)
+
+
+def test_smoothing():
+    clock = ClockSync(recv_window=5000, smoothing=0.5)
+    clock.update([(100, 50), (300, 10)])
+    assert clock.offset == 300
+    clock.update([(500, 10)])
+    assert clock.offset == 400
+    # A step larger than half of recvWindow is not smoothed
+    clock.update([(10_000, 10)])
+    assert clock.offset == 10_000
+
+
+def test_recv_window_range():
+    with pytest.raises(RuntimeError):
+        ClockSync(recv_window=60_001)
+
+
+def test_skewed_clock():
+    client = FakeClient(skew=20_000)
+    clock = ClockSync(recv_window=3000)
+    install_clock_sync(client, clock)
+    client.create_order(symbol="BTCUSDT")
+    assert clock.offset == pytest.approx(20_000, abs=50)
+    assert client.signed[0]["recvWindow"] == 3000
+    assert (clock.signed_requests, clock.rejections, client.time_requests) == (1, 0, 1)
+
+
+def test_rejection_resyncs_once():
+    client = FakeClient(skew=0)
+    clock = ClockSync()
+    install_clock_sync(client, clock)
+    client.create_order(symbol="BTCUSDT")
+
+    # The host clock jumps ahead, concurrent rejected requests share one re-sync
+    client.skew = -30_000
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: client.create_order(symbol="BTCUSDT"), range(4)))
+    assert clock.offset == pytest.approx(-30_000, abs=50)
+    assert clock.rejections == clock.recovered >= 1
+    assert client.time_requests == 1 + clock.samples
+
+
+def test_background_sync_is_shared():
+    client = FakeClient(skew=0)
+    clock = ClockSync()
+    clock.start(client, interval=0.01)
+    server_thread = clock.thread
+    deadline = time.time() + 5
+    while not clock.sync_count and time.time() < deadline:
+        time.sleep(0.01)
+    assert clock.sync_count
+
+    # A command run by the server starts and stops the clock
+    clock.start(client, interval=0.01)
+    assert clock.thread is server_thread
+    clock.stop()
+    assert server_thread.is_alive()
+
+    clock.stop()
+    assert clock.thread is None
+    assert not server_thread.is_alive()
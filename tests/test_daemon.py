@@ -0,0 +1,97 @@
+import os
+import stat
+import threading
+
+import click
+import pytest
+
+from binance_testnet_tool.daemon import CommandServer, ThinClient, forward_command
+from binance_testnet_tool.localexchange import LocalExchange
+
+
+@pytest.fixture
+def server(tmp_path):
+    def run_command(args):
+        if args[0] == "fail":
+            raise RuntimeError("Boom")
+        print("Got", " ".join(args))
+
+    server = CommandServer(str(tmp_path / "daemon.sock"), run_command)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_forward_command(server):
+    assert forward_command(["depth", "--market", "BTCUSDT"], server.socket_path) == (0, "Got depth --market BTCUSDT\n")
+
+
+def test_command_error(server):
+    exit_code, output = forward_command(["fail"], server.socket_path)
+    assert exit_code == 1
+    assert "RuntimeError: Boom" in output
+
+
+def test_many_commands_over_one_connection(server):
+    client = ThinClient(server.socket_path)
+    try:
+        for i in range(3):
+            assert client.run(["orders", str(i)]) == (0, f"Got orders {i}\n")
+    finally:
+        client.close()
+
+
+def test_socket_is_private(server):
+    assert stat.S_IMODE(os.stat(server.socket_path).st_mode) == 0o600
+
+
+def test_no_server(tmp_path):
+    assert forward_command(["orders"], str(tmp_path / "missing.sock")) is None
+
+
+def run_main(monkeypatch, args, server_running: bool = True):
+    from binance_testnet_tool import main
+
+    forwarded = []
+
+    def forward_command(command_args):
+        forwarded.append(command_args)
+        return 0, ""
+
+    monkeypatch.setattr(main, "forward_command", forward_command)
+    monkeypatch.setattr(main, "is_server_running", lambda socket_path: server_running)
+    try:
+        main.main.main(args=["--log-level", "warning", "--use-daemon"] + args, standalone_mode=False)
+    except click.exceptions.Exit:
+        pass
+    return forwarded
+
+
+def test_use_daemon_forwards(monkeypatch):
+    assert run_main(monkeypatch, ["depth", "--market", "BTCUSDT"]) == [["depth", "--market", "BTCUSDT"]]
+
+
+@pytest.mark.parametrize("option", [["--network", "local"], ["--api-key", "alice"], ["--async"], ["--recv-window", "1000"], ["--metrics"], ["--no-clock-sync"]])
+def test_use_daemon_refuses_client_options(monkeypatch, option):
+    with pytest.raises(click.UsageError, match="cannot be used with --use-daemon"):
+        run_main(monkeypatch, option + ["depth"])
+
+
+def test_no_server_runs_locally_with_client_options(monkeypatch, tmp_path, capsys):
+    exchange = LocalExchange()
+    monkeypatch.setenv("BINANCE_TOOL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("binance_testnet_tool.localexchange.get_local_exchange", lambda: exchange)
+    assert run_main(monkeypatch, ["--network", "local", "depth", "--market", "BTCUSDT"], server_running=False) == []
+    assert "Top ask is" in capsys.readouterr().out
+
+
+def test_load_test_is_not_forwarded(monkeypatch):
+    from binance_testnet_tool import main
+
+    ran = []
+    # Stand-in for the real command, which would need an exchange
+    monkeypatch.setitem(main.main.commands, "load-test", click.Command("load-test", callback=lambda: ran.append(True)))
+    assert run_main(monkeypatch, ["load-test"]) == []
+    assert ran == [True]
@@ -0,0 +1,30 @@
+import io
+import json
+
+from binance_testnet_tool.eventoutput import EventWriter
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+
+
+def test_jsonl_with_filters():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=2, step_bps=10)
+    client, bm = create_local_client(exchange=exchange)
+    bm.start()
+
+    output = io.StringIO()
+    writer = EventWriter(output, "auto", events=["executionReport"], keys=["e", "x", "X"])
+    assert writer.format == "jsonl"
+    writer.start()
+    bm.start_user_socket(writer.process_message)
+
+    client.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.01")
+    bm.stop()
+    writer.stop()
+
+    lines = output.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"e": "executionReport", "x": "NEW", "X": "NEW"},
+        {"e": "executionReport", "x": "TRADE", "X": "FILLED"},
+    ]
+    assert lines[0] == '{"e":"executionReport","x":"NEW","X":"NEW"}'
+    assert writer.filtered == 1
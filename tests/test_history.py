@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from binance_testnet_tool.history import HistoryStore, download_history, split_windows
+
+MINUTE = 60_000
+
+
+class FakeClient:
+    """Serves one candle per minute and one trade per second."""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.session = FakeSession()
+
+    def get_klines(self, symbol, interval, startTime, endTime, limit):
+        with self.lock:
+            self.calls += 1
+        if startTime == self.fail_at:
+            raise RuntimeError("Boom")
+        first = -(-startTime // MINUTE) * MINUTE
+        return [
+            [t, "1.0", "2.0", "0.5", "1.5", "10", t + MINUTE - 1, "15", 3, "5", "7.5"]
+            for t in range(first, endTime + 1, MINUTE)
+        ][:limit]
+
+    def get_aggregate_trades(self, symbol, limit, startTime=None, endTime=None, fromId=None):
+        with self.lock:
+            self.calls += 1
+        if fromId is None:
+            first, last = -(-startTime // 1000), endTime // 1000
+        else:
+            first, last = fromId, fromId + limit
+        return [
+            {"a": t, "p": "1.0", "q": "2.0", "f": t, "l": t, "T": t * 1000, "m": True}
+            for t in range(first, last + 1)
+        ][:limit]
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.adapters = {}
+
+    def mount(self, prefix, adapter):
+        self.adapters[prefix] = adapter
+
+
+@pytest.fixture
+def store():
+    store = HistoryStore(":memory:")
+    yield store
+    store.close()
+
+
+def test_split_windows():
+    windows = split_windows("BTCUSDT", 0, 2500, 1000)
+    assert [(w.start, w.end, w.index) for w in windows] == [(0, 999, 0), (1000, 1999, 1), (2000, 2500, 2)]
+
+
+def test_klines_resume(store):
+    client = FakeClient()
+    end = 2500 * MINUTE
+    result, = download_history(client, store, "klines", ["BTCUSDT"], 0, end, workers=4)
+    assert (result.windows, result.fetched, result.written) == (3, 2501, 2501)
+    assert store.get_last_kline_time("BTCUSDT", "1m") == end
+
+    # Only the last stored candle and the new ones are fetched again
+    result, = download_history(client, store, "klines", ["BTCUSDT"], 0, end + 10 * MINUTE, workers=4)
+    assert (result.resumed_from, result.fetched) == (end, 11)
+
+
+def test_failed_window_leaves_no_gap(store):
+    client = FakeClient(fail_at=1000 * MINUTE)
+    with pytest.raises(RuntimeError):
+        download_history(client, store, "klines", ["BTCUSDT"], 0, 5000 * MINUTE, workers=1)
+    assert store.get_last_kline_time("BTCUSDT", "1m") == 999 * MINUTE
+
+
+def test_agg_trades_paging(store):
+    client = FakeClient()
+    # Two hours of one trade per second do not fit one page per hour window
+    result, = download_history(client, store, "aggtrades", ["BTCUSDT"], 0, 2 * 3600 * 1000 - 1, workers=2)
+    assert result.windows == 2
+    assert result.written == 7200
+    assert result.requests == 2 * 4
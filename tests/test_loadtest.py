@@ -0,0 +1,75 @@
+import pytest
+
+from binance_testnet_tool import main
+from binance_testnet_tool.loadtest import run_load_test
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+from binance_testnet_tool.ordertracker import OrderLatencyTracker
+from binance_testnet_tool.ratelimit import RateLimiter, TokenBucket, install_rate_limiter
+
+
+@pytest.fixture
+def client():
+    client, _ = create_local_client("alice", exchange=LocalExchange())
+    return client
+
+
+def make_order(seq: int) -> dict:
+    return dict(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.001", price=str(40000 + seq), newOrderRespType="ACK")
+
+
+class CountingRateLimiter(RateLimiter):
+
+    def __init__(self):
+        super().__init__()
+        self.charged = []
+
+    def acquire(self, weight: int, orders: int = 0):
+        self.charged.append((weight, orders))
+        super().acquire(weight, orders)
+
+
+def test_latency_excludes_rate_limiter_waits(client):
+    limiter = CountingRateLimiter()
+    # One order per 50 ms, the local exchange answers much faster
+    limiter.order_bucket = TokenBucket(1, 0.05)
+    install_rate_limiter(client, limiter)
+
+    result = run_load_test(client, make_order, rate=1000, duration=5, concurrency=4, max_orders=8)
+
+    assert result.accepted == 8
+    assert limiter.throttled_seconds > 0.2
+    assert max(result.latencies) < 0.04
+    # Each order was charged once
+    assert limiter.charged == [(1, 1)] * 8
+
+
+def test_order_ids(client):
+    result = run_load_test(client, make_order, rate=1000, duration=5, concurrency=2, max_orders=3)
+    assert sorted(result.order_ids) == sorted(o["orderId"] for o in client.get_open_orders(symbol="BTCUSDT"))
+
+
+def test_tracker_send_time_excludes_rate_limiter_waits(client):
+    limiter = RateLimiter()
+    limiter.order_bucket = TokenBucket(1, 0.05)
+    install_rate_limiter(client, limiter)
+    tracker = OrderLatencyTracker()
+
+    run_load_test(client, make_order, rate=1000, duration=5, concurrency=4, max_orders=8, tracker=tracker)
+
+    assert limiter.throttled_seconds > 0.2
+    assert max(tracker.get_samples()["send → ack"]) < 0.04
+
+
+def test_cleanup_cancels_only_own_orders(monkeypatch, tmp_path):
+    exchange = LocalExchange()
+    monkeypatch.setenv("BINANCE_TOOL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("binance_testnet_tool.localexchange.get_local_exchange", lambda: exchange)
+    client, _ = create_local_client("alice", exchange=exchange)
+    other = client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.001", price="30000")
+
+    main.main.main(args=[
+        "--network", "local", "--log-level", "warning", "--api-key", "alice",
+        "load-test", "--market", "BTCUSDT", "--count", "3", "--rate", "100", "--duration", "5", "--cleanup",
+    ], standalone_mode=False)
+
+    assert [o["orderId"] for o in client.get_open_orders(symbol="BTCUSDT")] == [other["orderId"]]
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from binance_testnet_tool.localexchange import LocalExchange, ReplayFeeder, create_local_client
+from binance_testnet_tool.recorder import RecordingWriter, StreamRecorder
+
+
+@pytest.fixture
+def exchange():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=2, step_bps=10)
+    return exchange
+
+
+@pytest.fixture
+def client(exchange):
+    client, bm = create_local_client(exchange=exchange)
+    return client
+
+
+def get_balance(client, asset):
+    return next(b for b in client.get_account()["balances"] if b["asset"] == asset)
+
+
+def test_order_book(client):
+    book = client.get_order_book(symbol="BTCUSDT")
+    assert book["bids"] == [["49950.00000000", "0.02002000"], ["49900.00000000", "0.02004000"]]
+    assert book["asks"] == [["50050.00000000", "0.01998000"], ["50100.00000000", "0.01996000"]]
+
+
+def test_ioc_partial_fill_expires(client):
+    order = client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="IOC", quantity="0.03", price="50050")
+    assert order["status"] == "EXPIRED"
+    assert order["executedQty"] == "0.01998000"
+    assert order["fills"] == [{"price": "50050.00000000", "qty": "0.01998000", "commission": "0.00000000", "commissionAsset": "BNB", "tradeId": 1}]
+    assert get_balance(client, "BTC") == {"asset": "BTC", "free": "1.01998000", "locked": "0.00000000"}
+    assert get_balance(client, "USDT")["free"] == "9000.00100000"
+
+
+def test_resting_order_and_cancel(client):
+    order = client.create_order(symbol="BTCUSDT", side="SELL", type="LIMIT", timeInForce="GTC", quantity="0.01", price="50000")
+    assert order["status"] == "NEW"
+    assert [o["orderId"] for o in client.get_open_orders()] == [order["orderId"]]
+    assert get_balance(client, "BTC")["locked"] == "0.01000000"
+
+    client.cancel_order(symbol="BTCUSDT", orderId=order["orderId"])
+    assert client.get_open_orders(symbol="BTCUSDT") == []
+    assert client.get_order(symbol="BTCUSDT", orderId=order["orderId"])["status"] == "CANCELED"
+    assert get_balance(client, "BTC") == {"asset": "BTC", "free": "1.00000000", "locked": "0.00000000"}
+
+
+def test_market_orders_pay_as_they_fill(client):
+    client.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.03")
+    assert get_balance(client, "USDT") == {"asset": "USDT", "free": "8497.99900000", "locked": "0.00000000"}
+    client.create_order(symbol="BTCUSDT", side="SELL", type="MARKET", quantity="0.01")
+    assert get_balance(client, "BTC") == {"asset": "BTC", "free": "1.02000000", "locked": "0.00000000"}
+
+
+def test_market_buy_insufficient_balance(exchange, client):
+    seller, _ = create_local_client("bob", exchange=exchange)
+    seller.create_order(symbol="BTCUSDT", side="SELL", type="LIMIT", timeInForce="GTC", quantity="1", price="60000")
+
+    # Would cost about 30 000 USDT
+    with pytest.raises(BinanceAPIException) as e:
+        client.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.5")
+    assert e.value.code == -2010
+    assert get_balance(client, "USDT") == {"asset": "USDT", "free": "10000.00000000", "locked": "0.00000000"}
+    assert len(client.get_order_book(symbol="BTCUSDT")["asks"]) == 3
+
+
+def test_filter_failure(client):
+    with pytest.raises(BinanceAPIException) as e:
+        client.create_order(symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC", quantity="0.0000001", price="50000")
+    assert e.value.code == -1013
+
+    with pytest.raises(BinanceAPIException) as e:
+        client.cancel_order(symbol="BTCUSDT", orderId=999)
+    assert e.value.code == -2011
+
+
+def test_user_data_events(exchange):
+    client, bm = create_local_client(exchange=exchange)
+    events = []
+    received = threading.Event()
+
+    def process_message(msg):
+        events.append(msg)
+        if msg["e"] == "outboundAccountPosition":
+            received.set()
+
+    bm.start()
+    bm.start_user_socket(process_message)
+    try:
+        client.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.03")
+        assert received.wait(5)
+    finally:
+        bm.stop()
+
+    reports = [(e["x"], e["X"], e["z"]) for e in events if e["e"] == "executionReport"]
+    assert reports == [
+        ("NEW", "NEW", "0.00000000"),
+        ("TRADE", "PARTIALLY_FILLED", "0.01998000"),
+        ("TRADE", "FILLED", "0.03000000"),
+    ]
+    positions = [e for e in events if e["e"] == "outboundAccountPosition"]
+    assert {b["a"]: b["f"] for b in positions[-1]["B"]} == {"BTC": "1.03000000", "USDT": "8497.99900000"}
+
+
+def test_replay(tmp_path):
+    writer = RecordingWriter(str(tmp_path), ["BTCUSDT"])
+    recorder = StreamRecorder(writer)
+    recorder.start()
+    recorder.process_message({"e": "depthUpdate", "E": 1, "s": "BTCUSDT", "U": 1, "u": 1, "b": [["49000.00", "1.0"]], "a": [["51000.00", "1.0"]]})
+    recorder.process_message({"e": "depthUpdate", "E": 2, "s": "BTCUSDT", "U": 2, "u": 2, "b": [["49000.00", "0.5"]], "a": []})
+    recorder.process_message({"e": "trade", "E": 3, "s": "BTCUSDT", "t": 1, "p": "50500.00", "q": "0.1", "m": False})
+    recorder.stop()
+
+    exchange = LocalExchange(seed_levels=0)
+    client, bm = create_local_client(exchange=exchange)
+    # Resting sell below the replayed trade price gets filled when the market trades through it
+    order = client.create_order(symbol="BTCUSDT", side="SELL", type="LIMIT", timeInForce="GTC", quantity="0.05", price="50400")
+
+    feeder = ReplayFeeder(exchange, writer.files, speed=0)
+    feeder.start()
+    assert feeder.done.wait(5)
+    assert feeder.replayed == 3
+
+    book = client.get_order_book(symbol="BTCUSDT")
+    assert book["bids"] == [["49000.00000000", "0.50000000"]]
+    assert book["asks"] == [["51000.00000000", "1.00000000"]]
+    assert client.get_order(symbol="BTCUSDT", orderId=order["orderId"])["status"] == "FILLED"
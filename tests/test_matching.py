@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from binance_testnet_tool.matching import BUY, SELL, MatchingEngine, Order
+
+
+def make_engine():
+    return MatchingEngine("BTCUSDT", Decimal("0.01"), Decimal("0.001"))
+
+
+order_ids = iter(range(1, 1_000_000))
+
+
+def make_order(side, price, quantity, time_in_force="GTC", order_type="LIMIT"):
+    return Order(next(order_ids), "", "BTCUSDT", side, order_type, time_in_force, price, quantity)
+
+
+def test_price_time_priority():
+    engine = make_engine()
+    first = make_order(SELL, 101, 5)
+    second = make_order(SELL, 101, 5)
+    better = make_order(SELL, 100, 5)
+    for o in (first, second, better):
+        engine.submit(o)
+
+    trades = engine.submit(make_order(BUY, 101, 12))
+    assert [(t.maker, t.price, t.quantity) for t in trades] == [(better, 100, 5), (first, 101, 5), (second, 101, 2)]
+    assert second.status == "PARTIALLY_FILLED"
+    assert engine.get_depth(10) == ([], [(101, 3)])
+
+
+def test_gtc_rests_remaining():
+    engine = make_engine()
+    engine.submit(make_order(SELL, 100, 5))
+    order = make_order(BUY, 100, 8)
+    engine.submit(order)
+    assert order.status == "PARTIALLY_FILLED"
+    assert order.quote == 500
+    assert engine.best_bid() == 100
+    assert engine.best_ask() is None
+
+
+def test_ioc_and_market_expire():
+    engine = make_engine()
+    engine.submit(make_order(SELL, 100, 5))
+    ioc = make_order(BUY, 100, 8, "IOC")
+    engine.submit(ioc)
+    assert (ioc.status, ioc.executed) == ("EXPIRED", 5)
+
+    engine.submit(make_order(SELL, 200, 5))
+    market = make_order(BUY, 0, 8, "", "MARKET")
+    engine.submit(market)
+    assert (market.status, market.executed) == ("EXPIRED", 5)
+    assert engine.get_depth(10) == ([], [])
+
+
+def test_fill_cost():
+    engine = make_engine()
+    engine.submit(make_order(SELL, 200, 5))
+    engine.submit(make_order(SELL, 100, 5))
+    engine.submit(make_order(BUY, 50, 5))
+    assert engine.get_fill_cost(BUY, 8) == 5 * 100 + 3 * 200
+    # Only what the book can fill
+    assert engine.get_fill_cost(BUY, 20) == 5 * 100 + 5 * 200
+    assert engine.get_fill_cost(SELL, 2) == 2 * 50
+
+    # An emptied level that came back is counted once
+    cheapest = make_order(SELL, 90, 1)
+    engine.submit(cheapest)
+    engine.cancel(cheapest.order_id)
+    engine.submit(make_order(SELL, 90, 1))
+    assert engine.get_fill_cost(BUY, 20) == 90 + 5 * 100 + 5 * 200
+
+
+def test_fok():
+    engine = make_engine()
+    engine.submit(make_order(SELL, 100, 5))
+    engine.submit(make_order(SELL, 102, 5))
+
+    fok = make_order(BUY, 101, 6, "FOK")
+    assert engine.submit(fok) == []
+    assert (fok.status, fok.executed) == ("EXPIRED", 0)
+
+    fok = make_order(BUY, 102, 6, "FOK")
+    assert [t.quantity for t in engine.submit(fok)] == [5, 1]
+    assert fok.status == "FILLED"
+
+
+def test_cancel():
+    engine = make_engine()
+    first = make_order(SELL, 100, 5)
+    second = make_order(SELL, 100, 5)
+    engine.submit(first)
+    engine.submit(second)
+    assert engine.cancel(first.order_id) is first
+    assert engine.cancel(first.order_id) is None
+    assert engine.get_depth(10) == ([], [(100, 5)])
+
+    trades = engine.submit(make_order(BUY, 100, 10, "IOC"))
+    assert [t.maker for t in trades] == [second]
+
+    # Cancel out the whole level and reuse the price
+    third = make_order(SELL, 100, 5)
+    engine.submit(third)
+    engine.cancel(third.order_id)
+    assert engine.best_ask() is None
+    engine.submit(make_order(SELL, 100, 1))
+    assert engine.best_ask() == 100
+
+
+def test_changed_levels():
+    engine = make_engine()
+    engine.submit(make_order(SELL, 100, 5))
+    engine.submit(make_order(BUY, 99, 5))
+    engine.pop_changed_levels()
+    engine.submit(make_order(BUY, 100, 2))
+    assert engine.pop_changed_levels() == [(SELL, 100, 3)]
+    assert engine.pop_changed_levels() == []
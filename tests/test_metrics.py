@@ -0,0 +1,73 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from binance_testnet_tool.localexchange import create_local_client
+from binance_testnet_tool.metrics import RequestMetrics, install_metrics, install_metrics_async
+
+
+class FakeRequest:
+    method = "GET"
+    path_url = "/api/v3/depth?symbol=BTCUSDT&limit=100"
+
+
+class FakeResponse:
+    request = FakeRequest()
+    elapsed = timedelta(milliseconds=30)
+    status_code = 429
+    headers = {"X-MBX-USED-WEIGHT-1M": "1201"}
+
+    def json(self):
+        return {"code": -1003, "msg": "Too many requests"}
+
+
+def test_session_hook():
+    metrics = RequestMetrics()
+    metrics.hook(FakeResponse())
+    endpoint = metrics.endpoints["GET /api/v3/depth"]
+    assert (endpoint.count, endpoint.errors, dict(endpoint.error_codes)) == (1, 1, {-1003: 1})
+    assert metrics.used_weight == 1201
+
+    text = metrics.format_prometheus()
+    assert 'binance_request_duration_seconds_bucket{endpoint="GET /api/v3/depth",le="0.025"} 0' in text
+    assert 'binance_request_duration_seconds_bucket{endpoint="GET /api/v3/depth",le="0.05"} 1' in text
+    assert 'binance_api_errors_total{endpoint="GET /api/v3/depth",code="-1003"} 1' in text
+    assert "binance_used_weight_1m 1201" in text
+
+
+def test_local_client_summary():
+    client, bm = create_local_client()
+    metrics = RequestMetrics()
+    install_metrics(client, metrics)
+    client.get_order_book(symbol="BTCUSDT")
+    client.get_order_book(symbol="ETHUSDT")
+    with pytest.raises(BinanceAPIException):
+        client.get_order_book(symbol="NOPE")
+
+    (endpoint, requests, errors, codes, *timings), = metrics.get_summary_rows()
+    assert (endpoint, requests, errors, codes) == ("GET /api/v3/depth", 3, 1, "-1121×1")
+
+
+class FakeAsyncClient:
+
+    async def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        return await self._handle_response(FakeAiohttpResponse())
+
+    async def _handle_response(self, response):
+        return {}
+
+
+class FakeAiohttpResponse:
+    status = 200
+    headers = {"X-MBX-USED-WEIGHT-1M": "42"}
+
+
+def test_async_client_used_weight():
+    metrics = RequestMetrics()
+    async_client = FakeAsyncClient()
+    install_metrics_async(async_client, metrics)
+    asyncio.run(async_client._request("get", "https://testnet.binance.vision/api/v3/depth", False))
+    assert metrics.endpoints["GET /api/v3/depth"].count == 1
+    assert metrics.used_weight == 42
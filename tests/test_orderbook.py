@@ -0,0 +1,152 @@
+import time
+
+import pytest
+
+from binance_testnet_tool.orderbook import OrderBook, OrderBookGap, OrderBookStream
+
+
+@pytest.fixture
+def book() -> OrderBook:
+    snapshot = {
+        "lastUpdateId": 100,
+        "bids": [["99.0", "1.0"], ["98.0", "2.0"]],
+        "asks": [["101.0", "1.5"], ["102.0", "3.0"]],
+    }
+    return OrderBook.from_snapshot("BTCUSDT", snapshot)
+
+
+def diff(first, final, bids=(), asks=()):
+    return {"e": "depthUpdate", "U": first, "u": final, "b": list(bids), "a": list(asks)}
+
+
+def test_snapshot(book):
+    assert book.best_ask() == (101.0, 1.5)
+    assert book.best_bid() == (99.0, 1.0)
+    assert book.get_bids() == [(99.0, 1.0), (98.0, 2.0)]
+
+
+def test_apply_diffs(book):
+    # Stale event is ignored
+    assert not book.apply_diff(diff(90, 100, bids=[["99.0", "5"]]))
+    # First event may overlap the snapshot
+    assert book.apply_diff(diff(95, 105, bids=[["99.0", "0"]], asks=[["100.5", "1"]]))
+    assert book.apply_diff(diff(106, 107, bids=[["99.5", "4"]]))
+    assert book.best_bid() == (99.5, 4.0)
+    assert book.best_ask() == (100.5, 1.0)
+    assert book.last_update_id == 107
+
+
+def test_gap(book):
+    book.apply_diff(diff(101, 102))
+    with pytest.raises(OrderBookGap):
+        book.apply_diff(diff(104, 105))
+
+
+def test_gap_first_diff(book):
+    with pytest.raises(OrderBookGap):
+        book.apply_diff(diff(102, 103))
+
+
+def test_depth_queries(book):
+    assert book.asks.total_quantity() == 4.5
+    assert book.asks.total_notional() == 101.0 * 1.5 + 102.0 * 3.0
+    # Eats the first ask level and half a unit from the second
+    assert book.asks.vwap(2.0) == (101.0 * 1.5 + 102.0 * 0.5) / 2.0
+    assert book.asks.vwap(10) is None
+    assert book.bids.liquidity_within(1.0) == (1.0, 99.0)
+    assert book.bids.liquidity_within(2.0) == (3.0, 99.0 + 196.0)
+    assert book.mid_price() == 100.0
+    assert book.spread() == 2.0 / 99.0
+
+
+class FakeDepthClient:
+    """Returns the given snapshots in order, delivering diffs while each one loads."""
+
+    def __init__(self, stream_holder, snapshots, diffs_during_load):
+        self.stream_holder = stream_holder
+        self.snapshots = list(snapshots)
+        self.diffs_during_load = list(diffs_during_load)
+        #: time.monotonic() of each snapshot request
+        self.requested_at = []
+
+    def get_order_book(self, symbol, limit):
+        self.requested_at.append(time.monotonic())
+        for msg in self.diffs_during_load.pop(0):
+            self.stream_holder[0].process_message(msg)
+        return self.snapshots.pop(0)
+
+
+class FakeDepthManager:
+
+    def start_depth_socket(self, callback, symbol, interval):
+        return "depth"
+
+    def stop_socket(self, conn_key):
+        pass
+
+
+def test_stream_buffers_diffs_and_reloads_old_snapshot():
+    holder = []
+    old = {"lastUpdateId": 90, "bids": [["99.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    new = {"lastUpdateId": 101, "bids": [["99.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    client = FakeDepthClient(holder, [old, new], [
+        # Diffs arriving before the first snapshot are newer than it
+        [diff(100, 102, bids=[["99.0", "5.0"]])],
+        [diff(103, 104, asks=[["101.0", "0"]])],
+    ])
+    stream = OrderBookStream(client, FakeDepthManager(), "BTCUSDT", retry_delay=0.05)
+    holder.append(stream)
+    stream.start()
+
+    book = stream.get_book()
+    assert book.last_update_id == 104
+    assert book.best_bid() == (99.0, 5.0)
+    assert book.best_ask() is None
+    assert stream.resync_count == 1
+    # The stale snapshot was not reloaded right away
+    assert client.requested_at[1] - client.requested_at[0] >= 0.05
+
+
+def test_stream_gives_up_on_stale_snapshots():
+    holder = []
+    old = {"lastUpdateId": 90, "bids": [], "asks": []}
+    client = FakeDepthClient(holder, [old] * 3, [[diff(100, 102)], [], []])
+    stream = OrderBookStream(client, FakeDepthManager(), "BTCUSDT", retry_delay=0.01, max_attempts=3)
+    holder.append(stream)
+    with pytest.raises(RuntimeError):
+        stream.start()
+    assert len(client.requested_at) == 3
+    # Waits grow on each attempt
+    first, second = client.requested_at[1] - client.requested_at[0], client.requested_at[2] - client.requested_at[1]
+    assert first >= 0.01 and second >= 0.02
+
+
+def test_stream_gap_resyncs_off_callback_thread():
+    holder = []
+    snapshot = {"lastUpdateId": 100, "bids": [["99.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    later = {"lastUpdateId": 200, "bids": [["98.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    client = FakeDepthClient(holder, [snapshot, later], [[], []])
+    stream = OrderBookStream(client, FakeDepthManager(), "BTCUSDT")
+    holder.append(stream)
+    stream.start()
+
+    stream.process_message(diff(150, 160))
+    assert stream.wait_for_update(after_update_id=160)
+    assert stream.get_book().best_bid() == (98.0, 1.0)
+    assert stream.resync_count == 2
+
+
+def test_stream_gap_burst_shares_one_resync():
+    holder = []
+    snapshot = {"lastUpdateId": 100, "bids": [["99.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    later = {"lastUpdateId": 300, "bids": [["98.0", "1.0"]], "asks": [["101.0", "1.0"]]}
+    client = FakeDepthClient(holder, [snapshot, later], [[], []])
+    stream = OrderBookStream(client, FakeDepthManager(), "BTCUSDT")
+    holder.append(stream)
+    stream.start()
+
+    for first in (150, 170, 190):
+        stream.process_message(diff(first, first + 10))
+    assert stream.wait_for_update(after_update_id=200)
+    assert len(client.requested_at) == 2
+    assert stream.resync_count == 2
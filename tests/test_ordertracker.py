@@ -0,0 +1,80 @@
+import pytest
+
+from binance_testnet_tool.ordertracker import OrderLatencyTracker
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def execution_report(client_order_id: str, execution_type: str = "NEW") -> dict:
+    return {"e": "executionReport", "c": client_order_id, "x": execution_type}
+
+
+def test_latencies(clock):
+    tracker = OrderLatencyTracker(clock)
+    tracker.record_send("a")
+    clock.now += 0.010
+    tracker.record_ack("a")
+    clock.now += 0.005
+    tracker.process_event(execution_report("a"))
+    clock.now += 0.005
+    # Only the first event of an order counts
+    tracker.process_event(execution_report("a", "TRADE"))
+
+    samples = tracker.get_samples()
+    assert samples["send → ack"] == [pytest.approx(0.010)]
+    assert samples["send → event"] == [pytest.approx(0.015)]
+    assert samples["ack → event"] == [pytest.approx(0.005)]
+    assert tracker.orders["a"].first_event_type == "NEW"
+
+
+def test_event_before_ack(clock):
+    tracker = OrderLatencyTracker(clock)
+    tracker.record_send("a")
+    clock.now += 0.002
+    tracker.process_event(execution_report("a"))
+    clock.now += 0.003
+    tracker.record_ack("a")
+    assert tracker.get_samples()["ack → event"] == [pytest.approx(-0.003)]
+
+
+def test_unknown_and_missing_events(clock):
+    tracker = OrderLatencyTracker(clock)
+    tracker.record_send("a")
+    tracker.record_ack("a")
+    tracker.record_send("b")
+    tracker.process_event(execution_report("other"))
+    tracker.process_event({"e": "outboundAccountPosition"})
+
+    assert tracker.unknown_events == 1
+    # Only acknowledged orders are waited for
+    assert tracker.get_missing_events() == 1
+    tracker.process_event(execution_report("a"))
+    assert tracker.get_missing_events() == 0
+
+
+def test_format_report(clock):
+    tracker = OrderLatencyTracker(clock)
+    tracker.record_send("a")
+    clock.now += 0.004
+    tracker.record_ack("a")
+    tracker.record_send("b")
+    clock.now += 0.030
+    tracker.record_ack("b")
+
+    report = tracker.format_report()
+    assert "send → ack" in report
+    assert "<= 5 ms" in report
+    assert "<= 50 ms" in report
+    assert "Orders sent: 2, acknowledged orders without events: 2" in report
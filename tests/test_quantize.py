@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+
+from binance_testnet_tool.quantize import FilterFailure, SymbolQuantizer
+
+
+@pytest.fixture
+def quantizer() -> SymbolQuantizer:
+    return SymbolQuantizer(
+        symbol="BTCUSDT",
+        tick_size=Decimal("0.01000000"),
+        step_size=Decimal("0.00010000"),
+        min_qty=Decimal("0.00010000"),
+        min_notional=Decimal("10.00000000"),
+    )
+
+
+def test_quantize_price(quantizer):
+    assert quantizer.quantize_price(48557.123456) == Decimal("48557.12")
+    assert str(quantizer.quantize_price("48557")) == "48557.00"
+
+
+def test_quantize_quantity_rounds_down(quantizer):
+    assert quantizer.quantize_quantity(0.00059) == Decimal("0.0005")
+    # Float noise must not make us lose a step
+    assert quantizer.quantize_quantity(0.3) == Decimal("0.3000")
+    assert quantizer.quantize_quantity(0.3, market=True) == Decimal("0.3000")
+
+
+def test_non_decimal_tick():
+    quantizer = SymbolQuantizer("X", tick_size=Decimal("0.05"), step_size=Decimal("1"), min_qty=Decimal("1"), min_notional=Decimal(0))
+    assert quantizer.quantize_price("1.23") == Decimal("1.25")
+    assert quantizer.quantize_quantity("5.9") == Decimal("5")
+
+
+def test_quantize_orders(quantizer):
+    orders = quantizer.quantize_orders([(100.004, 0.15), ("200", "0.25")])
+    assert orders == [(Decimal("100.00"), Decimal("0.1500")), (Decimal("200.00"), Decimal("0.2500"))]
+
+    with pytest.raises(FilterFailure):
+        quantizer.quantize_orders([(100, 0.05)])
+
+    with pytest.raises(FilterFailure):
+        quantizer.quantize_order(100, 0.00001)
+
+
+def test_market_lot_size():
+    quantizer = SymbolQuantizer(
+        "BTCUSDT",
+        tick_size=Decimal("0.01"),
+        step_size=Decimal("0.0001"),
+        min_qty=Decimal("0.0001"),
+        min_notional=Decimal(10),
+        max_qty=Decimal("9000"),
+        market_min_qty=Decimal("0.01"),
+        market_max_qty=Decimal("100"),
+    )
+    # Limit orders use LOT_SIZE
+    quantizer.validate(Decimal("50000"), Decimal("0.001"))
+    quantizer.validate(Decimal("1"), Decimal("200"))
+    with pytest.raises(FilterFailure, match="LOT_SIZE maxQty"):
+        quantizer.validate(Decimal("1"), Decimal("9001"))
+
+    # Market orders use MARKET_LOT_SIZE
+    with pytest.raises(FilterFailure, match="MARKET_LOT_SIZE minQty"):
+        quantizer.validate(None, Decimal("0.001"))
+    with pytest.raises(FilterFailure, match="MARKET_LOT_SIZE maxQty"):
+        quantizer.validate(None, Decimal("200"))
+    quantizer.validate(None, Decimal("50"))
+
+
+def test_market_lot_size_falls_back_to_lot_size(quantizer):
+    with pytest.raises(FilterFailure, match="LOT_SIZE minQty"):
+        quantizer.validate(None, Decimal("0.00001"))
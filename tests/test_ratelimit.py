@@ -0,0 +1,18 @@
+from binance_testnet_tool.ratelimit import RateLimiter, get_request_weight
+
+
+def test_request_weight():
+    assert get_request_weight("get", "https://testnet.binance.vision/api/v3/depth", {"symbol": "BTCUSDT", "limit": 1000}) == (50, 0)
+    assert get_request_weight("get", "https://testnet.binance.vision/api/v3/openOrders", {}) == (80, 0)
+    assert get_request_weight("post", "https://testnet.binance.vision/api/v3/order", {"symbol": "BTCUSDT"}) == (1, 1)
+    assert get_request_weight("get", "https://testnet.binance.vision/api/v3/ping", None) == (1, 0)
+
+
+def test_limiter_waits_when_server_reports_usage():
+    limiter = RateLimiter(weight_limit=100, order_limit=10, safety_margin=1.0)
+    assert limiter.reserve(10) == 0
+    limiter.update(200, {"X-MBX-USED-WEIGHT-1M": "100"})
+    assert limiter.reserve(10) > 0
+
+    limiter.update(429, {"Retry-After": "5"})
+    assert limiter.reserve(0) > 4
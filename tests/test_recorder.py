@@ -0,0 +1,47 @@
+from binance_testnet_tool.recorder import RecordingWriter, StreamRecorder, get_stream_names, read_records
+
+
+TRADE = {"e": "trade", "E": 1620000000123, "s": "BTCUSDT", "t": 12345, "p": "56000.01", "q": "0.002", "m": True}
+
+BOOK_TICKER = {"u": 400900217, "s": "ETHUSDT", "b": "3500.5", "B": "31.21", "a": "3500.6", "A": "40.66"}
+
+DEPTH = {"e": "depthUpdate", "E": 1620000000200, "s": "BTCUSDT", "U": 157, "u": 160, "b": [["56000.0", "1.5"]], "a": [["56001.0", "0.0"], ["56002.0", "2.25"]]}
+
+
+def record(writer, messages):
+    recorder = StreamRecorder(writer)
+    recorder.start()
+    for msg in messages:
+        recorder.process_message({"stream": "x", "data": msg})
+    recorder.stop()
+    return recorder
+
+
+def test_get_stream_names():
+    assert get_stream_names(["BTCUSDT"]) == ["btcusdt@trade", "btcusdt@bookTicker", "btcusdt@depth@100ms"]
+
+
+def test_round_trip(tmp_path):
+    writer = RecordingWriter(str(tmp_path), ["BTCUSDT", "ETHUSDT"])
+    recorder = record(writer, [TRADE, BOOK_TICKER, DEPTH, {"e": "kline", "s": "BTCUSDT"}])
+    assert recorder.counts == {"trade": 1, "bookTicker": 1, "depthUpdate": 1, "ignored": 1}
+    assert len(writer.files) == 1
+
+    messages = [msg for received_at, msg in read_records(writer.files[0])]
+    assert messages == [TRADE, BOOK_TICKER, DEPTH]
+
+
+def test_rotation(tmp_path):
+    writer = RecordingWriter(str(tmp_path), ["BTCUSDT"], rotate_bytes=100)
+    record(writer, [TRADE] * 10)
+    assert len(writer.files) > 1
+    assert sum(len(list(read_records(path))) for path in writer.files) == 10
+
+
+def test_truncated_file(tmp_path):
+    writer = RecordingWriter(str(tmp_path), ["BTCUSDT"])
+    record(writer, [TRADE, TRADE])
+    path = writer.files[0]
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 5)
+    assert len(list(read_records(path))) == 1
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+import pytest
+
+from binance_testnet_tool.coingecko import get_coingecko_id, split_pair
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+from binance_testnet_tool.refprice import BookTickerProvider, PriceProvider, ReferencePriceSource
+
+
+class FixedProvider(PriceProvider):
+
+    def __init__(self, name, prices):
+        self.name = name
+        self.prices = prices
+        self.calls = []
+
+    def fetch_prices(self, symbols):
+        self.calls.append(symbols)
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+def test_fallback_and_cache():
+    first = FixedProvider("first", {"BTCUSDT": Decimal(50000)})
+    second = FixedProvider("second", {"BTCUSDT": Decimal(1), "ETHUSDT": Decimal(3000)})
+    source = ReferencePriceSource([first, second], ttl=60)
+
+    assert source.get_prices(["BTCUSDT", "ETHUSDT", "NOPE"]) == {"BTCUSDT": 50000, "ETHUSDT": 3000}
+    assert second.calls == [["ETHUSDT", "NOPE"]]
+    assert source.get_provider_name("ETHUSDT") == "second"
+
+    # Served from the cache
+    assert source.get_price("ETHUSDT") == 3000
+    assert len(first.calls) == 1
+
+    with pytest.raises(RuntimeError):
+        source.get_price("NOPE")
+
+    source.ttl = 0
+    source.get_price("BTCUSDT")
+    assert first.calls[-1] == ["BTCUSDT"]
+
+
+def test_book_ticker_provider():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=2, step_bps=10)
+    client, bm = create_local_client(exchange=exchange)
+    provider = BookTickerProvider(client)
+    assert provider.fetch_prices(["BTCUSDT"]) == {"BTCUSDT": Decimal(50000)}
+    # Empty books and unknown symbols cannot be priced
+    assert provider.fetch_prices(["BTCUSDT", "ETHUSDT", "NOPE"]) == {"BTCUSDT": Decimal(50000)}
+    assert provider.fetch_prices(["NOPE"]) == {}
+
+
+def test_coingecko_ids():
+    assert split_pair("ETHBTC") == ("ETH", "BTC")
+    assert split_pair("BNBBUSD") == ("BNB", "BUSD")
+    assert split_pair("USDT") is None
+    assert get_coingecko_id("BTC", "USDT") == ("bitcoin", "usd")
+    assert get_coingecko_id("FOO", "USDT") is None
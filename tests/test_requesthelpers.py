@@ -0,0 +1,64 @@
+import datetime
+import json
+import logging
+from types import SimpleNamespace
+
+import requests
+
+from binance_testnet_tool.requesthelpers import RequestDumper, _truncate, set_pool_size
+
+
+def make_response(method: str, url: str, data: dict = None) -> requests.Response:
+    request = requests.Request(method, url, headers={"X-MBX-APIKEY": "secret-key"}, data=data).prepare()
+    response = requests.Response()
+    response.request = request
+    response.url = request.url
+    response.status_code = 200
+    response.reason = "OK"
+    response.elapsed = datetime.timedelta(milliseconds=12)
+    response._content = b'{"orderId": 1}'
+    return response
+
+
+def test_json_dump_redacts_credentials(tmp_path):
+    path = tmp_path / "dump.jsonl"
+    dumper = RequestDumper(jsonl_path=str(path))
+    dumper(make_response("GET", "https://testnet.binance.vision/api/v3/openOrders?symbol=BTCUSDT&timestamp=1&signature=abcdef"))
+    dumper(make_response("POST", "https://testnet.binance.vision/api/v3/order", {"symbol": "BTCUSDT", "timestamp": 1, "signature": "abcdef"}))
+    dumper.close()
+
+    text = path.read_text()
+    assert "secret-key" not in text
+    assert "abcdef" not in text
+    get, post = [json.loads(line) for line in text.splitlines()]
+    assert get["url"] == "https://testnet.binance.vision/api/v3/openOrders?symbol=BTCUSDT&timestamp=1&signature=<redacted>"
+    assert get["request_headers"]["X-MBX-APIKEY"] == "<redacted>"
+    assert post["request_body"] == "symbol=BTCUSDT&timestamp=1&signature=<redacted>"
+    assert post["response_body"] == '{"orderId": 1}'
+
+
+def test_debug_dump_redacts_credentials(caplog):
+    dumper = RequestDumper()
+    with caplog.at_level(logging.DEBUG):
+        dumper(make_response("POST", "https://testnet.binance.vision/api/v3/order?signature=abcdef", {"signature": "abcdef"}))
+    assert "signature=<redacted>" in caplog.text
+    assert "secret-key" not in caplog.text
+    assert "abcdef" not in caplog.text
+
+
+def test_truncate():
+    assert _truncate("abcdef", 3) == "abc... (6 characters)"
+    assert _truncate("abc", 3) == "abc"
+    assert _truncate("abc", None) == "abc"
+
+
+def test_set_pool_size_only_grows():
+    client = SimpleNamespace(session=requests.Session())
+    set_pool_size(client, 16)
+    adapter = client.session.adapters["https://"]
+    # A smaller or equal pool keeps the warm connections
+    set_pool_size(client, 8)
+    set_pool_size(client, 16)
+    assert client.session.adapters["https://"] is adapter
+    set_pool_size(client, 32)
+    assert client.session.adapters["https://"]._pool_maxsize == 32
@@ -0,0 +1,21 @@
+from binance_testnet_tool.localexchange import LocalExchange, create_local_client
+from binance_testnet_tool.scan import rank_markets, scan_markets
+
+
+def test_scan_and_rank():
+    exchange = LocalExchange(seed_levels=0)
+    exchange.seed_liquidity("BTCUSDT", 50000, levels=5, step_bps=10)
+    exchange.seed_liquidity("ETHUSDT", 3000, levels=5, step_bps=50)
+    client, bm = create_local_client(exchange=exchange)
+
+    summaries = scan_markets(client, ["BTCUSDT", "ETHUSDT", "NOPE"], band_percent=1, max_workers=2)
+    assert [s.market for s in summaries] == ["BTCUSDT", "ETHUSDT", "NOPE"]
+
+    btc, eth, nope = summaries
+    assert nope.error == "Invalid symbol."
+    assert btc.mid_price == 50000
+    assert btc.spread_percent < eth.spread_percent
+    assert btc.depth_notional > 0
+
+    assert [s.market for s in rank_markets(summaries, "spread")] == ["BTCUSDT", "ETHUSDT", "NOPE"]
+    assert rank_markets(summaries, "top-size")[-1] is nope
@@ -0,0 +1,46 @@
+import pytest
+
+from binance_testnet_tool.depth import Side
+from binance_testnet_tool.orderbook import OrderBook
+from binance_testnet_tool.slippage import get_execution_curve, get_liquidity_bands, get_slippage
+
+
+@pytest.fixture
+def book() -> OrderBook:
+    snapshot = {
+        "lastUpdateId": 100,
+        "bids": [["99.0", "1.0"], ["98.0", "2.0"]],
+        "asks": [["101.0", "1.0"], ["102.0", "2.0"]],
+    }
+    return OrderBook.from_snapshot("BTCUSDT", snapshot)
+
+
+def test_slippage(book):
+    small, large, too_large = get_slippage(book, Side.ask, [50.5, 203.0, 1000])
+    assert small.quantity == pytest.approx(0.5)
+    assert small.avg_price == pytest.approx(101)
+    assert small.slippage_bps == pytest.approx(100)
+
+    # 101 for the first level + 102 for one more
+    assert large.quantity == pytest.approx(2)
+    assert large.avg_price == pytest.approx(101.5)
+    assert large.worst_price == 102
+
+    assert too_large.quantity is None
+
+    sell, = get_slippage(book, Side.bid, [49.5])
+    assert sell.slippage_bps == pytest.approx(100)
+
+
+def test_execution_curve(book):
+    assert get_execution_curve(book, Side.bid) == [
+        [1, 1.0, 99.0, 99.0, pytest.approx(100)],
+        [2, 3.0, 295.0, pytest.approx(98.333333), pytest.approx(166.666666)],
+    ]
+
+
+def test_liquidity_bands(book):
+    assert get_liquidity_bands(book, [1, 2]) == [
+        [1, 1.0, 99.0, 1.0, 101.0],
+        [2, 3.0, 295.0, 3.0, 305.0],
+    ]
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+
+def test_version_does_not_import_heavy_dependencies():
+    """Commands that do not talk to Binance should not pay for importing python-binance."""
+    code = """
+import sys
+from binance_testnet_tool.main import main
+try:
+    main(["version"])
+except SystemExit:
+    pass
+print(",".join(m for m in ("binance", "tabulate", "pygments", "pycoingecko") if m in sys.modules))
+"""
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert output.splitlines()[-1] == ""
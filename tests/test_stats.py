@@ -0,0 +1,27 @@
+from binance_testnet_tool.stats import LatencySummary, histogram, percentile
+
+
+def test_percentile():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == 5
+    assert percentile(values, 95) == 10
+    assert percentile(values, 0) == 1
+    assert percentile([], 50) == 0
+
+
+def test_latency_summary():
+    summary = LatencySummary.from_samples([0.003, 0.001, 0.002])
+    assert summary.get_row() == [3, 2.0, 2.0, 3.0, 3.0, 3.0]
+    assert LatencySummary.from_samples([]).count == 0
+
+
+def test_histogram():
+    rows = histogram([0.0015, 0.002, 0.004, 0.0041], bounds_ms=(1, 2, 5, 10))
+    # Bounds are inclusive, empty buckets at the ends are left out
+    assert rows == [("<= 2 ms", 2), ("<= 5 ms", 2)]
+
+
+def test_histogram_outliers():
+    rows = histogram([-0.001, 0.0005, 0.5], bounds_ms=(1, 10, 100))
+    assert rows == [("< 0 ms", 1), ("<= 1 ms", 1), ("<= 10 ms", 0), ("<= 100 ms", 0), ("> 100 ms", 1)]
+    assert histogram([]) == []
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from binance_testnet_tool import symbols
+from binance_testnet_tool.symbols import DEFAULT_CACHE_TTL, get_symbol_registry
+
+
+class FakeClient:
+
+    def __init__(self, network="spot-testnet", names=("BTCUSDT",)):
+        self.network = network
+        self.names = list(names)
+        self.downloads = 0
+
+    def get_exchange_info(self):
+        self.downloads += 1
+        return {"symbols": [
+            {"symbol": name, "baseAsset": name[:3], "quoteAsset": name[3:], "filters": [{"filterType": "PRICE_FILTER", "tickSize": "0.01"}]}
+            for name in self.names
+        ]}
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    monkeypatch.setattr(symbols, "_registries", {})
+    monkeypatch.setenv("BINANCE_TOOL_CACHE_DIR", str(tmp_path))
+    clock = Clock()
+    monkeypatch.setattr(symbols.time, "time", clock.time)
+    return clock
+
+
+def test_ttl_cache(clock, monkeypatch):
+    client = FakeClient()
+    get_symbol_registry(client)
+    get_symbol_registry(client)
+    assert client.downloads == 1
+
+    # A new process reads the disk cache
+    monkeypatch.setattr(symbols, "_registries", {})
+    clock.now += DEFAULT_CACHE_TTL - 1
+    get_symbol_registry(client)
+    assert client.downloads == 1
+
+    clock.now += 2
+    get_symbol_registry(client)
+    assert client.downloads == 2
+
+
+def test_cache_file_per_network(clock, tmp_path):
+    testnet = FakeClient("spot-testnet", ["BTCUSDT"])
+    production = FakeClient("production", ["ETHUSDT"])
+    assert get_symbol_registry(testnet).get_symbol_info("BTCUSDT")
+    assert get_symbol_registry(production).get_symbol_info("BTCUSDT") is None
+    assert sorted(os.listdir(tmp_path)) == ["exchange-info-production.json", "exchange-info-spot-testnet.json"]
+
+    # The local exchange is never written to the disk
+    get_symbol_registry(FakeClient("local"))
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_unknown_symbol(clock):
+    registry = get_symbol_registry(FakeClient())
+    assert registry.get_symbol_info("FOOBAR") is None
+    with pytest.raises(KeyError):
+        registry.get_filter("FOOBAR", "PRICE_FILTER")
+
+
+def test_refetch_new_listing_once(clock):
+    client = FakeClient()
+    get_symbol_registry(client)
+
+    # Listed after the cache was written
+    client.names.append("NEWUSDT")
+    clock.now += 120
+    registry = get_symbol_registry(client, symbol="NEWUSDT")
+    assert registry.get_symbol_info("NEWUSDT")
+    assert client.downloads == 2
+
+    # A symbol that really does not exist does not download on every lookup
+    get_symbol_registry(client, symbol="FOOBAR")
+    get_symbol_registry(client, symbol="FOOBAR")
+    assert client.downloads == 2